@@ -2,6 +2,7 @@
 管理员专用API
 """
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List
 from pydantic import BaseModel
@@ -11,6 +12,7 @@ from app.models.user import User, UserRole
 from app.models.course import Course
 from app.models.course_enrollment import CourseEnrollment
 from app.models.notification import Notification, NotificationType
+from app.services import notification_service
 
 router = APIRouter()
 
@@ -80,6 +82,8 @@ def add_student_to_course(
     db.add(notification)
 
     db.commit()
+    notification_service.incr_unread([request.user_id])
+    notification_service.publish_notifications(db, [notification])
 
     return {
         "message": f"成功添加用户 {user.username} 到课程 {course.title}",
@@ -94,9 +98,9 @@ def send_notification_to_users(
     db: Session = Depends(get_db)
 ):
     """管理员/老师发送通知给用户"""
-    # 验证接收用户
-    users = db.query(User).filter(User.id.in_(request.user_ids)).all()
-    if len(users) != len(request.user_ids):
+    # 验证接收用户（只统计数量，不加载用户对象）
+    user_count = db.query(func.count(User.id)).filter(User.id.in_(request.user_ids)).scalar()
+    if user_count != len(request.user_ids):
         raise HTTPException(status_code=400, detail="部分用户不存在")
 
     # 验证NotificationType
@@ -121,6 +125,8 @@ def send_notification_to_users(
         db.add(notification)
 
     db.commit()
+    notification_service.incr_unread(request.user_ids)
+    notification_service.publish_notifications(db, notifications)
 
     return {
         "message": f"成功发送通知给 {len(request.user_ids)} 位用户",
@@ -134,36 +140,28 @@ def broadcast_notification(
     current_admin: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
-    """广播通知给所有用户"""
-    # 获取所有活跃用户
-    users = db.query(User).filter(User.is_active == True).all()
-
+    """广播通知给所有用户（只存一条广播，用户阅读时才生成个人通知）"""
     # 验证NotificationType
     try:
         notif_type = NotificationType[request.type.upper()]
     except KeyError:
         raise HTTPException(status_code=400, detail=f"无效的通知类型: {request.type}")
 
-    # 创建通知记录
-    notifications = []
-    for user in users:
-        notification = Notification(
-            user_id=user.id,
-            type=notif_type,
-            title=request.title,
-            content=request.content,
-            sender_id=current_admin.id,
-            course_id=request.course_id,
-            live_id=request.live_id
-        )
-        notifications.append(notification)
-        db.add(notification)
-
+    broadcast = notification_service.create_broadcast(
+        db,
+        notif_type,
+        request.title,
+        request.content,
+        sender_id=current_admin.id,
+        course_id=request.course_id,
+        live_id=request.live_id
+    )
     db.commit()
+    notification_service.publish_broadcast(db, broadcast)
 
     return {
-        "message": f"成功广播通知给 {len(users)} 位用户",
-        "notification_count": len(notifications)
+        "message": "成功广播通知给所有用户",
+        "broadcast_id": broadcast.id
     }
 
 
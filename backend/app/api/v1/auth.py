@@ -2,7 +2,7 @@
 认证相关API
 """
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.security import verify_password, get_password_hash, create_access_token
@@ -10,6 +10,8 @@ from app.core.config import settings
 from app.models.user import User
 from app.schemas.user import UserCreate, UserLogin, Token, UserResponse, UserChangePassword
 from app.api.deps import get_current_user
+from app.services.count_cache import CountMode, get_total
+from app.services import storage_service
 
 router = APIRouter()
 
@@ -127,6 +129,7 @@ def get_current_user_info(current_user: User = Depends(get_current_user)):
 def get_users(
     page: int = 1,
     page_size: int = 10,
+    count: CountMode = Query(CountMode.EXACT, description="总数统计方式：exact精确(缓存)、estimate估算、none不统计"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -140,7 +143,7 @@ def get_users(
         )
 
     # 总数
-    total = db.query(User).count()
+    total = get_total(db.query(User), [User], {}, count)
 
     # 分页查询
     users = db.query(User).order_by(User.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
@@ -277,11 +280,14 @@ def update_profile(
             )
     
     # 更新字段
+    old_avatar = current_user.avatar
     for field, value in profile_data.items():
         if field in allowed_fields and value is not None:
             setattr(current_user, field, value)
+    removable = storage_service.replace_file(db, old_avatar, current_user.avatar)
     
     db.commit()
+    storage_service.delete_files(removable)
     db.refresh(current_user)
     
     return current_user
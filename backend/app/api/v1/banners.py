@@ -9,18 +9,24 @@ from app.models.user import User
 from app.models.banner import Banner
 from app.schemas.banner import BannerCreate, BannerUpdate, BannerResponse
 from app.api.deps import require_admin
+from app.services import storage_service, image_variants
 
 router = APIRouter()
 
 
 @router.get("", response_model=List[BannerResponse], summary="获取轮播图列表")
 def get_banners(db: Session = Depends(get_db)):
-    """获取所有激活的轮播图"""
+    """获取所有激活的轮播图（含已生成的衍生图）"""
     banners = db.query(Banner).filter(
         Banner.is_active == True
     ).order_by(Banner.sort_order).all()
 
-    return banners
+    return [
+        BannerResponse.model_validate(banner).model_copy(
+            update={"image_variants": image_variants.get_variants(banner.image_url)}
+        )
+        for banner in banners
+    ]
 
 
 @router.post("", response_model=BannerResponse, summary="创建轮播图")
@@ -32,6 +38,7 @@ def create_banner(
     """创建轮播图（管理员）"""
     db_banner = Banner(**banner_in.model_dump())
     db.add(db_banner)
+    storage_service.acquire_file(db, db_banner.image_url)
     db.commit()
     db.refresh(db_banner)
     return db_banner
@@ -49,11 +56,14 @@ def update_banner(
     if not banner:
         raise HTTPException(status_code=404, detail="轮播图不存在")
 
+    old_image_url = banner.image_url
     update_data = banner_in.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(banner, key, value)
+    removable = storage_service.replace_file(db, old_image_url, banner.image_url)
 
     db.commit()
+    storage_service.delete_files(removable)
     db.refresh(banner)
     return banner
 
@@ -69,6 +79,8 @@ def delete_banner(
     if not banner:
         raise HTTPException(status_code=404, detail="轮播图不存在")
 
+    removable = storage_service.release_files(db, [banner.image_url])
     db.delete(banner)
     db.commit()
+    storage_service.delete_files(removable)
     return {"message": "轮播图删除成功"}
@@ -1,8 +1,11 @@
 """
 章节管理API
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+import hashlib
+import json
+from collections import defaultdict
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Response
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.models.user import User
@@ -14,24 +17,33 @@ from app.schemas.chapter import (
     SectionCreate, SectionUpdate, SectionResponse
 )
 from app.api.deps import get_current_user, require_teacher
+from app.services import course_cache
+from app.services.learning_service import subtract_sections_progress, update_course_section_total
+from app.services import storage_service
 
 router = APIRouter()
 
 
 # 章节管理
-@router.get("/course/{course_id}", response_model=List[ChapterResponse], summary="获取课程章节列表")
-def get_course_chapters(
-    course_id: int,
-    db: Session = Depends(get_db)
-):
-    """获取课程的所有章节（包含小节）"""
-    course = db.query(Course).filter(Course.id == course_id).first()
-    if not course:
-        raise HTTPException(status_code=404, detail="课程不存在")
+def build_curriculum(db: Session, course_id: int) -> Optional[List[dict]]:
+    """
+    加载课程的章节树：一次查询章节、一次查询全部小节，在内存中按章节组装
 
+    Returns:
+        Optional[List[dict]]: 可JSON序列化的章节列表，课程不存在时返回None
+    """
     chapters = db.query(Chapter).filter(Chapter.course_id == course_id).order_by(Chapter.sort_order).all()
+    if not chapters:
+        exists = db.query(Course.id).filter(Course.id == course_id).first()
+        return [] if exists else None
+
+    sections_by_chapter = defaultdict(list)
+    sections = db.query(Section).filter(
+        Section.chapter_id.in_([chapter.id for chapter in chapters])
+    ).order_by(Section.sort_order).all()
+    for section in sections:
+        sections_by_chapter[section.chapter_id].append(section)
 
-    # 为每个章节加载小节
     result = []
     for chapter in chapters:
         chapter_dict = {
@@ -42,13 +54,51 @@ def get_course_chapters(
             "sort_order": chapter.sort_order,
             "created_at": chapter.created_at,
             "updated_at": chapter.updated_at,
-            "sections": []
+            "sections": sections_by_chapter[chapter.id]
         }
+        result.append(ChapterResponse.model_validate(chapter_dict).model_dump(mode="json"))
+
+    return result
+
+
+def curriculum_etag(course_id: int, curriculum: List[dict]) -> str:
+    """
+    按章节树内容计算ETag（缓存版本号在Redis清空或重启后会重复，不能用作ETag）
+
+    Args:
+        course_id: 课程ID
+        curriculum: build_curriculum 返回的章节列表
+
+    Returns:
+        str: 弱ETag
+    """
+    content = json.dumps(curriculum, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return f'W/"curriculum-{course_id}-{hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]}"'
+
+
+@router.get("/course/{course_id}", response_model=List[ChapterResponse], summary="获取课程章节列表")
+def get_course_chapters(
+    course_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    获取课程的所有章节（包含小节）
+
+    响应带有 ETag（按章节树内容计算），客户端携带 If-None-Match 且内容未变化时返回304
+    """
+    result, _ = course_cache.get_or_build(
+        "curriculum", course_id, lambda: build_curriculum(db, course_id)
+    )
+    if result is None:
+        raise HTTPException(status_code=404, detail="课程不存在")
 
-        sections = db.query(Section).filter(Section.chapter_id == chapter.id).order_by(Section.sort_order).all()
-        chapter_dict["sections"] = sections
-        result.append(chapter_dict)
+    etag = curriculum_etag(course_id, result)
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
+    response.headers["ETag"] = etag
     return result
 
 
@@ -70,6 +120,7 @@ def create_chapter(
     db.add(db_chapter)
     db.commit()
     db.refresh(db_chapter)
+    course_cache.invalidate_course(course.id)
     return db_chapter
 
 
@@ -95,6 +146,7 @@ def update_chapter(
     
     db.commit()
     db.refresh(chapter)
+    course_cache.invalidate_course(course.id)
     return chapter
 
 
@@ -113,8 +165,18 @@ def delete_chapter(
     if course.teacher_id != current_user.id and current_user.role != "ADMIN":
         raise HTTPException(status_code=403, detail="无权限操作")
     
+    video_urls = [
+        video_url for video_url, in db.query(Section.video_url)
+        .filter(Section.chapter_id == chapter.id, Section.video_url.isnot(None))
+    ]
+    removable = storage_service.release_files(db, video_urls)
+    section_ids = [section_id for section_id, in db.query(Section.id).filter(Section.chapter_id == chapter.id)]
+    subtract_sections_progress(db, course.id, section_ids)
     db.delete(chapter)
+    update_course_section_total(db, course.id)
     db.commit()
+    storage_service.delete_files(removable)
+    course_cache.invalidate_course(course.id)
     return {"message": "章节删除成功"}
 
 
@@ -136,8 +198,11 @@ def create_section(
     
     db_section = Section(**section_in.model_dump())
     db.add(db_section)
+    storage_service.acquire_file(db, db_section.video_url)
+    update_course_section_total(db, course.id)
     db.commit()
     db.refresh(db_section)
+    course_cache.invalidate_course(course.id)
     return db_section
 
 
@@ -158,12 +223,16 @@ def update_section(
     if course.teacher_id != current_user.id and current_user.role != "ADMIN":
         raise HTTPException(status_code=403, detail="无权限操作")
     
+    old_video_url = section.video_url
     update_data = section_in.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(section, key, value)
+    removable = storage_service.replace_file(db, old_video_url, section.video_url)
     
     db.commit()
+    storage_service.delete_files(removable)
     db.refresh(section)
+    course_cache.invalidate_course(course.id)
     return section
 
 
@@ -183,8 +252,13 @@ def delete_section(
     if course.teacher_id != current_user.id and current_user.role != "ADMIN":
         raise HTTPException(status_code=403, detail="无权限操作")
     
+    removable = storage_service.release_files(db, [section.video_url])
+    subtract_sections_progress(db, course.id, [section.id])
     db.delete(section)
+    update_course_section_total(db, course.id)
     db.commit()
+    storage_service.delete_files(removable)
+    course_cache.invalidate_course(course.id)
     return {"message": "小节删除成功"}
 
 
@@ -1,19 +1,94 @@
 """
 评论管理API
 """
-from typing import List, Optional
+from typing import List, Optional, Union
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.models.user import User
 from app.models.course import Course
 from app.models.comment import Comment
 from app.schemas.comment import CommentCreate, CommentUpdate, CommentResponse
+from app.schemas.common import PageResponse
+from app.utils.pagination import paginate_by_cursor
 from app.api.deps import get_current_user
+from app.services import course_cache
+from app.services.rating_service import rating_delta, apply_rating_delta
+from app.services import comment_like_service
 
 router = APIRouter()
 
 
+def serialize_comments(db: Session, comments: List[Comment], reply_limit: Optional[int] = None) -> List[dict]:
+    """
+    序列化评论，批量填充作者信息
+
+    Args:
+        db: 数据库会话
+        comments: 评论列表
+        reply_limit: 不为None时同时返回每条评论的前N条回复及回复总数
+
+    Returns:
+        List[dict]: 评论数据
+    """
+    comment_ids = [comment.id for comment in comments]
+    replies_by_parent = {comment_id: [] for comment_id in comment_ids}
+    reply_counts = {}
+    
+    if reply_limit is not None and comment_ids:
+        # 每个话题的回复总数
+        reply_counts = dict(
+            db.query(Comment.parent_id, func.count(Comment.id)).filter(
+                Comment.parent_id.in_(comment_ids),
+                Comment.is_deleted == False
+            ).group_by(Comment.parent_id).all()
+        )
+        # 用窗口函数一次取出每个话题最早的N条回复
+        if reply_limit > 0:
+            ranked = db.query(
+                Comment.id.label("id"),
+                func.row_number().over(
+                    partition_by=Comment.parent_id,
+                    order_by=(Comment.created_at, Comment.id)
+                ).label("rn")
+            ).filter(
+                Comment.parent_id.in_(comment_ids),
+                Comment.is_deleted == False
+            ).subquery()
+            replies = db.query(Comment).join(ranked, ranked.c.id == Comment.id).filter(
+                ranked.c.rn <= reply_limit
+            ).order_by(Comment.created_at, Comment.id).all()
+            for reply in replies:
+                replies_by_parent[reply.parent_id].append(reply)
+    
+    # 作者信息一次批量查询
+    user_ids = {comment.user_id for comment in comments}
+    user_ids.update(reply.user_id for replies in replies_by_parent.values() for reply in replies)
+    users = {
+        user_id: (username, avatar)
+        for user_id, username, avatar in db.query(User.id, User.username, User.avatar).filter(
+            User.id.in_(user_ids)
+        ).all()
+    } if user_ids else {}
+    
+    def to_dict(comment: Comment, replies: List[Comment], reply_count: int) -> dict:
+        username, avatar = users.get(comment.user_id, (None, None))
+        data = {column.name: getattr(comment, column.name) for column in Comment.__table__.columns}
+        data.update(
+            username=username,
+            user_avatar=avatar,
+            replies=[to_dict(reply, [], 0) for reply in replies],
+            reply_count=reply_count
+        )
+        return data
+    
+    return [
+        to_dict(comment, replies_by_parent[comment.id], reply_counts.get(comment.id, 0))
+        for comment in comments
+    ]
+
+
 @router.post("", response_model=CommentResponse, summary="发表评论")
 def create_comment(
     comment_in: CommentCreate,
@@ -39,36 +114,37 @@ def create_comment(
     )
     
     db.add(db_comment)
+    
+    # 如果有评分，增量更新课程评分
+    if comment_in.rating:
+        apply_rating_delta(db, course.id, *rating_delta(None, comment_in.rating))
+    
     db.commit()
     db.refresh(db_comment)
     
-    # 如果有评分，更新课程评分
     if comment_in.rating:
-        # 重新计算课程平均分
-        comments_with_rating = db.query(Comment).filter(
-            Comment.course_id == comment_in.course_id,
-            Comment.rating.isnot(None),
-            Comment.is_deleted == False
-        ).all()
-        
-        if comments_with_rating:
-            avg_rating = sum(c.rating for c in comments_with_rating) / len(comments_with_rating)
-            course.rating = round(avg_rating, 2)
-            course.rating_count = len(comments_with_rating)
-            db.commit()
+        course_cache.invalidate_course(course.id)
     
     return db_comment
 
 
-@router.get("", response_model=List[CommentResponse], summary="获取评论列表")
+@router.get("", response_model=Union[PageResponse[CommentResponse], List[CommentResponse]], summary="获取评论列表")
 def get_comments(
     course_id: int = Query(..., description="课程ID"),
     parent_id: Optional[int] = Query(None, description="父评论ID"),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="游标分页：传空字符串获取第一页，之后传上一页返回的next_cursor"),
+    with_replies: bool = Query(False, description="同时返回每条评论的前reply_limit条回复及回复总数"),
+    reply_limit: int = Query(3, ge=0, le=20, description="每条评论预览的回复数"),
     db: Session = Depends(get_db)
 ):
-    """获取评论列表"""
+    """
+    获取评论列表
+    - 不传cursor: 按page分页，返回评论数组
+    - 传cursor: 游标分页，返回带next_cursor的分页结构
+    - with_replies: 一次返回评论及其回复预览（查询次数固定，与话题数无关）
+    """
     query = db.query(Comment).filter(
         Comment.course_id == course_id,
         Comment.is_deleted == False
@@ -80,9 +156,17 @@ def get_comments(
     else:
         query = query.filter(Comment.parent_id == parent_id)
     
+    if cursor is not None:
+        comments, next_cursor = paginate_by_cursor(query, Comment, cursor, page_size)
+        return {
+            "page_size": page_size,
+            "items": serialize_comments(db, comments, reply_limit if with_replies else None),
+            "next_cursor": next_cursor
+        }
+    
     comments = query.order_by(Comment.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
     
-    return comments
+    return serialize_comments(db, comments, reply_limit if with_replies else None)
 
 
 @router.put("/{comment_id}", response_model=CommentResponse, summary="更新评论")
@@ -102,11 +186,20 @@ def update_comment(
         raise HTTPException(status_code=403, detail="无权限编辑此评论")
     
     update_data = comment_in.model_dump(exclude_unset=True)
+    old_rating = comment.rating
     for key, value in update_data.items():
         setattr(comment, key, value)
     
+    # 评分变化时增量更新课程评分（已删除的评论不计入）
+    rating_changed = not comment.is_deleted and comment.rating != old_rating
+    if rating_changed:
+        apply_rating_delta(db, comment.course_id, *rating_delta(old_rating, comment.rating))
+    
     db.commit()
     db.refresh(comment)
+    
+    if rating_changed:
+        course_cache.invalidate_course(comment.course_id)
     return comment
 
 
@@ -125,10 +218,16 @@ def delete_comment(
     if comment.user_id != current_user.id and current_user.role.value != "admin":
         raise HTTPException(status_code=403, detail="无权限删除此评论")
     
-    # 软删除
+    # 软删除，评分从课程评分中扣除
+    rated = not comment.is_deleted and comment.rating is not None
+    if rated:
+        apply_rating_delta(db, comment.course_id, *rating_delta(comment.rating, None))
     comment.is_deleted = True
     db.commit()
     
+    if rated:
+        course_cache.invalidate_course(comment.course_id)
+    
     return {"message": "评论删除成功"}
 
 
@@ -138,16 +237,35 @@ def like_comment(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """点赞评论"""
+    """点赞评论（每个用户只计一次）"""
+    comment = db.query(Comment).filter(Comment.id == comment_id, Comment.is_deleted == False).first()
+    if not comment:
+        raise HTTPException(status_code=404, detail="评论不存在")
+    
+    liked = comment_like_service.like(db, comment, current_user.id)
+    
+    return {
+        "message": "点赞成功" if liked else "已经点赞过",
+        "like_count": comment_like_service.get_like_count(comment)
+    }
+
+
+@router.delete("/{comment_id}/like", summary="取消点赞")
+def unlike_comment(
+    comment_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """取消点赞评论"""
     comment = db.query(Comment).filter(Comment.id == comment_id).first()
     if not comment:
         raise HTTPException(status_code=404, detail="评论不存在")
     
-    # 简单实现：直接增加点赞数
-    # 实际项目中应该记录用户点赞关系，防止重复点赞
-    comment.like_count += 1
-    db.commit()
+    unliked = comment_like_service.unlike(db, comment, current_user.id)
     
-    return {"message": "点赞成功", "like_count": comment.like_count}
+    return {
+        "message": "取消点赞成功" if unliked else "尚未点赞",
+        "like_count": comment_like_service.get_like_count(comment)
+    }
 
 
@@ -2,16 +2,24 @@
 课程管理API
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
 from app.core.database import get_db
 from app.models.user import User
 from app.models.course import Course, CourseStatus
 from app.models.category import Category
+from app.models.chapter import Chapter
+from app.models.section import Section
 from app.models.course_enrollment import CourseEnrollment
 from app.schemas.course import CourseCreate, CourseUpdate, CourseResponse, CourseDetail
 from app.schemas.common import PageParams, PageResponse
+from app.utils.pagination import paginate_by_cursor
+from app.services import search_service, storage_service, image_variants
+from app.services.count_cache import CountMode, get_total
+from app.services import view_counter, course_cache
+from app.services.idempotency import idempotent_request
 from app.api.deps import get_current_user, require_teacher
 
 router = APIRouter()
@@ -41,6 +49,9 @@ def create_course(
     )
     
     db.add(db_course)
+    db.flush()
+    search_service.index_course(db, db_course)
+    storage_service.acquire_file(db, db_course.cover_image)
     db.commit()
     db.refresh(db_course)
     
@@ -55,12 +66,16 @@ def get_courses(
     status: Optional[str] = None,
     keyword: Optional[str] = None,
     show_all: bool = Query(False, description="显示所有状态（包括草稿）"),
+    cursor: Optional[str] = Query(None, description="游标分页：传空字符串获取第一页，之后传上一页返回的next_cursor"),
+    count: CountMode = Query(CountMode.EXACT, description="总数统计方式：exact精确(缓存)、estimate估算、none不统计"),
     db: Session = Depends(get_db)
 ):
     """
     获取课程列表
     - show_all=true: 显示所有状态的课程（用于管理后台）
     - show_all=false: 只显示已发布的课程（用于前台）
+    - cursor: 传入时使用游标分页（忽略page），深翻页开销与第一页相同
+    - keyword: 通过全文索引搜索，结果按相关度排序（不支持游标分页）
     """
     query = db.query(Course)
     
@@ -79,23 +94,52 @@ def get_courses(
         # 如果没有指定状态且不显示全部，则默认只显示已发布的课程（前台）
         query = query.filter(Course.status == CourseStatus.PUBLISHED)
     
+    score = None
     if keyword:
-        query = query.filter(
-            or_(
-                Course.title.like(f"%{keyword}%"),
-                Course.description.like(f"%{keyword}%")
+        if cursor is not None:
+            raise HTTPException(
+                status_code=400,
+                detail="关键词搜索按相关度排序，不支持游标分页"
             )
-        )
+        matches = search_service.match_subquery(db, keyword)
+        if matches is not None:
+            query = query.join(matches, matches.c.course_id == Course.id)
+            score = matches.c.score
+        else:
+            # 关键词中没有可索引的词（如单个汉字），退化为标题匹配
+            query = query.filter(Course.title.like(f"%{keyword}%"))
     
     # 总数
-    total = query.count()
+    total = get_total(query, [Course], {
+        "category_id": category_id,
+        "status": status,
+        "keyword": keyword,
+        "show_all": show_all
+    }, count)
     
+    # 章节数：关联标量子查询，只统计当前页课程的章节（走 chapters.course_id 索引），避免逐个加载 course.chapters
+    chapter_count = db.query(func.count(Chapter.id)).filter(
+        Chapter.course_id == Course.id
+    ).correlate(Course).scalar_subquery()
+
+    # 讲师、分类随主查询一起 JOIN 加载，避免 N+1 查询
+    page_query = query.add_columns(chapter_count).options(
+        joinedload(Course.teacher),
+        joinedload(Course.category)
+    )
+
     # 分页
-    courses = query.order_by(Course.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
+    next_cursor = None
+    if cursor is not None:
+        rows, next_cursor = paginate_by_cursor(page_query, Course, cursor, page_size, key=lambda row: row[0])
+    elif score is not None:
+        rows = page_query.order_by(score.desc(), Course.created_at.desc(), Course.id.desc()).offset((page - 1) * page_size).limit(page_size).all()
+    else:
+        rows = page_query.order_by(Course.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
 
     # 为每个课程添加关联信息
     courses_list = []
-    for course in courses:
+    for course, chapter_count in rows:
         course_dict = {
             "id": course.id,
             "title": course.title,
@@ -116,33 +160,34 @@ def get_courses(
             "updated_at": course.updated_at,
             "teacher_name": course.teacher.full_name or course.teacher.username if course.teacher else None,
             "category_name": course.category.name if course.category else None,
-            "chapter_count": len(course.chapters) if course.chapters else 0
+            "chapter_count": chapter_count,
+            "cover_image_variants": image_variants.get_variants(course.cover_image)
         }
         courses_list.append(course_dict)
 
     return {
         "total": total,
-        "page": page,
+        "page": page if cursor is None else None,
         "page_size": page_size,
-        "items": courses_list
+        "items": courses_list,
+        "next_cursor": next_cursor
     }
 
 
-@router.get("/{course_id}", response_model=CourseDetail, summary="获取课程详情")
-def get_course(course_id: int, db: Session = Depends(get_db)):
+def build_course_detail(db: Session, course_id: int) -> Optional[dict]:
     """
-    获取课程详情
+    构建课程详情（用于缓存，不含未写回的浏览次数）
+
+    Returns:
+        Optional[dict]: 可JSON序列化的课程详情，课程不存在时返回None
     """
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = db.query(Course).options(
+        joinedload(Course.teacher),
+        joinedload(Course.category),
+        selectinload(Course.chapters).selectinload(Chapter.sections)
+    ).filter(Course.id == course_id).first()
     if not course:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="课程不存在"
-        )
-
-    # 增加浏览次数
-    course.view_count += 1
-    db.commit()
+        return None
 
     # 构建响应数据，包含关联信息
     course_dict = {
@@ -168,7 +213,53 @@ def get_course(course_id: int, db: Session = Depends(get_db)):
         "chapters": course.chapters
     }
 
-    return course_dict
+    return CourseDetail.model_validate(course_dict).model_dump(mode="json")
+
+
+@router.get("/{course_id}", response_model=CourseDetail, summary="获取课程详情")
+def get_course(course_id: int, db: Session = Depends(get_db)):
+    """
+    获取课程详情（读取缓存，课程或章节修改时失效）
+    """
+    course_dict, _ = course_cache.get_or_build(
+        "detail", course_id, lambda: build_course_detail(db, course_id)
+    )
+    if course_dict is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="课程不存在"
+        )
+
+    # 增加浏览次数（缓冲累加，由后台任务批量写回）
+    view_counter.record_view(course_id)
+
+    return {
+        **course_dict,
+        "view_count": course_dict["view_count"] + view_counter.get_pending_views(course_id)
+    }
+
+
+@router.get("/{course_id}/views", summary="获取课程浏览次数")
+def get_course_views(course_id: int, db: Session = Depends(get_db)):
+    """
+    获取课程浏览次数
+    - persisted: 已写入数据库的浏览次数
+    - pending: 尚未写回数据库的增量
+    """
+    persisted = db.query(Course.view_count).filter(Course.id == course_id).scalar()
+    if persisted is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="课程不存在"
+        )
+
+    pending = view_counter.get_pending_views(course_id)
+    return {
+        "course_id": course_id,
+        "view_count": persisted + pending,
+        "persisted": persisted,
+        "pending": pending
+    }
 
 
 @router.put("/{course_id}", response_model=CourseResponse, summary="更新课程")
@@ -196,12 +287,19 @@ def update_course(
         )
     
     # 更新课程
+    old_cover_image = course.cover_image
     update_data = course_in.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(course, key, value)
     
+    if update_data.keys() & search_service.FIELD_WEIGHTS.keys():
+        search_service.index_course(db, course)
+    removable = storage_service.replace_file(db, old_cover_image, course.cover_image)
+    
     db.commit()
+    storage_service.delete_files(removable)
     db.refresh(course)
+    course_cache.invalidate_course(course.id)
     
     return course
 
@@ -229,8 +327,18 @@ def delete_course(
             detail="无权限删除此课程"
         )
     
+    search_service.remove_course(db, course.id)
+    # 封面和级联删除的小节视频
+    video_urls = [
+        video_url for video_url, in db.query(Section.video_url)
+        .join(Chapter, Chapter.id == Section.chapter_id)
+        .filter(Chapter.course_id == course.id, Section.video_url.isnot(None))
+    ]
+    removable = storage_service.release_files(db, [course.cover_image] + video_urls)
     db.delete(course)
     db.commit()
+    storage_service.delete_files(removable)
+    course_cache.invalidate_course(course_id)
 
     return {"message": "课程删除成功"}
 
@@ -238,10 +346,24 @@ def delete_course(
 @router.post("/{course_id}/enroll", summary="报名课程")
 def enroll_course(
     course_id: int,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=64),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """报名课程"""
+    """
+    报名课程
+    - Idempotency-Key: 可选，重试时携带相同的值直接返回首次的结果
+    """
+    with idempotent_request("course:enroll", current_user.id, idempotency_key, {"course_id": course_id}) as idem:
+        if idem.replay is not None:
+            return idem.replay
+
+        _enroll_course(db, current_user, course_id)
+        return idem.save({"message": "报名成功"})
+
+
+def _enroll_course(db: Session, current_user: User, course_id: int) -> None:
+    """创建报名记录并增加课程学习人数"""
     # 检查课程是否存在
     course = db.query(Course).filter(Course.id == course_id).first()
     if not course:
@@ -260,20 +382,29 @@ def enroll_course(
     if existing:
         raise HTTPException(status_code=400, detail="已经报名此课程")
 
-    # 创建报名记录
+    # 创建报名记录（唯一约束防止并发重复报名）
     enrollment = CourseEnrollment(
         user_id=current_user.id,
         course_id=course_id
     )
 
-    db.add(enrollment)
+    try:
+        db.add(enrollment)
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="已经报名此课程")
 
     # 更新课程学习人数
-    course.student_count += 1
+    db.execute(
+        update(Course)
+        .where(Course.id == course_id)
+        .values(student_count=Course.student_count + 1, updated_at=Course.updated_at)
+        .execution_options(synchronize_session=False)
+    )
 
     db.commit()
-
-    return {"message": "报名成功"}
+    course_cache.invalidate_course(course_id)
 
 
 @router.get("/{course_id}/is_enrolled", summary="检查是否已报名")
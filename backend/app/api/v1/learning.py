@@ -3,7 +3,7 @@
 """
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
 from app.core.database import get_db
 from app.models.user import User
@@ -11,10 +11,16 @@ from app.models.course import Course
 from app.models.section import Section
 from app.models.learning_record import LearningRecord
 from app.models.collection import Collection
+from app.models.user_course_progress import UserCourseProgress
 from app.schemas.learning_record import (
     LearningRecordCreate, LearningRecordUpdate, LearningRecordResponse
 )
 from app.api.deps import get_current_user
+from app.services.count_cache import CountMode, get_total
+from app.services import progress_buffer
+from app.services.learning_service import (
+    upsert_learning_records, refresh_user_course_progress, get_section_courses
+)
 
 router = APIRouter()
 
@@ -50,6 +56,7 @@ def save_learning_record(
         if record_in.progress >= 100:
             existing_record.is_completed = True
         
+        refresh_user_course_progress(db, [(current_user.id, existing_record.course_id)])
         db.commit()
         db.refresh(existing_record)
         return existing_record
@@ -65,11 +72,81 @@ def save_learning_record(
         )
         
         db.add(db_record)
+        refresh_user_course_progress(db, [(current_user.id, db_record.course_id)])
         db.commit()
         db.refresh(db_record)
         return db_record
 
 
+@router.post("/records/batch", response_model=List[LearningRecordResponse], summary="批量保存学习记录")
+def save_learning_records_batch(
+    records_in: List[LearningRecordCreate],
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    批量保存学习记录（离线客户端回放队列）
+
+    同一小节出现多次时以最后一条为准；任一条进度达到100%即标记为已完成。
+    """
+    if not records_in:
+        return []
+    if len(records_in) > 500:
+        raise HTTPException(status_code=400, detail="单次最多提交500条学习记录")
+    
+    # 一次查询校验小节存在且属于提交的课程（不一致的记录会写坏其他课程的进度汇总）
+    course_ids = {item.course_id for item in records_in}
+    section_ids = {item.section_id for item in records_in}
+    section_courses = get_section_courses(db, section_ids)
+    if section_courses.keys() != section_ids:
+        raise HTTPException(status_code=404, detail=f"小节不存在: {sorted(section_ids - section_courses.keys())}")
+    mismatched = sorted({item.section_id for item in records_in if section_courses[item.section_id] != item.course_id})
+    if mismatched:
+        raise HTTPException(status_code=400, detail=f"小节不属于提交的课程: {mismatched}")
+    
+    rows = {}
+    for item in records_in:
+        completed = item.progress >= 100 or (item.section_id in rows and rows[item.section_id]["is_completed"])
+        rows[item.section_id] = {
+            "user_id": current_user.id,
+            "course_id": item.course_id,
+            "section_id": item.section_id,
+            "progress": item.progress,
+            "last_position": item.last_position,
+            "is_completed": completed
+        }
+    
+    upsert_learning_records(db, list(rows.values()))
+    refresh_user_course_progress(db, [(current_user.id, course_id) for course_id in course_ids])
+    db.commit()
+    
+    return db.query(LearningRecord).filter(
+        LearningRecord.user_id == current_user.id,
+        LearningRecord.section_id.in_(rows.keys())
+    ).all()
+
+
+@router.post("/records/heartbeat", status_code=status.HTTP_202_ACCEPTED, summary="上报学习进度(心跳)")
+def report_learning_progress(
+    record_in: LearningRecordCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    播放器周期性上报学习进度
+
+    进度先写入缓冲区并立即返回，由后台任务批量写入数据库；
+    进度达到100%时立即写入。课程/小节不存在的上报在写入时丢弃。
+    """
+    flushed = progress_buffer.submit(
+        user_id=current_user.id,
+        course_id=record_in.course_id,
+        section_id=record_in.section_id,
+        progress=record_in.progress,
+        last_position=record_in.last_position
+    )
+    return {"accepted": True, "flushed": flushed}
+
+
 @router.get("/records/course/{course_id}", response_model=List[LearningRecordResponse], summary="获取课程学习记录")
 def get_course_learning_records(
     course_id: int,
@@ -89,41 +166,30 @@ def get_course_learning_records(
 def get_my_courses(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
+    count: CountMode = Query(CountMode.EXACT, description="总数统计方式：exact精确(缓存)、estimate估算、none不统计"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取我正在学习的课程"""
-    # 获取有学习记录的课程
-    query = db.query(Course).join(LearningRecord).filter(
-        LearningRecord.user_id == current_user.id
-    ).distinct()
+    """获取我正在学习的课程（按最近学习时间排序）"""
+    query = db.query(UserCourseProgress).filter(
+        UserCourseProgress.user_id == current_user.id
+    )
     
-    total = query.count()
-    courses = query.offset((page - 1) * page_size).limit(page_size).all()
+    total = get_total(query, [UserCourseProgress], {"user_id": current_user.id}, count)
+    summaries = query.options(joinedload(UserCourseProgress.course)).order_by(
+        UserCourseProgress.last_learn_time.desc(), UserCourseProgress.id.desc()
+    ).offset((page - 1) * page_size).limit(page_size).all()
     
-    # 为每个课程添加学习进度
-    result = []
-    for course in courses:
-        # 计算课程总进度
-        records = db.query(LearningRecord).filter(
-            LearningRecord.user_id == current_user.id,
-            LearningRecord.course_id == course.id
-        ).all()
-        
-        if records:
-            avg_progress = sum(r.progress for r in records) / len(records)
-            completed_count = sum(1 for r in records if r.is_completed)
-        else:
-            avg_progress = 0
-            completed_count = 0
-        
-        result.append({
-            "course": course,
-            "progress": round(avg_progress, 2),
-            "completed_sections": completed_count,
-            "total_sections": len(records),
-            "last_learn_time": max((r.updated_at for r in records), default=None)
-        })
+    result = [
+        {
+            "course": summary.course,
+            "progress": summary.progress,
+            "completed_sections": summary.completed_sections,
+            "total_sections": summary.total_sections,
+            "last_learn_time": summary.last_learn_time
+        }
+        for summary in summaries
+    ]
     
     return {
         "total": total,
@@ -206,6 +272,7 @@ def check_collection(
 def get_my_collections(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
+    count: CountMode = Query(CountMode.EXACT, description="总数统计方式：exact精确(缓存)、estimate估算、none不统计"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -214,7 +281,7 @@ def get_my_collections(
         Collection.user_id == current_user.id
     )
 
-    total = query.count()
+    total = get_total(query, [Course, Collection], {"user_id": current_user.id}, count)
     courses = query.offset((page - 1) * page_size).limit(page_size).all()
 
     return {
@@ -231,21 +298,15 @@ def get_learning_stats(
     db: Session = Depends(get_db)
 ):
     """获取学习统计数据"""
-    # 学习中的课程数
-    learning_courses = db.query(Course.id).join(LearningRecord).filter(
-        LearningRecord.user_id == current_user.id
-    ).distinct().count()
-    
-    # 已完成的小节数
-    completed_sections = db.query(LearningRecord).filter(
-        LearningRecord.user_id == current_user.id,
-        LearningRecord.is_completed == True
-    ).count()
-    
-    # 累计学习时长（秒）
-    total_time = db.query(func.sum(LearningRecord.learning_time)).filter(
-        LearningRecord.user_id == current_user.id
-    ).scalar() or 0
+    # 学习中的课程数、已完成的小节数、累计学习时长（秒）
+    learning_courses, completed_sections, total_time = db.query(
+        func.count(UserCourseProgress.id),
+        func.coalesce(func.sum(UserCourseProgress.completed_sections), 0),
+        func.coalesce(func.sum(UserCourseProgress.learning_time), 0)
+    ).filter(
+        UserCourseProgress.user_id == current_user.id
+    ).one()
+    total_time = int(total_time)
     
     # 收藏的课程数
     collections_count = db.query(Collection).filter(
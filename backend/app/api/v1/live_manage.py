@@ -10,8 +10,8 @@ from app.core.database import get_db
 from app.api.deps import get_current_user
 from app.models.user import User, UserRole
 from app.models.live import Live, LiveStatus
-from app.models.notification import Notification, NotificationType
-from app.models.course_enrollment import CourseEnrollment
+from app.models.notification import NotificationType
+from app.services import notification_service, storage_service
 
 router = APIRouter()
 
@@ -63,29 +63,25 @@ def create_live(
     )
 
     db.add(live)
+    storage_service.acquire_file(db, live.cover_image)
     db.commit()
     db.refresh(live)
 
-    # 如果关联了课程，通知所有报名学员
+    # 如果关联了课程，向所有报名学员广播
     if request.course_id:
-        enrollments = db.query(CourseEnrollment).filter(
-            CourseEnrollment.course_id == request.course_id
-        ).all()
-
-        for enrollment in enrollments:
-            notification = Notification(
-                user_id=enrollment.user_id,
-                type=NotificationType.LIVE,
-                title="直播通知",
-                content=f"您报名的课程即将开始直播：{request.title}",
-                sender_id=current_user.id,
-                course_id=request.course_id,
-                live_id=live.id,
-                link_url=f"/live/{live.id}"
-            )
-            db.add(notification)
-
+        broadcast = notification_service.create_broadcast(
+            db,
+            NotificationType.LIVE,
+            "直播通知",
+            f"您报名的课程即将开始直播：{request.title}",
+            sender_id=current_user.id,
+            target_course_id=request.course_id,
+            course_id=request.course_id,
+            live_id=live.id,
+            link_url=f"/live/{live.id}"
+        )
         db.commit()
+        notification_service.publish_broadcast(db, broadcast)
 
     return {
         "message": "直播创建成功",
@@ -122,12 +118,15 @@ def update_live(
         live.title = request.title
     if request.description is not None:
         live.description = request.description
+    removable = []
     if request.cover_image is not None:
+        removable = storage_service.replace_file(db, live.cover_image, request.cover_image)
         live.cover_image = request.cover_image
     if request.scheduled_time is not None:
         live.scheduled_time = request.scheduled_time
 
     db.commit()
+    storage_service.delete_files(removable)
     db.refresh(live)
 
     return {"message": "直播信息更新成功", "live_id": live.id}
@@ -280,7 +279,9 @@ def delete_live(
     if live.status == LiveStatus.LIVING:
         raise HTTPException(status_code=400, detail="无法删除正在进行的直播")
 
+    removable = storage_service.release_files(db, [live.cover_image])
     db.delete(live)
     db.commit()
+    storage_service.delete_files(removable)
 
     return {"message": "直播删除成功"}
@@ -9,6 +9,8 @@ from app.models.user import User
 from app.models.live_room import LiveRoom, LiveStatus
 from app.schemas.live import LiveRoomCreate, LiveRoomUpdate, LiveRoomResponse
 from app.schemas.common import PageResponse
+from app.services.count_cache import CountMode, get_total
+from app.services import storage_service
 from app.api.deps import get_current_user, require_teacher
 import hashlib
 import time
@@ -42,6 +44,7 @@ def create_live_room(
     )
     
     db.add(db_live)
+    storage_service.acquire_file(db, db_live.cover_image)
     db.commit()
     db.refresh(db_live)
     
@@ -63,6 +66,7 @@ def get_live_rooms(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
     status: Optional[LiveStatus] = None,
+    count: CountMode = Query(CountMode.EXACT, description="总数统计方式：exact精确(缓存)、estimate估算、none不统计"),
     db: Session = Depends(get_db)
 ):
     """获取直播列表"""
@@ -71,7 +75,7 @@ def get_live_rooms(
     if status:
         query = query.filter(LiveRoom.status == status)
     
-    total = query.count()
+    total = get_total(query, [LiveRoom], {"status": status}, count)
     live_rooms = query.order_by(LiveRoom.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
     
     return {
@@ -107,11 +111,14 @@ def update_live_room(
     if live_room.teacher_id != current_user.id and current_user.role.value != "admin":
         raise HTTPException(status_code=403, detail="无权限操作")
     
+    old_cover_image = live_room.cover_image
     update_data = live_in.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(live_room, key, value)
+    removable = storage_service.replace_file(db, old_cover_image, live_room.cover_image)
     
     db.commit()
+    storage_service.delete_files(removable)
     db.refresh(live_room)
     return live_room
 
@@ -130,8 +137,10 @@ def delete_live_room(
     if live_room.teacher_id != current_user.id and current_user.role.value != "admin":
         raise HTTPException(status_code=403, detail="无权限操作")
     
+    removable = storage_service.release_files(db, [live_room.cover_image])
     db.delete(live_room)
     db.commit()
+    storage_service.delete_files(removable)
     return {"message": "直播间删除成功"}
 
 
@@ -0,0 +1,38 @@
+"""
+视频文件访问（替代静态文件挂载，支持拖动进度条所需的 Range 请求）
+"""
+import os
+import stat
+import anyio
+from fastapi import APIRouter, HTTPException, status, Request
+from app.core.config import settings
+from app.utils.media_response import MediaFileResponse
+
+router = APIRouter()
+
+
+def _resolve_video_path(file_path: str) -> str:
+    """访问路径转换为视频目录下的磁盘路径，越出视频目录时抛出404"""
+    base_dir = os.path.realpath(os.path.join(settings.UPLOAD_DIR, 'videos'))
+    full_path = os.path.realpath(os.path.join(base_dir, file_path))
+    if not full_path.startswith(base_dir + os.sep):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="文件不存在")
+    return full_path
+
+
+@router.api_route("/{file_path:path}", methods=["GET", "HEAD"], summary="视频文件", include_in_schema=False)
+async def get_video_file(file_path: str, request: Request):
+    """
+    视频文件（/static/uploads/videos/...）
+    - 支持单个/多个字节范围（Range），If-Range、If-None-Match、If-Modified-Since
+    - 返回 Accept-Ranges、ETag、Last-Modified 和长期缓存头
+    """
+    full_path = _resolve_video_path(file_path)
+    try:
+        stat_result = await anyio.to_thread.run_sync(os.stat, full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="文件不存在")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="文件不存在")
+
+    return MediaFileResponse(full_path, stat_result, request.headers, request.method)
@@ -4,14 +4,17 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
 from datetime import datetime
 
 from app.core.database import get_db
 from app.models.user import User
 from app.models.notification import Notification
+from app.models.broadcast_notification import BroadcastNotification
+from app.models.course_enrollment import CourseEnrollment
 from app.schemas.notification import NotificationCreate, NotificationResponse, NotificationUpdate
 from app.api.deps import get_current_user
+from app.services.count_cache import CountMode, get_total
+from app.services import notification_service
 
 router = APIRouter()
 
@@ -21,31 +24,37 @@ def get_notifications(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     is_read: Optional[bool] = None,
+    cursor: Optional[str] = Query(None, description="游标分页：传空字符串获取第一页，之后传上一页返回的next_cursor"),
+    count: CountMode = Query(CountMode.EXACT, description="总数统计方式：exact精确(缓存)、estimate估算、none不统计"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    获取当前用户的通知列表（分页）
+    获取当前用户的通知列表（分页），合并个人通知和广播通知
+    - cursor: 传入时使用游标分页（忽略page），深翻页开销与第一页相同
+    - 尚未阅读过的广播通知 id 为负数，可直接用于标记已读和删除接口
     """
-    query = db.query(Notification).filter(Notification.user_id == current_user.id)
-
-    # 筛选已读/未读
-    if is_read is not None:
-        query = query.filter(Notification.is_read == is_read)
-
-    # 按创建时间倒序
-    query = query.order_by(desc(Notification.created_at))
-
-    # 分页
-    total = query.count()
-    notifications = query.offset((page - 1) * page_size).limit(page_size).all()
+    params = {"user_id": current_user.id, "is_read": is_read}
+    total = get_total(
+        notification_service.personal_query(db, current_user, is_read), [Notification], params, count
+    )
+    if total is not None and not is_read:
+        total += get_total(
+            notification_service.pending_broadcast_query(db, current_user),
+            [BroadcastNotification, Notification, CourseEnrollment], params, count
+        )
+
+    notifications, next_cursor = notification_service.list_notifications(
+        db, current_user, is_read, page, page_size, cursor
+    )
 
     return {
-        "items": notifications,
+        "items": [NotificationResponse.model_validate(n) for n in notifications],
         "total": total,
         "page": page,
         "page_size": page_size,
-        "pages": (total + page_size - 1) // page_size
+        "pages": (total + page_size - 1) // page_size if total is not None else None,
+        "next_cursor": next_cursor
     }
 
 
@@ -55,12 +64,9 @@ def get_unread_count(
     db: Session = Depends(get_db)
 ):
     """
-    获取当前用户的未读通知数量
+    获取当前用户的未读通知数量（含未读广播）
     """
-    count = db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.is_read == False
-    ).count()
+    count = notification_service.count_unread(db, current_user)
 
     return {"count": count}
 
@@ -72,21 +78,37 @@ def mark_notification_read(
     db: Session = Depends(get_db)
 ):
     """
-    标记单个通知为已读
+    标记单个通知为已读（id 为负数时表示广播通知）
     """
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
+    was_unread = False
+    broadcast_read = False
+    if notification_id < 0:
+        notification, broadcast_read = notification_service.materialize_broadcast(
+            db, current_user, -notification_id, is_read=True
+        )
+    else:
+        notification = db.query(Notification).filter(
+            Notification.id == notification_id,
+            Notification.user_id == current_user.id,
+            Notification.is_deleted == False
+        ).first()
 
     if not notification:
         raise HTTPException(status_code=404, detail="通知不存在")
 
     if not notification.is_read:
+        was_unread = True
         notification.is_read = True
         notification.read_at = datetime.now()
-        db.commit()
-        db.refresh(notification)
+    db.commit()
+    db.refresh(notification)
+
+    if was_unread:
+        notification_service.incr_unread([current_user.id], -1)
+    if broadcast_read:
+        notification_service.decr_broadcast_unread(db, current_user.id)
+    if was_unread or broadcast_read:
+        notification_service.publish_unread_count(db, current_user)
 
     return notification
 
@@ -97,17 +119,21 @@ def mark_all_read(
     db: Session = Depends(get_db)
 ):
     """
-    标记当前用户的所有通知为已读
+    标记当前用户的所有通知为已读（含广播通知）
     """
     updated_count = db.query(Notification).filter(
         Notification.user_id == current_user.id,
-        Notification.is_read == False
+        Notification.is_read == False,
+        Notification.is_deleted == False
     ).update({
         "is_read": True,
         "read_at": datetime.now()
     }, synchronize_session=False)
+    updated_count += notification_service.mark_broadcasts_read(db, current_user)
 
     db.commit()
+    notification_service.clear_unread(db, current_user.id)
+    notification_service.publish_unread_count(db, current_user)
 
     return {
         "message": "所有通知已标记为已读",
@@ -122,19 +148,38 @@ def delete_notification(
     db: Session = Depends(get_db)
 ):
     """
-    删除单个通知
+    删除单个通知（id 为负数时表示广播通知）
     """
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
+    broadcast_deleted = False
+    if notification_id < 0:
+        notification, broadcast_deleted = notification_service.materialize_broadcast(
+            db, current_user, -notification_id, is_deleted=True
+        )
+    else:
+        notification = db.query(Notification).filter(
+            Notification.id == notification_id,
+            Notification.user_id == current_user.id,
+            Notification.is_deleted == False
+        ).first()
 
     if not notification:
         raise HTTPException(status_code=404, detail="通知不存在")
 
-    db.delete(notification)
+    was_unread = not broadcast_deleted and not notification.is_read
+    if notification.broadcast_id:
+        # 广播通知保留记录并标记删除，避免再次出现在列表中
+        notification.is_deleted = True
+    else:
+        db.delete(notification)
     db.commit()
 
+    if was_unread:
+        notification_service.incr_unread([current_user.id], -1)
+    if broadcast_deleted:
+        notification_service.decr_broadcast_unread(db, current_user.id)
+    if was_unread or broadcast_deleted:
+        notification_service.publish_unread_count(db, current_user)
+
     return {"message": "通知已删除"}
 
 
@@ -155,5 +200,7 @@ def create_notification(
     db.add(notification)
     db.commit()
     db.refresh(notification)
+    notification_service.incr_unread([notification.user_id])
+    notification_service.publish_notifications(db, [notification])
 
     return notification
@@ -1,12 +1,21 @@
 """
 文件上传API
 """
+import asyncio
+import json
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Path, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.core.database import get_db, SessionLocal
 from app.models.user import User
 from app.api.deps import get_current_user
-from app.utils.file_utils import save_upload_file, is_allowed_file
+from app.utils.file_utils import is_allowed_file, UploadTooLargeError, UnsupportedFileTypeError
 from app.core.config import settings
+from app.schemas.upload import UploadSessionCreate, UploadHashCheck
+from app.services import upload_session_service, storage_service, image_variants
+from app.services.upload_session_service import UploadSessionError
 
 router = APIRouter()
 
@@ -14,7 +23,8 @@ router = APIRouter()
 @router.post("/image", summary="上传图片")
 async def upload_image(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     上传图片（支持：jpg, jpeg, png, gif, webp）
@@ -26,36 +36,35 @@ async def upload_image(
             detail=f"不支持的图片格式，仅支持：{settings.ALLOWED_IMAGE_TYPES}"
         )
     
-    # 检查文件大小
-    content = await file.read()
-    await file.seek(0)  # 重置文件指针
+    # 保存文件（分块写入，超过大小限制时中止；内容已存在时不重复存储）
+    try:
+        saved = await storage_service.store_upload(db, file, file_type='image')
+    except (UploadTooLargeError, UnsupportedFileTypeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    if len(content) > settings.MAX_UPLOAD_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"文件大小超过限制（{settings.MAX_UPLOAD_SIZE / 1024 / 1024}MB）"
-        )
-    
-    # 保存文件
-    file_path = await save_upload_file(file, file_type='image')
-    
-    if not file_path:
+    if not saved:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="文件保存失败"
         )
     
+    # 后台生成缩略图和WebP/AVIF衍生图
+    image_variants.submit(saved.url)
+    
     return {
-        "url": file_path,
+        "url": saved.url,
         "filename": file.filename,
-        "size": len(content)
+        "size": saved.size,
+        "sha256": saved.sha256,
+        "deduplicated": saved.deduplicated
     }
 
 
 @router.post("/video", summary="上传视频")
 async def upload_video(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     上传视频（支持：mp4, avi, mov, flv）
@@ -67,52 +76,91 @@ async def upload_video(
             detail=f"不支持的视频格式，仅支持：{settings.ALLOWED_VIDEO_TYPES}"
         )
     
-    # 保存文件
-    file_path = await save_upload_file(file, file_type='video')
+    # 保存文件（分块写入，超过大小限制时中止；内容已存在时不重复存储）
+    try:
+        saved = await storage_service.store_upload(db, file, file_type='video')
+    except (UploadTooLargeError, UnsupportedFileTypeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    if not file_path:
+    if not saved:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="文件保存失败"
         )
     
     return {
-        "url": file_path,
+        "url": saved.url,
         "filename": file.filename,
+        "size": saved.size,
+        "sha256": saved.sha256,
+        "deduplicated": saved.deduplicated,
         "message": "视频上传成功，如需转码请使用转码接口"
     }
 
 
+async def _store_batch_image(index: int, file: UploadFile, semaphore: asyncio.Semaphore) -> dict:
+    """保存批量上传中的一个文件，返回该文件的结果（并发执行，每个文件使用独立的数据库会话）"""
+    result = {"index": index, "filename": file.filename}
+    if not is_allowed_file(file.filename, 'image'):
+        result["error"] = "不支持的格式"
+        return result
+
+    async with semaphore:
+        db = SessionLocal()
+        try:
+            saved = await storage_service.store_upload(db, file, file_type='image')
+        except Exception as e:
+            result["error"] = str(e)
+            return result
+        finally:
+            db.close()
+
+    if not saved:
+        result["error"] = "保存失败"
+        return result
+
+    image_variants.submit(saved.url)
+    result.update({
+        "url": saved.url,
+        "size": saved.size,
+        "sha256": saved.sha256,
+        "deduplicated": saved.deduplicated
+    })
+    return result
+
+
 @router.post("/images", summary="批量上传图片")
 async def upload_images(
     files: List[UploadFile] = File(...),
+    stream: bool = Query(False, description="逐个返回结果（NDJSON，每个文件完成即返回一行）"),
     current_user: User = Depends(get_current_user)
 ):
     """
-    批量上传图片
+    批量上传图片（并发处理，同时处理的文件数由 UPLOAD_BATCH_CONCURRENCY 限制）
+    - 按文件头识别类型，改了扩展名的非图片文件会被拒绝
+    - stream=true 时以 application/x-ndjson 返回：每个文件完成即输出一行结果（含 index、error），最后一行为汇总
     """
-    uploaded_files = []
-    errors = []
-    
-    for file in files:
-        try:
-            if not is_allowed_file(file.filename, 'image'):
-                errors.append(f"{file.filename}: 不支持的格式")
-                continue
-            
-            file_path = await save_upload_file(file, file_type='image')
-            
-            if file_path:
-                uploaded_files.append({
-                    "url": file_path,
-                    "filename": file.filename
-                })
-            else:
-                errors.append(f"{file.filename}: 保存失败")
-        
-        except Exception as e:
-            errors.append(f"{file.filename}: {str(e)}")
-    
+    semaphore = asyncio.Semaphore(settings.UPLOAD_BATCH_CONCURRENCY)
+    tasks = [asyncio.ensure_future(_store_batch_image(index, file, semaphore)) for index, file in enumerate(files)]
+
+    if stream:
+        async def iter_results():
+            success_count = 0
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                success_count += "error" not in result
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            yield json.dumps({"total": len(files), "success_count": success_count}, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(iter_results(), media_type="application/x-ndjson")
+
+    results = await asyncio.gather(*tasks)
+    uploaded_files = [
+        {key: value for key, value in result.items() if key != "index"}
+        for result in results if "error" not in result
+    ]
+    errors = [f"{result['filename']}: {result['error']}" for result in results if "error" in result]
+
     return {
         "uploaded": uploaded_files,
         "errors": errors,
@@ -121,3 +169,123 @@ async def upload_images(
     }
 
 
+@router.post("/check", summary="按哈希秒传")
+def check_uploaded_file(
+    request: UploadHashCheck,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    上传前先提交文件的SHA-256，内容已存储时直接返回访问地址（无需再上传）
+    - exists为false时按正常流程上传
+    """
+    if not is_allowed_file(request.filename, request.file_type):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="不支持的文件格式")
+
+    saved = storage_service.claim_by_hash(db, request.sha256, request.file_type, request.filename)
+    if not saved:
+        return {"exists": False}
+
+    return {
+        "exists": True,
+        "url": saved.url,
+        "filename": saved.filename,
+        "size": saved.size,
+        "sha256": saved.sha256
+    }
+
+
+def _session_error(e: UploadSessionError) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@router.post("/video/sessions", summary="创建视频分片上传会话")
+def create_video_upload_session(
+    request: UploadSessionCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    创建视频分片上传会话（断点续传、多连接并行上传）
+
+    流程：创建会话 -> 并行 PUT 各分片 -> 查询缺失分片并补传 -> 完成合并
+    """
+    try:
+        return upload_session_service.create_session(
+            current_user.id, request.filename, request.size, request.chunk_size
+        )
+    except UploadSessionError as e:
+        raise _session_error(e)
+
+
+@router.get("/video/sessions/{session_id}", summary="查询分片上传进度")
+def get_video_upload_session(
+    session_id: str = Path(..., pattern="^[0-9a-f]{32}$"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    查询已接收和缺失的分片（断线重连后据此补传）
+    """
+    try:
+        return upload_session_service.get_session(session_id, current_user.id)
+    except UploadSessionError as e:
+        raise _session_error(e)
+
+
+@router.put("/video/sessions/{session_id}/chunks/{index}", summary="上传分片")
+async def upload_video_chunk(
+    request: Request,
+    index: int = Path(..., ge=0),
+    session_id: str = Path(..., pattern="^[0-9a-f]{32}$"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    上传单个分片，请求体为分片原始字节（application/octet-stream）
+    - 除最后一个分片外，分片大小必须等于会话的 chunk_size
+    - 同一分片可重复上传（覆盖），不同分片可并行上传
+    """
+    try:
+        return await upload_session_service.write_chunk(session_id, current_user.id, index, request.stream())
+    except UploadSessionError as e:
+        raise _session_error(e)
+
+
+@router.post("/video/sessions/{session_id}/complete", summary="完成分片上传")
+async def complete_video_upload_session(
+    session_id: str = Path(..., pattern="^[0-9a-f]{32}$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    合并全部分片为视频文件（内核零拷贝拼接），返回与普通视频上传相同格式的结果
+    """
+    try:
+        saved = await run_in_threadpool(upload_session_service.complete_session, db, session_id, current_user.id)
+    except UploadSessionError as e:
+        raise _session_error(e)
+
+    return {
+        "url": saved.url,
+        "filename": saved.filename,
+        "size": saved.size,
+        "sha256": saved.sha256,
+        "deduplicated": saved.deduplicated,
+        "message": "视频上传成功，如需转码请使用转码接口"
+    }
+
+
+@router.delete("/video/sessions/{session_id}", summary="取消分片上传")
+def abort_video_upload_session(
+    session_id: str = Path(..., pattern="^[0-9a-f]{32}$"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    取消上传并删除已上传的分片
+    """
+    try:
+        upload_session_service.abort_session(session_id, current_user.id)
+    except UploadSessionError as e:
+        raise _session_error(e)
+
+    return {"message": "上传已取消"}
+
+
@@ -1,9 +1,12 @@
 """
 钱包相关API
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from decimal import Decimal
+from typing import List, Optional, Union
 from app.core.database import get_db
 from app.api.deps import get_current_user, require_admin
 from app.models.user import User
@@ -13,6 +16,11 @@ from app.models.course_enrollment import CourseEnrollment
 from app.schemas.wallet import (
     WalletResponse, RechargeRequest, PurchaseCourseRequest, TransactionResponse
 )
+from app.schemas.common import PageResponse
+from app.utils.pagination import paginate_by_cursor
+from app.services import wallet_service, course_cache
+from app.services.wallet_service import InsufficientBalanceError, IdempotencyKeyReusedError
+from app.services.idempotency import idempotent_request
 
 router = APIRouter()
 
@@ -23,14 +31,10 @@ def get_my_wallet(
     db: Session = Depends(get_db)
 ):
     """获取当前用户钱包"""
-    wallet = db.query(Wallet).filter(Wallet.user_id == current_user.id).first()
-
-    if not wallet:
-        # 如果钱包不存在，创建一个
-        wallet = Wallet(user_id=current_user.id, balance=0.0)
-        db.add(wallet)
-        db.commit()
-        db.refresh(wallet)
+    # 如果钱包不存在，创建一个
+    wallet = wallet_service.get_or_create_wallet(db, current_user.id)
+    db.commit()
+    db.refresh(wallet)
 
     return wallet
 
@@ -38,50 +42,64 @@ def get_my_wallet(
 @router.post("/recharge", response_model=TransactionResponse)
 def recharge_wallet(
     request: RechargeRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=64),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """充值钱包"""
-    # 获取或创建钱包
-    wallet = db.query(Wallet).filter(Wallet.user_id == current_user.id).first()
-    if not wallet:
-        wallet = Wallet(user_id=current_user.id, balance=0.0)
-        db.add(wallet)
-        db.flush()
-
-    # 记录充值前余额
-    balance_before = wallet.balance
-
-    # 充值
-    wallet.balance += request.amount
-
-    # 创建交易记录
-    transaction = Transaction(
-        wallet_id=wallet.id,
-        user_id=current_user.id,
-        type=TransactionType.RECHARGE,
-        amount=request.amount,
-        balance_before=balance_before,
-        balance_after=wallet.balance,
-        description=f"充值 ¥{request.amount}"
-    )
-
-    db.add(transaction)
-    db.commit()
-    db.refresh(transaction)
+    """
+    充值钱包
+    - Idempotency-Key: 可选，重试时携带相同的值只会充值一次，返回首次的交易记录
+    """
+    with idempotent_request("wallet:recharge", current_user.id, idempotency_key, request) as idem:
+        if idem.replay is not None:
+            return idem.replay
+
+        try:
+            transaction, _ = wallet_service.credit(
+                db, current_user.id, request.amount, TransactionType.RECHARGE,
+                f"充值 ¥{wallet_service.to_amount(request.amount)}", idempotency_key=idempotency_key
+            )
+        except IdempotencyKeyReusedError as e:
+            db.rollback()
+            raise HTTPException(status_code=422, detail=str(e))
+        db.commit()
+        db.refresh(transaction)
 
-    return transaction
+        return idem.save(TransactionResponse.model_validate(transaction))
 
 
 @router.post("/purchase-course", response_model=TransactionResponse)
 def purchase_course(
     request: PurchaseCourseRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=64),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """购买课程"""
+    """
+    购买课程
+    - Idempotency-Key: 可选，重试时携带相同的值只会扣款一次，返回首次的交易记录
+    """
+    with idempotent_request("wallet:purchase", current_user.id, idempotency_key, request) as idem:
+        if idem.replay is not None:
+            return idem.replay
+
+        transaction = _purchase_course(db, current_user, request.course_id, idempotency_key)
+        return idem.save(TransactionResponse.model_validate(transaction))
+
+
+def _purchase_course(db: Session, current_user: User, course_id: int, idempotency_key: Optional[str]) -> Transaction:
+    """扣款并报名课程，返回购买交易"""
+    # 响应缓存失效后的重试，按交易表幂等键返回首次购买同一课程的交易
+    if idempotency_key:
+        transaction = wallet_service.get_transaction_by_key(db, current_user.id, idempotency_key)
+        if transaction:
+            try:
+                return wallet_service.check_replay(transaction, TransactionType.PURCHASE, course_id)
+            except IdempotencyKeyReusedError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+
     # 查询课程
-    course = db.query(Course).filter(Course.id == request.course_id).first()
+    course = db.query(Course).filter(Course.id == course_id).first()
     if not course:
         raise HTTPException(status_code=404, detail="课程不存在")
 
@@ -94,61 +112,74 @@ def purchase_course(
     if existing_enrollment:
         raise HTTPException(status_code=400, detail="您已经报名过该课程")
 
-    # 获取钱包
-    wallet = db.query(Wallet).filter(Wallet.user_id == current_user.id).first()
-    if not wallet:
-        wallet = Wallet(user_id=current_user.id, balance=0.0)
-        db.add(wallet)
+    # 扣款（余额不足时不做任何修改）
+    try:
+        transaction, created = wallet_service.debit(
+            db, current_user.id, course.price, TransactionType.PURCHASE,
+            f"购买课程: {course.title}", course_id=course.id, idempotency_key=idempotency_key
+        )
+    except InsufficientBalanceError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IdempotencyKeyReusedError as e:
+        db.rollback()
+        raise HTTPException(status_code=422, detail=str(e))
+    if not created:
+        db.commit()
+        return transaction
+
+    # 创建课程报名记录（唯一约束防止并发重复报名，冲突时连同扣款一起回滚）
+    try:
+        db.add(CourseEnrollment(
+            user_id=current_user.id,
+            course_id=course.id
+        ))
         db.flush()
-
-    # 检查余额
-    if wallet.balance < course.price:
-        raise HTTPException(status_code=400, detail=f"余额不足，需要 ¥{course.price}，当前余额 ¥{wallet.balance}")
-
-    # 扣款
-    balance_before = wallet.balance
-    wallet.balance -= course.price
-
-    # 创建交易记录
-    transaction = Transaction(
-        wallet_id=wallet.id,
-        user_id=current_user.id,
-        type=TransactionType.PURCHASE,
-        amount=-course.price,
-        balance_before=balance_before,
-        balance_after=wallet.balance,
-        description=f"购买课程: {course.title}",
-        course_id=course.id
-    )
-    db.add(transaction)
-
-    # 创建课程报名记录
-    enrollment = CourseEnrollment(
-        user_id=current_user.id,
-        course_id=course.id
-    )
-    db.add(enrollment)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="您已经报名过该课程")
 
     # 增加课程学生数
-    course.student_count += 1
+    db.execute(
+        update(Course)
+        .where(Course.id == course.id)
+        .values(student_count=Course.student_count + 1, updated_at=Course.updated_at)
+        .execution_options(synchronize_session=False)
+    )
 
     db.commit()
     db.refresh(transaction)
+    course_cache.invalidate_course(course.id)
 
     return transaction
 
 
-@router.get("/transactions", response_model=List[TransactionResponse])
+@router.get("/transactions", response_model=Union[PageResponse[TransactionResponse], List[TransactionResponse]])
 def get_my_transactions(
     skip: int = 0,
     limit: int = 20,
+    cursor: Optional[str] = Query(None, description="游标分页：传空字符串获取第一页，之后传上一页返回的next_cursor"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取我的交易记录"""
-    transactions = db.query(Transaction).filter(
+    """
+    获取我的交易记录
+    - 不传cursor: 按skip/limit分页，返回交易记录数组
+    - 传cursor: 游标分页（每页limit条），返回带next_cursor的分页结构
+    """
+    query = db.query(Transaction).filter(
         Transaction.user_id == current_user.id
-    ).order_by(Transaction.created_at.desc()).offset(skip).limit(limit).all()
+    )
+
+    if cursor is not None:
+        transactions, next_cursor = paginate_by_cursor(query, Transaction, cursor, limit)
+        return {
+            "page_size": limit,
+            "items": transactions,
+            "next_cursor": next_cursor
+        }
+
+    transactions = query.order_by(Transaction.created_at.desc()).offset(skip).limit(limit).all()
 
     return transactions
 
@@ -156,40 +187,40 @@ def get_my_transactions(
 @router.post("/admin/add-balance/{user_id}", response_model=TransactionResponse)
 def admin_add_balance(
     user_id: int,
-    amount: float,
+    amount: Decimal = Query(..., max_digits=12, decimal_places=2, description="金额（负数为扣减）"),
     description: str = "管理员充值",
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=64),
     current_admin: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """管理员给用户添加余额"""
+    payload = {"user_id": user_id, "amount": amount, "description": description}
+    with idempotent_request("wallet:admin-add", current_admin.id, idempotency_key, payload) as idem:
+        if idem.replay is not None:
+            return idem.replay
+
+        transaction = _admin_add_balance(db, user_id, amount, description, idempotency_key)
+        return idem.save(TransactionResponse.model_validate(transaction))
+
+
+def _admin_add_balance(db: Session, user_id: int, amount: Decimal, description: str, idempotency_key: Optional[str]) -> Transaction:
+    """调整用户余额，返回交易记录"""
     # 查询用户
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
 
-    # 获取或创建钱包
-    wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
-    if not wallet:
-        wallet = Wallet(user_id=user_id, balance=0.0)
-        db.add(wallet)
-        db.flush()
-
-    # 添加余额
-    balance_before = wallet.balance
-    wallet.balance += amount
-
-    # 创建交易记录
-    transaction = Transaction(
-        wallet_id=wallet.id,
-        user_id=user_id,
-        type=TransactionType.ADMIN_ADD,
-        amount=amount,
-        balance_before=balance_before,
-        balance_after=wallet.balance,
-        description=description
-    )
-
-    db.add(transaction)
+    # 调整余额并创建交易记录（扣减时不允许余额为负）
+    try:
+        transaction, _ = wallet_service.apply_transaction(
+            db, user_id, amount, TransactionType.ADMIN_ADD, description, idempotency_key=idempotency_key
+        )
+    except InsufficientBalanceError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IdempotencyKeyReusedError as e:
+        db.rollback()
+        raise HTTPException(status_code=422, detail=str(e))
     db.commit()
     db.refresh(transaction)
 
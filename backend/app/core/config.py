@@ -33,6 +33,22 @@ class Settings(BaseSettings):
     # 文件上传配置
     UPLOAD_DIR: str = "./static/uploads"
     MAX_UPLOAD_SIZE: int = 1073741824  # 1GB
+    UPLOAD_CHUNK_SIZE: int = 1048576  # 流式写入分块大小 1MB
+    UPLOAD_BATCH_CONCURRENCY: int = 8  # 批量上传时同时处理的文件数
+    UPLOAD_SESSION_CHUNK_SIZE: int = 8388608  # 分片上传默认分片大小 8MB
+    UPLOAD_SESSION_TTL: int = 86400  # 分片上传会话闲置过期时间（秒）
+    UPLOAD_SESSION_CLEANUP_INTERVAL: int = 3600  # 过期会话清理间隔（秒）
+    
+    # 图片衍生图配置（需要安装 Pillow）
+    IMAGE_VARIANT_SIZES: str = "thumb:320,medium:960"  # 名称:最长边像素
+    IMAGE_VARIANT_FORMATS: str = "webp,avif"  # AVIF 需要 Pillow 支持（或安装 pillow-avif-plugin）
+    IMAGE_VARIANT_QUALITY: int = 80
+    IMAGE_VARIANT_WORKERS: int = 2  # 生成衍生图的进程数
+
+    # 视频文件访问（Range 请求）
+    MEDIA_CACHE_MAX_AGE: int = 31536000  # 浏览器/CDN缓存时间（秒），文件按内容哈希命名，内容不会变化
+    MEDIA_CHUNK_SIZE: int = 262144  # 不支持 sendfile 时分块读取大小 256KB
+    MEDIA_MAX_RANGES: int = 16  # 单个请求最多的字节范围数，超过时返回完整文件
     ALLOWED_IMAGE_TYPES: str = "jpg,jpeg,png,gif,webp"
     ALLOWED_VIDEO_TYPES: str = "mp4,avi,mov,flv"
     
@@ -48,6 +64,38 @@ class Settings(BaseSettings):
     DEFAULT_PAGE_SIZE: int = 10
     MAX_PAGE_SIZE: int = 100
     
+    # 列表总数缓存配置（秒）
+    COUNT_CACHE_TTL: int = 30
+    COUNT_ESTIMATE_TTL: int = 300
+    
+    # 浏览次数写回间隔（秒）
+    VIEW_COUNT_FLUSH_INTERVAL: int = 60
+    
+    # 学习进度缓冲写回间隔（秒）
+    LEARNING_PROGRESS_FLUSH_INTERVAL: int = 5
+    
+    # 课程评分核对间隔（秒）
+    RATING_RECONCILE_INTERVAL: int = 3600
+    
+    # 评论点赞写回间隔（秒）
+    COMMENT_LIKE_FLUSH_INTERVAL: int = 10
+    
+    # 未读通知数缓存过期时间（秒）
+    NOTIFICATION_UNREAD_TTL: int = 86400
+    # 重建后未通过复核的未读数缓存过期时间（秒）
+    NOTIFICATION_UNREAD_REBUILD_TTL: int = 60
+    
+    # Socket.IO 进程间消息队列（多进程部署时配置，如 redis://localhost:6379/0）
+    SOCKETIO_MESSAGE_QUEUE: Optional[str] = None
+    
+    # 幂等请求配置（Idempotency-Key）
+    IDEMPOTENCY_KEY_TTL: int = 86400  # 首次响应保存时间（秒）
+    IDEMPOTENCY_LOCK_TTL: int = 30  # 处理中标记过期时间（秒）
+    
+    # 课程响应缓存配置
+    COURSE_CACHE_TTL: int = 300  # 秒
+    COURSE_CACHE_SIZE: int = 512  # 进程内LRU容量
+    
     @validator("BACKEND_CORS_ORIGINS", pre=True)
     def assemble_cors_origins(cls, v):
         """解析CORS origins"""
@@ -0,0 +1,70 @@
+"""
+后台周期任务
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+
+@dataclass
+class PeriodicTask:
+    """周期任务"""
+    name: str
+    func: Callable[[], object]
+    interval: float
+    run_on_shutdown: bool = True
+    task: Optional[asyncio.Task] = None
+
+
+_tasks: List[PeriodicTask] = []
+
+
+def register_periodic_task(
+    name: str,
+    func: Callable[[], object],
+    interval: float,
+    run_on_shutdown: bool = True
+) -> None:
+    """
+    注册周期任务（需在应用启动前调用）
+
+    Args:
+        name: 任务名称
+        func: 同步函数，在线程池中执行
+        interval: 执行间隔（秒）
+        run_on_shutdown: 应用关闭时是否再执行一次（用于写回缓冲数据）
+    """
+    _tasks.append(PeriodicTask(name=name, func=func, interval=interval, run_on_shutdown=run_on_shutdown))
+
+
+async def _run_forever(periodic: PeriodicTask) -> None:
+    while True:
+        await asyncio.sleep(periodic.interval)
+        try:
+            await asyncio.to_thread(periodic.func)
+        except Exception as e:
+            print(f"周期任务 {periodic.name} 执行失败: {e}")
+
+
+async def start_periodic_tasks() -> None:
+    """启动所有周期任务"""
+    for periodic in _tasks:
+        if periodic.task is None:
+            periodic.task = asyncio.create_task(_run_forever(periodic))
+
+
+async def stop_periodic_tasks() -> None:
+    """停止所有周期任务，并执行需要在关闭时写回的任务"""
+    running = [periodic.task for periodic in _tasks if periodic.task is not None]
+    for task in running:
+        task.cancel()
+    await asyncio.gather(*running, return_exceptions=True)
+    for periodic in _tasks:
+        periodic.task = None
+
+    for periodic in _tasks:
+        if periodic.run_on_shutdown:
+            try:
+                await asyncio.to_thread(periodic.func)
+            except Exception as e:
+                print(f"周期任务 {periodic.name} 关闭时执行失败: {e}")
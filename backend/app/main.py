@@ -7,8 +7,16 @@ from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
 from app.api.v1 import auth, courses, chapters, categories, lives, upload, comments, learning, banners, notifications
 from app.api.v1 import settings as settings_api
-from app.api.v1 import wallet, admin, live_manage
+from app.api.v1 import wallet, admin, live_manage, media
 from app.websocket import sio
+from app.core.tasks import register_periodic_task, start_periodic_tasks, stop_periodic_tasks
+from app.services.view_counter import flush_view_counts
+from app.services.progress_buffer import flush_progress_buffer
+from app.services.rating_service import reconcile_course_ratings
+from app.services.comment_like_service import flush_comment_likes
+from app.services.upload_session_service import cleanup_stale_upload_sessions
+from app.services import push_service, image_variants
+import asyncio
 import socketio
 
 # 创建FastAPI应用
@@ -32,6 +40,9 @@ app.add_middleware(
     allow_origin_regex=r"http://192\.168\.0\.102:\d+"
 )
 
+# 视频文件（支持 Range / 条件请求），需在静态文件挂载之前注册
+app.include_router(media.router, prefix="/static/uploads/videos", tags=["视频文件"])
+
 # 挂载静态文件
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -52,6 +63,28 @@ app.include_router(admin.router, prefix="/api/v1/admin", tags=["管理员"])
 app.include_router(live_manage.router, prefix="/api/v1/live-manage", tags=["直播管理"])
 
 
+# 后台周期任务
+register_periodic_task("flush_view_counts", flush_view_counts, settings.VIEW_COUNT_FLUSH_INTERVAL)
+register_periodic_task("flush_learning_progress", flush_progress_buffer, settings.LEARNING_PROGRESS_FLUSH_INTERVAL)
+register_periodic_task("flush_comment_likes", flush_comment_likes, settings.COMMENT_LIKE_FLUSH_INTERVAL)
+register_periodic_task("reconcile_course_ratings", reconcile_course_ratings, settings.RATING_RECONCILE_INTERVAL, run_on_shutdown=False)
+register_periodic_task("cleanup_upload_sessions", cleanup_stale_upload_sessions, settings.UPLOAD_SESSION_CLEANUP_INTERVAL, run_on_shutdown=False)
+
+
+@app.on_event("startup")
+async def startup():
+    """启动后台任务"""
+    push_service.bind_event_loop(asyncio.get_running_loop())
+    await start_periodic_tasks()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """停止后台任务并写回缓冲数据"""
+    await stop_periodic_tasks()
+    await asyncio.to_thread(image_variants.shutdown)
+
+
 @app.get("/")
 def root():
     """根路径"""
@@ -10,10 +10,15 @@ from app.models.section import Section
 from app.models.learning_record import LearningRecord
 from app.models.collection import Collection
 from app.models.comment import Comment
+from app.models.comment_like import CommentLike
 from app.models.live_room import LiveRoom, LiveChatMessage
 from app.models.banner import Banner
 from app.models.operation_log import OperationLog
 from app.models.course_enrollment import CourseEnrollment
+from app.models.course_search import CourseSearchTerm
+from app.models.user_course_progress import UserCourseProgress
+from app.models.broadcast_notification import BroadcastNotification
+from app.models.stored_file import StoredFile
 
 __all__ = [
     "Base",
@@ -25,11 +30,16 @@ __all__ = [
     "LearningRecord",
     "Collection",
     "Comment",
+    "CommentLike",
     "LiveRoom",
     "LiveChatMessage",
     "Banner",
     "OperationLog",
     "CourseEnrollment",
+    "CourseSearchTerm",
+    "UserCourseProgress",
+    "BroadcastNotification",
+    "StoredFile",
 ]
 
 
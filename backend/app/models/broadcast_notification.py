@@ -0,0 +1,30 @@
+"""
+广播通知模型
+"""
+from sqlalchemy import Column, Integer, String, Enum, TIMESTAMP, Text, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+from app.models.notification import NotificationType
+
+
+class BroadcastNotification(Base):
+    """广播通知表（每条广播只存一行，用户阅读/删除时才生成个人通知记录）"""
+    __tablename__ = "broadcast_notifications"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    type = Column(Enum(NotificationType), nullable=False, comment="通知类型")
+    title = Column(String(200), nullable=False, comment="通知标题")
+    content = Column(Text, nullable=True, comment="通知内容")
+    link_url = Column(String(500), nullable=True, comment="跳转链接")
+    target_course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=True, index=True, comment="接收范围：课程报名学员，为空表示全部用户")
+    sender_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, comment="发送者ID")
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="SET NULL"), nullable=True, comment="关联课程ID")
+    live_id = Column(Integer, nullable=True, comment="关联直播ID")
+    created_at = Column(TIMESTAMP, server_default=func.now(), comment="创建时间")
+
+    __table_args__ = (
+        Index('idx_broadcast_notifications_created', 'created_at', 'id'),
+    )
+
+    def __repr__(self):
+        return f"<BroadcastNotification(id={self.id}, title='{self.title}', target_course_id={self.target_course_id})>"
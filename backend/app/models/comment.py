@@ -1,7 +1,7 @@
 """
 评论模型
 """
-from sqlalchemy import Column, Integer, Boolean, TIMESTAMP, Text, ForeignKey
+from sqlalchemy import Column, Integer, Boolean, TIMESTAMP, Text, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -21,6 +21,11 @@ class Comment(Base):
     is_deleted = Column(Boolean, default=False, comment="是否删除")
     created_at = Column(TIMESTAMP, server_default=func.now(), comment="创建时间")
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), comment="更新时间")
+
+    __table_args__ = (
+        # 游标分页：按课程（及父评论）倒序扫描
+        Index('idx_comments_course_created', 'course_id', 'parent_id', 'created_at', 'id'),
+    )
     
     # 关系
     user = relationship("User", back_populates="comments")
@@ -0,0 +1,23 @@
+"""
+评论点赞模型
+"""
+from sqlalchemy import Column, Integer, TIMESTAMP, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class CommentLike(Base):
+    """评论点赞表"""
+    __tablename__ = "comment_likes"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    comment_id = Column(Integer, ForeignKey("comments.id", ondelete="CASCADE"), nullable=False, comment="评论ID")
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True, comment="用户ID")
+    created_at = Column(TIMESTAMP, server_default=func.now(), comment="点赞时间")
+    
+    __table_args__ = (
+        UniqueConstraint('comment_id', 'user_id', name='unique_comment_user'),
+    )
+    
+    def __repr__(self):
+        return f"<CommentLike(comment_id={self.comment_id}, user_id={self.user_id})>"
@@ -1,7 +1,7 @@
 """
 课程模型
 """
-from sqlalchemy import Column, Integer, String, Boolean, Enum, TIMESTAMP, Text, ForeignKey, DECIMAL
+from sqlalchemy import Column, Integer, String, Boolean, Enum, TIMESTAMP, Text, ForeignKey, DECIMAL, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -40,9 +40,16 @@ class Course(Base):
     student_count = Column(Integer, default=0, comment="学习人数")
     rating = Column(DECIMAL(3, 2), default=0.00, comment="评分")
     rating_count = Column(Integer, default=0, comment="评分人数")
+    rating_sum = Column(Integer, default=0, comment="评分总和")
     view_count = Column(Integer, default=0, comment="浏览次数")
     created_at = Column(TIMESTAMP, server_default=func.now(), index=True, comment="创建时间")
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), comment="更新时间")
+
+    __table_args__ = (
+        # 游标分页：前台按状态倒序扫描，后台（show_all）按时间倒序扫描
+        Index('idx_courses_status_created', 'status', 'created_at', 'id'),
+        Index('idx_courses_created', 'created_at', 'id'),
+    )
     
     # 关系
     category = relationship("Category", back_populates="courses")
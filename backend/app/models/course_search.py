@@ -0,0 +1,17 @@
+"""
+课程搜索索引模型
+"""
+from sqlalchemy import Column, Integer, String, ForeignKey
+from app.core.database import Base
+
+
+class CourseSearchTerm(Base):
+    """课程搜索倒排索引表"""
+    __tablename__ = "course_search_terms"
+
+    term = Column(String(64), primary_key=True, comment="词项")
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), primary_key=True, index=True, comment="课程ID")
+    weight = Column(Integer, default=0, nullable=False, comment="权重(按字段加权的词频)")
+
+    def __repr__(self):
+        return f"<CourseSearchTerm(term='{self.term}', course_id={self.course_id}, weight={self.weight})>"
@@ -1,7 +1,7 @@
 """
 通知模型
 """
-from sqlalchemy import Column, Integer, String, Boolean, Enum, TIMESTAMP, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Enum, TIMESTAMP, Text, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -30,6 +30,8 @@ class Notification(Base):
     sender_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, comment="发送者ID")
     course_id = Column(Integer, ForeignKey("courses.id", ondelete="SET NULL"), nullable=True, comment="关联课程ID")
     live_id = Column(Integer, ForeignKey("live_rooms.id", ondelete="SET NULL"), nullable=True, comment="关联直播ID")
+    broadcast_id = Column(Integer, ForeignKey("broadcast_notifications.id", ondelete="CASCADE"), nullable=True, comment="来源广播ID")
+    is_deleted = Column(Boolean, default=False, comment="是否删除（广播通知删除后保留记录，避免再次出现）")
     created_at = Column(TIMESTAMP, server_default=func.now(), index=True, comment="创建时间")
     read_at = Column(TIMESTAMP, nullable=True, comment="阅读时间")
 
@@ -39,5 +41,12 @@ class Notification(Base):
     course = relationship("Course")
     live = relationship("LiveRoom")
 
+    __table_args__ = (
+        # 游标分页：按用户倒序扫描
+        Index('idx_notifications_user_created', 'user_id', 'created_at', 'id'),
+        # 每条广播对每个用户最多生成一条个人通知
+        UniqueConstraint('user_id', 'broadcast_id', name='unique_user_broadcast'),
+    )
+
     def __repr__(self):
         return f"<Notification(id={self.id}, user_id={self.user_id}, title='{self.title}', is_read={self.is_read})>"
@@ -0,0 +1,23 @@
+"""
+上传文件存储模型（按内容哈希去重）
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, TIMESTAMP
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class StoredFile(Base):
+    """上传文件表（相同内容只存储一份，按引用计数管理）"""
+    __tablename__ = "stored_files"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    sha256 = Column(String(64), unique=True, nullable=False, comment="内容SHA-256")
+    file_type = Column(String(20), nullable=False, comment="文件类型(image/video)")
+    url = Column(String(255), nullable=False, index=True, comment="访问路径")
+    size = Column(BigInteger, nullable=False, comment="文件大小(字节)")
+    ref_count = Column(Integer, nullable=False, default=0, comment="被实体字段引用的次数（课程封面、小节视频等）")
+    created_at = Column(TIMESTAMP, server_default=func.now(), comment="创建时间")
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), comment="更新时间")
+    
+    def __repr__(self):
+        return f"<StoredFile(sha256='{self.sha256}', ref_count={self.ref_count})>"
@@ -0,0 +1,36 @@
+"""
+用户课程进度汇总模型
+"""
+from sqlalchemy import Column, Integer, Float, TIMESTAMP, ForeignKey, UniqueConstraint, Index
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+
+
+class UserCourseProgress(Base):
+    """用户课程进度汇总表（由学习记录增量维护）"""
+    __tablename__ = "user_course_progress"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, comment="用户ID")
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=False, index=True, comment="课程ID")
+    progress = Column(Float, default=0, comment="课程进度百分比(0-100)")
+    progress_sum = Column(Integer, default=0, comment="各小节进度之和")
+    learned_sections = Column(Integer, default=0, comment="有学习记录的小节数")
+    completed_sections = Column(Integer, default=0, comment="已完成小节数")
+    total_sections = Column(Integer, default=0, comment="课程总小节数")
+    learning_time = Column(Integer, default=0, comment="累计学习时长(秒)")
+    last_learn_time = Column(TIMESTAMP, nullable=True, comment="最后学习时间")
+    created_at = Column(TIMESTAMP, server_default=func.now(), comment="创建时间")
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), comment="更新时间")
+    
+    # 关系
+    course = relationship("Course")
+    
+    __table_args__ = (
+        UniqueConstraint('user_id', 'course_id', name='unique_user_course_progress'),
+        Index('idx_user_course_progress_recent', 'user_id', 'last_learn_time'),
+    )
+    
+    def __repr__(self):
+        return f"<UserCourseProgress(user_id={self.user_id}, course_id={self.course_id}, progress={self.progress}%)>"
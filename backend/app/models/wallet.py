@@ -1,7 +1,7 @@
 """
 用户钱包模型
 """
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, Numeric, String, DateTime, ForeignKey, Text, Enum, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -22,7 +22,7 @@ class Wallet(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False, index=True, comment="用户ID")
-    balance = Column(Float, default=0.0, comment="余额")
+    balance = Column(Numeric(12, 2), nullable=False, default=0, comment="余额")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -39,14 +39,22 @@ class Transaction(Base):
     wallet_id = Column(Integer, ForeignKey("wallets.id"), nullable=False, index=True, comment="钱包ID")
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True, comment="用户ID")
     type = Column(Enum(TransactionType), nullable=False, comment="交易类型")
-    amount = Column(Float, nullable=False, comment="交易金额")
-    balance_before = Column(Float, nullable=False, comment="交易前余额")
-    balance_after = Column(Float, nullable=False, comment="交易后余额")
+    amount = Column(Numeric(12, 2), nullable=False, comment="交易金额")
+    balance_before = Column(Numeric(12, 2), nullable=False, comment="交易前余额")
+    balance_after = Column(Numeric(12, 2), nullable=False, comment="交易后余额")
     description = Column(Text, comment="交易描述")
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=True, comment="关联课程ID")
+    idempotency_key = Column(String(64), nullable=True, comment="幂等键（同一钱包内唯一）")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # 关系
     wallet = relationship("Wallet", back_populates="transactions")
     user = relationship("User")
     course = relationship("Course")
+
+    __table_args__ = (
+        # 游标分页：按用户倒序扫描
+        Index('idx_transactions_user_created', 'user_id', 'created_at', 'id'),
+        # 重试的请求携带相同幂等键，只会记账一次
+        UniqueConstraint('wallet_id', 'idempotency_key', name='uq_transactions_wallet_key'),
+    )
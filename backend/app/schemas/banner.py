@@ -1,7 +1,7 @@
 """
 Banner Schema
 """
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 
@@ -34,6 +34,9 @@ class BannerResponse(BannerBase):
     id: int
     created_at: datetime
     updated_at: datetime
+    image_variants: Optional[Dict[str, Dict[str, str]]] = Field(
+        None, description="图片衍生图：尺寸 -> {格式: URL}，尚未生成时为空"
+    )
 
     class Config:
         from_attributes = True
@@ -21,6 +21,7 @@ class CommentCreate(CommentBase):
 class CommentUpdate(BaseModel):
     """更新评论Schema"""
     content: Optional[str] = Field(None, min_length=1)
+    rating: Optional[int] = Field(None, ge=1, le=5, description="评分(1-5)，传null取消评分")
 
 
 class CommentResponse(CommentBase):
@@ -38,6 +39,7 @@ class CommentResponse(CommentBase):
     username: Optional[str] = None
     user_avatar: Optional[str] = None
     replies: List["CommentResponse"] = []
+    reply_count: int = Field(default=0, description="回复总数（with_replies模式）")
     
     class Config:
         from_attributes = True
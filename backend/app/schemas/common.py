@@ -24,10 +24,11 @@ class PageParams(BaseModel):
 
 class PageResponse(BaseModel, Generic[T]):
     """分页响应模型"""
-    total: int = Field(description="总数")
-    page: int = Field(description="当前页")
+    total: Optional[int] = Field(default=None, description="总数（游标分页时可能不返回）")
+    page: Optional[int] = Field(default=None, description="当前页（游标分页时为空）")
     page_size: int = Field(description="每页数量")
     items: List[T] = Field(description="数据列表")
+    next_cursor: Optional[str] = Field(default=None, description="下一页游标（游标分页时返回，没有更多数据时为空）")
 
 
 class MessageResponse(BaseModel):
@@ -1,7 +1,7 @@
 """
 课程Schema
 """
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from pydantic import BaseModel, Field
 from decimal import Decimal
@@ -54,6 +54,9 @@ class CourseResponse(CourseBase):
     teacher_name: Optional[str] = None
     category_name: Optional[str] = None
     chapter_count: Optional[int] = None
+    cover_image_variants: Optional[Dict[str, Dict[str, str]]] = Field(
+        None, description="封面衍生图：尺寸 -> {格式: URL}，尚未生成时为空"
+    )
     
     class Config:
         from_attributes = True
@@ -30,6 +30,7 @@ class NotificationResponse(NotificationBase):
     id: int
     user_id: int
     is_read: bool
+    broadcast_id: Optional[int] = None
     created_at: datetime
     read_at: Optional[datetime] = None
 
@@ -0,0 +1,21 @@
+"""
+文件上传Schema
+"""
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+
+
+class UploadSessionCreate(BaseModel):
+    """创建分片上传会话Schema"""
+    filename: str = Field(..., min_length=1, max_length=255, description="原始文件名")
+    size: int = Field(..., gt=0, description="文件总大小(字节)")
+    chunk_size: Optional[int] = Field(
+        None, ge=1024 * 1024, le=64 * 1024 * 1024, description="分片大小(字节)，默认8MB，最后一个分片可以更小"
+    )
+
+
+class UploadHashCheck(BaseModel):
+    """按哈希秒传Schema"""
+    sha256: str = Field(..., pattern="^[0-9a-f]{64}$", description="文件内容SHA-256（小写十六进制）")
+    file_type: Literal["image", "video"] = Field(..., description="文件类型")
+    filename: str = Field(..., min_length=1, max_length=255, description="原始文件名")
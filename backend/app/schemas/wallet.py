@@ -4,6 +4,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
+from decimal import Decimal
 from app.models.wallet import TransactionType
 
 
@@ -25,7 +26,7 @@ class WalletResponse(WalletBase):
 
 class RechargeRequest(BaseModel):
     """充值请求Schema"""
-    amount: float = Field(..., gt=0, description="充值金额")
+    amount: Decimal = Field(..., gt=0, max_digits=12, decimal_places=2, description="充值金额")
 
 
 class PurchaseCourseRequest(BaseModel):
@@ -0,0 +1,218 @@
+"""
+评论点赞
+
+点赞关系保存在Redis的每条评论一个集合中（按用户去重），点赞/取消只写Redis；
+待写入的点赞关系和点赞数增量由周期任务批量写入 comment_likes 和 comments.like_count。
+Redis不可用时直接写数据库（唯一约束去重 + 原子 UPDATE）。
+"""
+import uuid
+from collections import Counter
+from typing import Dict, Tuple
+import redis
+from sqlalchemy import case, insert, delete, update, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models.comment import Comment
+from app.models.comment_like import CommentLike
+from app.services.redis_service import redis_service
+
+
+LIKE_SET_PREFIX = "comment:likes:"
+DELTA_KEY = "comment:likes:delta"
+OPS_KEY = "comment:likes:ops"
+# 集合中的占位成员，表示已从数据库加载（用户ID从1开始）
+_LOADED_MARKER = 0
+
+
+def _set_key(comment_id: int) -> str:
+    return f"{LIKE_SET_PREFIX}{comment_id}"
+
+
+def _ensure_loaded(db: Session, comment_id: int) -> None:
+    """首次访问时把数据库中的点赞用户加载到Redis集合"""
+    key = _set_key(comment_id)
+    if redis_service.exists(key):
+        return
+    user_ids = [row[0] for row in db.query(CommentLike.user_id).filter(CommentLike.comment_id == comment_id).all()]
+    redis_service.sadd(key, _LOADED_MARKER, *user_ids)
+
+
+def get_like_count(comment: Comment) -> int:
+    """
+    获取评论点赞数（已写入数据库的点赞数 + 待写入的增量）
+
+    Args:
+        comment: 评论
+
+    Returns:
+        int: 点赞数
+    """
+    try:
+        pending = int(redis_service.hget(DELTA_KEY, str(comment.id)) or 0)
+    except redis.RedisError:
+        pending = 0
+    return (comment.like_count or 0) + pending
+
+
+def _change(db: Session, comment: Comment, user_id: int, liked: bool) -> bool:
+    try:
+        _ensure_loaded(db, comment.id)
+        key = _set_key(comment.id)
+        if liked:
+            changed = redis_service.sadd(key, user_id) > 0
+        else:
+            changed = redis_service.srem(key, user_id) > 0
+        if changed:
+            redis_service.hincrby(DELTA_KEY, str(comment.id), 1 if liked else -1)
+            redis_service.hset(OPS_KEY, f"{comment.id}:{user_id}", 1 if liked else -1)
+        return changed
+    except redis.RedisError as e:
+        print(f"Redis 点赞写入失败，直接写数据库: {e}")
+        return _change_in_db(db, comment, user_id, liked)
+
+
+def _change_in_db(db: Session, comment: Comment, user_id: int, liked: bool) -> bool:
+    if liked:
+        try:
+            db.add(CommentLike(comment_id=comment.id, user_id=user_id))
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            return False
+    else:
+        deleted = db.query(CommentLike).filter(
+            CommentLike.comment_id == comment.id,
+            CommentLike.user_id == user_id
+        ).delete(synchronize_session=False)
+        if not deleted:
+            return False
+
+    db.execute(
+        update(Comment)
+        .where(Comment.id == comment.id)
+        .values(like_count=Comment.like_count + (1 if liked else -1), updated_at=Comment.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    db.refresh(comment)
+    return True
+
+
+def like(db: Session, comment: Comment, user_id: int) -> bool:
+    """
+    点赞评论
+
+    Args:
+        db: 数据库会话
+        comment: 评论
+        user_id: 用户ID
+
+    Returns:
+        bool: 是否新增了点赞（已点赞过返回False）
+    """
+    return _change(db, comment, user_id, True)
+
+
+def unlike(db: Session, comment: Comment, user_id: int) -> bool:
+    """
+    取消点赞
+
+    Args:
+        db: 数据库会话
+        comment: 评论
+        user_id: 用户ID
+
+    Returns:
+        bool: 是否取消了点赞（未点赞过返回False）
+    """
+    return _change(db, comment, user_id, False)
+
+
+def _take(key: str) -> Dict[str, str]:
+    """原子取出哈希的全部内容（多个工作进程同时写回时只有一个能取到）"""
+    flushing_key = f"{key}:flushing:{uuid.uuid4().hex}"
+    if not redis_service.rename(key, flushing_key):
+        return {}
+    values = redis_service.hgetall(flushing_key)
+    redis_service.delete(flushing_key)
+    return values
+
+
+def _restore(deltas: Dict[str, str], ops: Dict[str, str]) -> None:
+    """写回失败时放回（不覆盖之后新产生的操作）"""
+    for comment_id, delta in deltas.items():
+        redis_service.hincrby(DELTA_KEY, comment_id, int(delta))
+    for field, op in ops.items():
+        redis_service.hset(OPS_KEY, field, op, only_if_missing=True)
+
+
+def flush_comment_likes() -> Dict[int, int]:
+    """
+    将待写入的点赞批量写入数据库
+
+    点赞数增量按实际新增/删除的点赞关系计算，重复的操作不会重复计数。
+
+    Returns:
+        Dict[int, int]: 评论ID -> 点赞数增量
+    """
+    try:
+        deltas = _take(DELTA_KEY)
+        ops = _take(OPS_KEY)
+    except redis.RedisError as e:
+        print(f"Redis 读取点赞数据失败: {e}")
+        return {}
+    if not ops:
+        return {}
+
+    pairs: Dict[Tuple[int, int], int] = {}
+    for field, op in ops.items():
+        comment_id, user_id = field.split(":")
+        pairs[(int(comment_id), int(user_id))] = int(op)
+
+    db = SessionLocal()
+    try:
+        existing = set(
+            db.query(CommentLike.comment_id, CommentLike.user_id)
+            .filter(tuple_(CommentLike.comment_id, CommentLike.user_id).in_(pairs.keys()))
+            .all()
+        )
+        to_insert = [pair for pair, op in pairs.items() if op > 0 and pair not in existing]
+        to_delete = [pair for pair, op in pairs.items() if op < 0 and pair in existing]
+
+        like_deltas = Counter()
+        if to_insert:
+            db.execute(
+                insert(CommentLike)
+                .values([{"comment_id": comment_id, "user_id": user_id} for comment_id, user_id in to_insert])
+                .prefix_with("IGNORE", dialect="mysql")
+                .prefix_with("OR IGNORE", dialect="sqlite")
+            )
+            like_deltas.update(comment_id for comment_id, _ in to_insert)
+        if to_delete:
+            db.execute(
+                delete(CommentLike)
+                .where(tuple_(CommentLike.comment_id, CommentLike.user_id).in_(to_delete))
+                .execution_options(synchronize_session=False)
+            )
+            like_deltas.subtract(comment_id for comment_id, _ in to_delete)
+
+        like_deltas = {comment_id: delta for comment_id, delta in like_deltas.items() if delta}
+        if like_deltas:
+            db.execute(
+                update(Comment)
+                .where(Comment.id.in_(like_deltas.keys()))
+                .values(
+                    like_count=Comment.like_count + case(like_deltas, value=Comment.id, else_=0),
+                    updated_at=Comment.updated_at
+                )
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+        return like_deltas
+    except Exception:
+        db.rollback()
+        _restore(deltas, ops)
+        raise
+    finally:
+        db.close()
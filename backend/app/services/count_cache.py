@@ -0,0 +1,194 @@
+"""
+列表总数缓存服务
+
+列表接口的 COUNT 结果按“表 + 规范化筛选参数”缓存，短时间内过期；
+每张表维护一个版本号，事务提交时写入过的表会递增版本号，使相关缓存失效。
+优先使用Redis，Redis不可用时退化为进程内缓存。
+
+按用户统计的高频写入表（UNCACHED_TABLES）不使用精确计数缓存：任一用户写入都会
+使整张表的缓存失效，几乎不会命中，而按 user_id 索引直接计数本身很便宜。
+这些表也不维护版本号。
+"""
+import enum
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.redis_service import redis_service
+
+
+class CountMode(str, enum.Enum):
+    """总数统计方式"""
+    EXACT = "exact"        # 精确计数（写入时失效的缓存）
+    ESTIMATE = "estimate"  # 估算（允许短时间内过期，无筛选时使用表统计信息）
+    NONE = "none"          # 不统计总数
+
+
+# 进程内缓存：key -> (过期时间, 值)
+_local_cache: Dict[str, Tuple[float, int]] = {}
+_local_versions: Dict[str, int] = {}
+_lock = threading.Lock()
+
+# 按用户统计且写入频繁的表：精确计数直接查询，不缓存也不维护版本号
+UNCACHED_TABLES = frozenset({"notifications", "user_course_progress", "collections"})
+
+
+def _version_key(table: str) -> str:
+    return f"count:version:{table}"
+
+
+def get_table_version(table: str) -> int:
+    """
+    获取表的版本号
+
+    Args:
+        table: 表名
+
+    Returns:
+        int: 版本号
+    """
+    try:
+        return int(redis_service.get(_version_key(table)) or 0)
+    except Exception:
+        return _local_versions.get(table, 0)
+
+
+def invalidate_tables(tables: Iterable[str]) -> None:
+    """
+    递增表的版本号，使该表相关的计数缓存全部失效
+
+    Args:
+        tables: 表名列表
+    """
+    for table in tables:
+        if table in UNCACHED_TABLES:
+            continue
+        with _lock:
+            _local_versions[table] = _local_versions.get(table, 0) + 1
+        try:
+            redis_service.incr(_version_key(table))
+        except Exception as e:
+            print(f"Redis incr error: {e}")
+
+
+def _cache_get(key: str) -> Optional[int]:
+    try:
+        value = redis_service.get(key)
+        return int(value) if value is not None else None
+    except Exception:
+        entry = _local_cache.get(key)
+        if entry and entry[0] > time.time():
+            return entry[1]
+        return None
+
+
+def _cache_set(key: str, value: int, expire: int) -> None:
+    if not redis_service.set(key, value, expire=expire):
+        now = time.time()
+        with _lock:
+            if len(_local_cache) > 10000:
+                for k in [k for k, (expires, _) in _local_cache.items() if expires <= now]:
+                    del _local_cache[k]
+            _local_cache[key] = (now + expire, value)
+
+
+def _estimate_table_rows(db: Session, table: str) -> Optional[int]:
+    """从MySQL的表统计信息中读取估算行数"""
+    if db.get_bind().dialect.name != "mysql":
+        return None
+    return db.execute(
+        text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+        ),
+        {"table": table}
+    ).scalar()
+
+
+def get_total(
+    query,
+    models: Iterable[Any],
+    params: Dict[str, Any],
+    mode: CountMode = CountMode.EXACT
+) -> Optional[int]:
+    """
+    获取列表总数
+
+    Args:
+        query: 已添加筛选条件的查询
+        models: 查询涉及的模型（其中任意一张表写入都会使缓存失效；
+            包含 UNCACHED_TABLES 中的表时精确计数不缓存）
+        params: 影响结果的筛选参数
+        mode: 统计方式
+
+    Returns:
+        Optional[int]: 总数，mode为none时返回None
+    """
+    if mode == CountMode.NONE:
+        return None
+
+    tables = sorted(model.__tablename__ for model in models)
+    filters = {k: v for k, v in params.items() if v is not None}
+
+    if mode == CountMode.ESTIMATE:
+        if not filters and len(tables) == 1:
+            estimated = _estimate_table_rows(query.session, tables[0])
+            if estimated is not None:
+                return estimated
+        version = "estimate"
+        expire = settings.COUNT_ESTIMATE_TTL
+    elif UNCACHED_TABLES.intersection(tables):
+        return query.count()
+    else:
+        version = ".".join(str(get_table_version(table)) for table in tables)
+        expire = settings.COUNT_CACHE_TTL
+
+    digest = hashlib.sha1(
+        json.dumps(filters, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    key = f"count:{'+'.join(tables)}:{version}:{digest}"
+
+    total = _cache_get(key)
+    if total is None:
+        total = query.count()
+        _cache_set(key, total, expire)
+    return total
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_flushed_tables(session, flush_context):
+    """记录本次事务中写入过的表"""
+    tables = session.info.setdefault("count_cache_tables", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table:
+            tables.add(table)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _collect_bulk_tables(orm_execute_state):
+    """记录 query.update() / query.delete() 等批量写入的表"""
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            orm_execute_state.session.info.setdefault("count_cache_tables", set()).add(
+                mapper.local_table.name
+            )
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_committed_tables(session):
+    """事务提交后使相关计数缓存失效"""
+    tables = session.info.pop("count_cache_tables", None)
+    if tables:
+        invalidate_tables(tables)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_tables(session):
+    session.info.pop("count_cache_tables", None)
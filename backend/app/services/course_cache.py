@@ -0,0 +1,168 @@
+"""
+课程响应缓存
+
+两级缓存：进程内LRU + Redis。每门课程有一个版本号，课程或章节/小节
+发生修改时递增版本号，旧版本的缓存随之失效（各进程的LRU也会在下次读取时发现）。
+缓存未命中时通过Redis锁保证只有一个工作进程重建同一个键，避免缓存击穿。
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from app.core.config import settings
+from app.services.redis_service import redis_service
+
+
+# 等待其他进程重建缓存的轮询间隔与次数
+_WAIT_INTERVAL = 0.05
+_WAIT_ATTEMPTS = 40
+_LOCK_EXPIRE = 10
+
+# 进程内LRU：(namespace, course_id) -> (version, 过期时间, 数据)
+_local: "OrderedDict[Tuple[str, int], Tuple[int, float, Any]]" = OrderedDict()
+_local_versions: Dict[int, int] = {}
+_lock = threading.Lock()
+_build_locks: Dict[Tuple[str, int], threading.Lock] = {}
+
+
+def _version_key(course_id: int) -> str:
+    return f"course:version:{course_id}"
+
+
+def _data_key(namespace: str, course_id: int) -> str:
+    return f"course:{namespace}:{course_id}"
+
+
+def get_version(course_id: int) -> int:
+    """
+    获取课程缓存版本号
+
+    Args:
+        course_id: 课程ID
+
+    Returns:
+        int: 版本号
+    """
+    try:
+        return int(redis_service.get(_version_key(course_id)) or 0)
+    except Exception:
+        return _local_versions.get(course_id, 0)
+
+
+def invalidate_course(course_id: int) -> None:
+    """
+    使课程的所有缓存失效（课程、章节、小节修改后调用）
+
+    Args:
+        course_id: 课程ID
+    """
+    with _lock:
+        _local_versions[course_id] = _local_versions.get(course_id, 0) + 1
+        for key in [key for key in _local if key[1] == course_id]:
+            del _local[key]
+    try:
+        redis_service.incr(_version_key(course_id))
+    except Exception as e:
+        print(f"Redis incr error: {e}")
+
+
+def _local_get(key: Tuple[str, int], version: int) -> Optional[Any]:
+    with _lock:
+        entry = _local.get(key)
+        if entry is None:
+            return None
+        entry_version, expires, data = entry
+        if entry_version != version or expires < time.time():
+            del _local[key]
+            return None
+        _local.move_to_end(key)
+        return data
+
+
+def _local_set(key: Tuple[str, int], version: int, data: Any) -> None:
+    with _lock:
+        _local[key] = (version, time.time() + settings.COURSE_CACHE_TTL, data)
+        _local.move_to_end(key)
+        while len(_local) > settings.COURSE_CACHE_SIZE:
+            _local.popitem(last=False)
+
+
+def _redis_get(namespace: str, course_id: int, version: int) -> Optional[Any]:
+    try:
+        entry = redis_service.get(_data_key(namespace, course_id))
+    except Exception:
+        return None
+    if isinstance(entry, dict) and entry.get("version") == version:
+        return entry.get("data")
+    return None
+
+
+def get_or_build(
+    namespace: str,
+    course_id: int,
+    builder: Callable[[], Optional[Any]]
+) -> Tuple[Optional[Any], int]:
+    """
+    读取缓存，未命中时重建
+
+    Args:
+        namespace: 缓存类别（如 detail、curriculum）
+        course_id: 课程ID
+        builder: 重建函数，返回可JSON序列化的数据；返回None表示不存在（不缓存）
+
+    Returns:
+        Tuple[Optional[Any], int]: (数据, 版本号)
+    """
+    key = (namespace, course_id)
+    # 版本号在构建之前读取：构建期间若有修改，写入的缓存会因版本落后而失效
+    version = get_version(course_id)
+
+    data = _local_get(key, version)
+    if data is not None:
+        return data, version
+
+    data = _redis_get(namespace, course_id, version)
+    if data is not None:
+        _local_set(key, version, data)
+        return data, version
+
+    with _lock:
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+
+    with build_lock:
+        data = _local_get(key, version)
+        if data is not None:
+            return data, version
+
+        lock_key = f"{_data_key(namespace, course_id)}:lock"
+        try:
+            acquired = redis_service.set_nx(lock_key, 1, _LOCK_EXPIRE)
+        except Exception:
+            acquired = True
+
+        if not acquired:
+            # 其他工作进程正在重建，等待其结果
+            for _ in range(_WAIT_ATTEMPTS):
+                time.sleep(_WAIT_INTERVAL)
+                data = _redis_get(namespace, course_id, version)
+                if data is not None:
+                    _local_set(key, version, data)
+                    return data, version
+
+        try:
+            data = builder()
+            if data is not None:
+                _local_set(key, version, data)
+                redis_service.set(
+                    _data_key(namespace, course_id),
+                    {"version": version, "data": data},
+                    expire=settings.COURSE_CACHE_TTL
+                )
+        finally:
+            if acquired:
+                try:
+                    redis_service.delete(lock_key)
+                except Exception:
+                    pass
+
+    return data, version
@@ -0,0 +1,120 @@
+"""
+请求幂等（Idempotency-Key）
+
+客户端超时重试时携带相同的 Idempotency-Key，首次成功的响应保存在Redis中，
+重复请求直接返回保存的响应，不再执行事务。同一键的请求正在处理时返回409；
+同一键用于不同的请求内容时返回422。处理失败的请求不保存，可以用同一键重试。
+
+Redis不可用时不做拦截，钱包记账仍由交易表的幂等键唯一约束保证只记一次。
+"""
+import hashlib
+import json
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+import redis
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from app.core.config import settings
+from app.services.redis_service import redis_service
+
+
+KEY_PREFIX = "idempotency:"
+_PENDING = "pending"
+
+
+class IdempotentRequest:
+    """幂等请求上下文"""
+
+    def __init__(self, redis_key: Optional[str], fingerprint: str):
+        self.redis_key = redis_key
+        self.fingerprint = fingerprint
+        # 重复请求时为首次保存的响应
+        self.replay: Optional[Any] = None
+        self.saved = False
+
+    def save(self, response: Any) -> Any:
+        """
+        保存首次成功的响应
+
+        Args:
+            response: 响应数据（Schema对象或可JSON序列化的数据）
+
+        Returns:
+            Any: 原样返回 response
+        """
+        if self.redis_key:
+            record = {"fingerprint": self.fingerprint, "response": jsonable_encoder(response)}
+            self.saved = redis_service.set(self.redis_key, record, expire=settings.IDEMPOTENCY_KEY_TTL)
+        return response
+
+
+def _fingerprint(payload: Any) -> str:
+    data = json.dumps(jsonable_encoder(payload), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def idempotent_request(scope: str, user_id: int, key: Optional[str], payload: Any = None) -> Iterator[IdempotentRequest]:
+    """
+    幂等请求上下文管理器
+
+    用法::
+
+        with idempotent_request("wallet:recharge", user.id, idempotency_key, request) as idem:
+            if idem.replay is not None:
+                return idem.replay
+            ...
+            return idem.save(TransactionResponse.model_validate(transaction))
+
+    Args:
+        scope: 接口标识
+        user_id: 用户ID（幂等键按用户隔离）
+        key: 客户端传入的 Idempotency-Key，为空时不做处理
+        payload: 请求内容（用于校验同一键是否用于不同请求）
+
+    Yields:
+        IdempotentRequest: 幂等请求上下文
+
+    Raises:
+        HTTPException: 同一键的请求正在处理（409）或请求内容不同（422）
+    """
+    fingerprint = _fingerprint(payload)
+    if not key:
+        yield IdempotentRequest(None, fingerprint)
+        return
+
+    redis_key = f"{KEY_PREFIX}{scope}:{user_id}:{key}"
+    try:
+        acquired = redis_service.set_nx(
+            redis_key, json.dumps({"fingerprint": fingerprint, "response": _PENDING}),
+            settings.IDEMPOTENCY_LOCK_TTL
+        )
+        record = None if acquired else redis_service.get(redis_key)
+    except redis.RedisError as e:
+        print(f"Redis 幂等检查失败，跳过: {e}")
+        yield IdempotentRequest(None, fingerprint)
+        return
+
+    if not acquired:
+        if not isinstance(record, dict):
+            # 键刚好过期，按正在处理返回，由客户端重试
+            raise HTTPException(status_code=409, detail="相同请求正在处理中，请稍后重试")
+        if record.get("fingerprint") != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key 已用于其他请求")
+        if record.get("response") == _PENDING:
+            raise HTTPException(status_code=409, detail="相同请求正在处理中，请稍后重试")
+        idem = IdempotentRequest(None, fingerprint)
+        idem.replay = record["response"]
+        yield idem
+        return
+
+    idem = IdempotentRequest(redis_key, fingerprint)
+    try:
+        yield idem
+    finally:
+        if not idem.saved:
+            # 失败或未保存时释放，允许使用同一键重试
+            try:
+                redis_service.delete(redis_key)
+            except redis.RedisError:
+                pass
@@ -0,0 +1,180 @@
+"""
+图片衍生图（缩略图 + WebP/AVIF）
+
+上传图片后提交到后台进程池生成缩略图，不占用请求处理时间。衍生图与原图放在同一目录，
+按固定规则命名，原图 /static/uploads/images/ab/cd/{name}.png 的衍生图为：
+    /static/uploads/images/ab/cd/{name}_{尺寸}.{格式}   如 {name}_thumb.webp
+
+尺寸和格式由 IMAGE_VARIANT_SIZES、IMAGE_VARIANT_FORMATS 配置；Pillow 未安装或不支持的格式自动跳过。
+"""
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.utils.file_utils import to_local_path
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow 未安装时不生成衍生图
+    Image = None
+
+try:
+    import pillow_avif  # noqa: F401  注册 AVIF 编码器（Pillow 11.2 之前需要）
+except ImportError:
+    pass
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_sizes() -> List[Tuple[str, int]]:
+    """
+    衍生图尺寸配置
+
+    Returns:
+        List[Tuple[str, int]]: (名称, 最长边像素)
+    """
+    sizes = []
+    for item in settings.IMAGE_VARIANT_SIZES.split(','):
+        name, _, edge = item.strip().partition(':')
+        sizes.append((name, int(edge)))
+    return sizes
+
+
+def get_formats() -> List[str]:
+    """
+    当前环境可生成的衍生图格式
+
+    Returns:
+        List[str]: 格式（扩展名）
+    """
+    if Image is None:
+        return []
+    formats = []
+    for fmt in settings.IMAGE_VARIANT_FORMATS.split(','):
+        fmt = fmt.strip().lower()
+        if fmt == 'webp' and features.check('webp'):
+            formats.append(fmt)
+        elif fmt == 'avif' and 'AVIF' in Image.SAVE:
+            formats.append(fmt)
+    return formats
+
+
+def variant_url(url: str, size: str, fmt: str) -> str:
+    """
+    衍生图访问路径
+
+    Args:
+        url: 原图访问路径
+        size: 尺寸名称（如 thumb）
+        fmt: 格式（如 webp）
+
+    Returns:
+        str: 衍生图访问路径
+    """
+    stem, _ = os.path.splitext(url)
+    return f"{stem}_{size}.{fmt}"
+
+
+def get_variants(url: Optional[str]) -> Optional[Dict[str, Dict[str, str]]]:
+    """
+    查询已生成的衍生图
+
+    Args:
+        url: 原图访问路径
+
+    Returns:
+        Optional[Dict[str, Dict[str, str]]]: 尺寸 -> {格式: 访问路径}，尚未生成时返回None
+    """
+    if not url or not url.startswith('/static/uploads/images/'):
+        return None
+    variants = {}
+    for size, _ in get_sizes():
+        urls = {}
+        for fmt in settings.IMAGE_VARIANT_FORMATS.split(','):
+            fmt = fmt.strip().lower()
+            candidate = variant_url(url, size, fmt)
+            if os.path.exists(to_local_path(candidate)):
+                urls[fmt] = candidate
+        if urls:
+            variants[size] = urls
+    return variants or None
+
+
+def generate_variants(path: str, sizes: List[Tuple[str, int]], formats: List[str]) -> List[str]:
+    """
+    生成一张图片的衍生图（在工作进程中执行，已存在的衍生图跳过）
+
+    Args:
+        path: 原图磁盘路径
+        sizes: (名称, 最长边像素)
+        formats: 输出格式
+
+    Returns:
+        List[str]: 新生成的衍生图路径
+    """
+    stem, _ = os.path.splitext(path)
+    targets = [
+        (size, edge, fmt, f"{stem}_{size}.{fmt}")
+        for size, edge in sizes for fmt in formats
+        if not os.path.exists(f"{stem}_{size}.{fmt}")
+    ]
+    if not targets:
+        return []
+
+    created = []
+    with Image.open(path) as image:
+        image.seek(0)  # 动图取第一帧
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        for size, edge, fmt, target in targets:
+            variant = image.copy()
+            # 只缩小不放大，保持宽高比
+            variant.thumbnail((edge, edge))
+            temp_path = f"{target}.part"
+            variant.save(temp_path, format=fmt.upper(), quality=settings.IMAGE_VARIANT_QUALITY)
+            os.replace(temp_path, target)
+            created.append(target)
+    return created
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _executor
+
+
+def _log_failure(future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        print(f"生成衍生图失败: {future.exception()}")
+
+
+def submit(url: str) -> Optional[Future]:
+    """
+    提交衍生图生成任务（立即返回，不等待生成完成）
+
+    Args:
+        url: 原图访问路径
+
+    Returns:
+        Optional[Future]: 任务，当前环境不支持生成时返回None
+    """
+    formats = get_formats()
+    if not formats or not url.startswith('/static/uploads/images/'):
+        return None
+    future = _get_executor().submit(generate_variants, to_local_path(url), get_sizes(), formats)
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def shutdown() -> None:
+    """关闭进程池（应用关闭时调用，等待进行中的任务完成）"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,308 @@
+"""
+学习记录服务
+"""
+from typing import Callable, Dict, Iterable, List, Tuple
+from sqlalchemy import or_, func, case, exists, tuple_, update
+from sqlalchemy.orm import Session
+from app.models.chapter import Chapter
+from app.models.section import Section
+from app.models.learning_record import LearningRecord
+from app.models.user_course_progress import UserCourseProgress
+
+
+# 重建汇总时每条 upsert 语句写入的行数
+PROGRESS_UPSERT_BATCH = 1000
+
+
+def get_section_courses(db: Session, section_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    一次查询获取小节所属的课程
+
+    Args:
+        db: 数据库会话
+        section_ids: 小节ID列表
+
+    Returns:
+        Dict[int, int]: 小节ID -> 课程ID（不存在的小节不在结果中）
+    """
+    section_ids = set(section_ids)
+    if not section_ids:
+        return {}
+    rows = db.query(Section.id, Chapter.course_id).join(
+        Chapter, Chapter.id == Section.chapter_id
+    ).filter(Section.id.in_(section_ids)).all()
+    return {section_id: course_id for section_id, course_id in rows}
+
+
+def _upsert(
+    db: Session,
+    model,
+    rows: List[dict],
+    key_columns: List[str],
+    build_set: Callable,
+    merge: Callable
+) -> None:
+    """
+    使用数据库原生 upsert 批量写入：MySQL 为 ON DUPLICATE KEY UPDATE，
+    SQLite/PostgreSQL 为 ON CONFLICT DO UPDATE；其他数据库逐条合并
+
+    Args:
+        db: 数据库会话
+        model: 模型类
+        rows: 记录列表
+        key_columns: 唯一键列名
+        build_set: 参数为新值列集合(inserted/excluded)，返回 列名 -> 更新表达式
+        merge: 逐条合并时调用，参数为 (已有对象, 新记录)
+    """
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(model).values(rows)
+        stmt = stmt.on_duplicate_key_update(**build_set(stmt.inserted))
+        db.execute(stmt)
+        return
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(model).values(rows)
+        stmt = stmt.on_conflict_do_update(index_elements=key_columns, set_=build_set(stmt.excluded))
+        db.execute(stmt)
+        return
+
+    for row in rows:
+        obj = db.query(model).filter_by(**{key: row[key] for key in key_columns}).first()
+        if obj is None:
+            db.add(model(**row))
+        else:
+            merge(obj, row)
+    db.flush()
+
+
+def upsert_learning_records(db: Session, rows: List[dict]) -> None:
+    """
+    批量写入学习记录（按 user_id + section_id 存在则更新），不提交事务
+
+    已完成的记录不会被改回未完成。
+
+    Args:
+        db: 数据库会话
+        rows: 记录列表，每项包含 user_id、course_id、section_id、progress、last_position、is_completed
+    """
+    if not rows:
+        return
+
+    def build_set(new):
+        return {
+            "progress": new.progress,
+            "last_position": new.last_position,
+            "is_completed": or_(LearningRecord.is_completed, new.is_completed),
+            "updated_at": func.now()
+        }
+
+    def merge(record, row):
+        record.progress = row["progress"]
+        record.last_position = row["last_position"]
+        record.is_completed = record.is_completed or row["is_completed"]
+
+    _upsert(db, LearningRecord, rows, ["user_id", "section_id"], build_set, merge)
+
+
+def _course_section_totals(db: Session, course_ids: Iterable[int]) -> Dict[int, int]:
+    """一次查询统计课程的小节总数"""
+    course_ids = set(course_ids)
+    if not course_ids:
+        return {}
+    rows = db.query(Chapter.course_id, func.count(Section.id)).join(
+        Section, Section.chapter_id == Chapter.id
+    ).filter(Chapter.course_id.in_(course_ids)).group_by(Chapter.course_id).all()
+    return dict(rows)
+
+
+def _course_progress(progress_sum: int, total_sections: int) -> float:
+    if not total_sections:
+        return 0
+    return round(min(progress_sum / total_sections, 100), 2)
+
+
+def refresh_user_course_progress(db: Session, pairs: Iterable[Tuple[int, int]]) -> None:
+    """
+    学习记录写入后刷新对应的课程进度汇总，不提交事务
+
+    只聚合给定 (用户, 课程) 的学习记录（走 user_id/course_id 索引），
+    一次聚合查询 + 一次小节总数查询 + 一次 upsert。
+
+    Args:
+        db: 数据库会话
+        pairs: (user_id, course_id) 列表
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return
+    db.flush()
+    totals = _course_section_totals(db, {course_id for _, course_id in pairs})
+    rows = _aggregate_rows(db, tuple_(LearningRecord.user_id, LearningRecord.course_id).in_(pairs), totals)
+
+    # 学习记录已全部删除的汇总行随之删除
+    missing = pairs - {(row["user_id"], row["course_id"]) for row in rows}
+    if missing:
+        db.query(UserCourseProgress).filter(
+            tuple_(UserCourseProgress.user_id, UserCourseProgress.course_id).in_(missing)
+        ).delete(synchronize_session=False)
+
+    _write_rows(db, rows)
+
+
+def update_course_section_total(db: Session, course_id: int) -> None:
+    """
+    课程小节增删后更新该课程所有汇总行的小节总数和进度，不提交事务
+
+    进度由已保存的 progress_sum 计算，一条 UPDATE 完成，不重新聚合学习记录。
+
+    Args:
+        db: 数据库会话
+        course_id: 课程ID
+    """
+    db.flush()
+    total = _course_section_totals(db, [course_id]).get(course_id, 0)
+    if total:
+        progress = case(
+            (UserCourseProgress.progress_sum >= 100 * total, 100),
+            else_=func.round(UserCourseProgress.progress_sum * 1.0 / total, 2)
+        )
+    else:
+        progress = 0
+    db.query(UserCourseProgress).filter(
+        UserCourseProgress.course_id == course_id
+    ).update({
+        "total_sections": total,
+        "progress": progress
+    }, synchronize_session=False)
+
+
+def subtract_sections_progress(db: Session, course_id: int, section_ids: Iterable[int]) -> None:
+    """
+    删除小节前从汇总中减去这些小节的学习记录，不提交事务
+
+    一条 UPDATE ... JOIN 聚合子查询按用户扣减进度、完成数和学习时长，
+    再删除已没有学习记录的汇总行。删除小节后需调用 update_course_section_total。
+
+    Args:
+        db: 数据库会话
+        course_id: 课程ID
+        section_ids: 将被删除的小节ID列表
+    """
+    section_ids = set(section_ids)
+    if not section_ids:
+        return
+    db.flush()
+    removed = db.query(
+        LearningRecord.user_id.label("user_id"),
+        func.sum(LearningRecord.progress).label("progress_sum"),
+        func.count(LearningRecord.id).label("learned_sections"),
+        func.sum(case((LearningRecord.is_completed == True, 1), else_=0)).label("completed_sections"),
+        func.sum(LearningRecord.learning_time).label("learning_time")
+    ).filter(
+        LearningRecord.course_id == course_id,
+        LearningRecord.section_id.in_(section_ids)
+    ).group_by(LearningRecord.user_id).subquery()
+
+    db.execute(
+        update(UserCourseProgress).where(
+            UserCourseProgress.course_id == course_id,
+            UserCourseProgress.user_id == removed.c.user_id
+        ).values(
+            progress_sum=UserCourseProgress.progress_sum - removed.c.progress_sum,
+            learned_sections=UserCourseProgress.learned_sections - removed.c.learned_sections,
+            completed_sections=UserCourseProgress.completed_sections - removed.c.completed_sections,
+            learning_time=UserCourseProgress.learning_time - func.coalesce(removed.c.learning_time, 0)
+        ),
+        execution_options={"synchronize_session": False}
+    )
+    db.query(UserCourseProgress).filter(
+        UserCourseProgress.course_id == course_id,
+        UserCourseProgress.learned_sections <= 0
+    ).delete(synchronize_session=False)
+
+
+def _aggregate_rows(db: Session, condition, totals: Dict[int, int]) -> List[dict]:
+    """按条件聚合学习记录，生成汇总行"""
+    aggregates = db.query(
+        LearningRecord.user_id,
+        LearningRecord.course_id,
+        func.coalesce(func.sum(LearningRecord.progress), 0),
+        func.count(LearningRecord.id),
+        func.coalesce(func.sum(case((LearningRecord.is_completed == True, 1), else_=0)), 0),
+        func.coalesce(func.sum(LearningRecord.learning_time), 0),
+        func.max(LearningRecord.updated_at)
+    ).filter(condition).group_by(LearningRecord.user_id, LearningRecord.course_id).all()
+
+    rows = []
+    for user_id, course_id, progress_sum, learned, completed, learning_time, last_learn_time in aggregates:
+        total = totals.get(course_id, 0)
+        rows.append({
+            "user_id": user_id,
+            "course_id": course_id,
+            "progress": _course_progress(int(progress_sum), total),
+            "progress_sum": int(progress_sum),
+            "learned_sections": learned,
+            "completed_sections": int(completed),
+            "total_sections": total,
+            "learning_time": int(learning_time),
+            "last_learn_time": last_learn_time
+        })
+    return rows
+
+
+def _write_rows(db: Session, rows: List[dict]) -> None:
+    """汇总行分批 upsert，每批最多 PROGRESS_UPSERT_BATCH 行"""
+    columns = ("progress", "progress_sum", "learned_sections", "completed_sections",
+               "total_sections", "learning_time", "last_learn_time")
+
+    def build_set(new):
+        values = {column: getattr(new, column) for column in columns}
+        values["updated_at"] = func.now()
+        return values
+
+    def merge(summary, row):
+        for column in columns:
+            setattr(summary, column, row[column])
+
+    for start in range(0, len(rows), PROGRESS_UPSERT_BATCH):
+        _upsert(db, UserCourseProgress, rows[start:start + PROGRESS_UPSERT_BATCH],
+                ["user_id", "course_id"], build_set, merge)
+
+
+def _rebuild_course(db: Session, course_id: int) -> None:
+    """重新聚合整门课程的学习记录并覆盖汇总表"""
+    totals = _course_section_totals(db, [course_id])
+    _write_rows(db, _aggregate_rows(db, LearningRecord.course_id == course_id, totals))
+
+    # 已没有学习记录的汇总行
+    db.query(UserCourseProgress).filter(
+        UserCourseProgress.course_id == course_id,
+        ~exists().where(
+            LearningRecord.user_id == UserCourseProgress.user_id,
+            LearningRecord.course_id == course_id
+        )
+    ).delete(synchronize_session=False)
+
+
+def rebuild_course_progress(db: Session) -> int:
+    """
+    按课程重建全部进度汇总（迁移/修复数据时使用），每门课程提交一次
+
+    Args:
+        db: 数据库会话
+
+    Returns:
+        int: 处理的课程数
+    """
+    course_ids = [row[0] for row in db.query(LearningRecord.course_id).distinct().all()]
+    for course_id in course_ids:
+        _rebuild_course(db, course_id)
+        db.commit()
+    return len(course_ids)
@@ -0,0 +1,482 @@
+"""
+通知服务
+
+个人通知存放在 notifications 表；广播通知（全体用户或课程报名学员）只在
+broadcast_notifications 表存一行，用户标记已读或删除时才生成对应的个人通知记录。
+列表和未读数合并两个来源。尚未生成个人记录的广播在接口中以负数ID（-广播ID）表示。
+
+未读数缓存在Redis：个人未读数由各写入路径增减；广播未读数的缓存键带有最新广播ID，
+有新广播时自动重新统计。缓存缺失时从数据库重建，并在新会话中复核，
+重建期间有通知写入导致不一致时只短期缓存。
+
+新通知和未读数变化通过 Socket.IO 推送到用户房间：
+- notification 事件：{"notification": 通知, "unread_count": 未读数}，
+  未读数未缓存或为广播通知时 unread_count 为 null，客户端自行加1
+- unread_count 事件：{"count": 未读数}
+"""
+import heapq
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import and_, exists, func, insert, literal, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from fastapi.encoders import jsonable_encoder
+from app.models.user import User
+from app.models.course_enrollment import CourseEnrollment
+from app.models.notification import Notification, NotificationType
+from app.models.broadcast_notification import BroadcastNotification
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.redis_service import redis_service
+from app.services import push_service
+from app.schemas.notification import NotificationResponse
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+def create_broadcast(
+    db: Session,
+    notif_type: NotificationType,
+    title: str,
+    content: Optional[str],
+    sender_id: Optional[int] = None,
+    target_course_id: Optional[int] = None,
+    course_id: Optional[int] = None,
+    live_id: Optional[int] = None,
+    link_url: Optional[str] = None
+) -> BroadcastNotification:
+    """
+    创建广播通知（只写一行，与接收人数无关），不提交事务
+
+    Args:
+        db: 数据库会话
+        notif_type: 通知类型
+        title: 标题
+        content: 内容
+        sender_id: 发送者ID
+        target_course_id: 只发给该课程的报名学员，为空表示全部用户
+        course_id: 关联课程ID
+        live_id: 关联直播ID
+        link_url: 跳转链接
+
+    Returns:
+        BroadcastNotification: 广播通知
+    """
+    broadcast = BroadcastNotification(
+        type=notif_type,
+        title=title,
+        content=content,
+        link_url=link_url,
+        target_course_id=target_course_id,
+        sender_id=sender_id,
+        course_id=course_id,
+        live_id=live_id
+    )
+    db.add(broadcast)
+    db.flush()
+    return broadcast
+
+
+def personal_query(db: Session, user: User, is_read: Optional[bool] = None):
+    """用户的个人通知（含已生成个人记录的广播）"""
+    query = db.query(Notification).filter(
+        Notification.user_id == user.id,
+        Notification.is_deleted == False
+    )
+    if is_read is not None:
+        query = query.filter(Notification.is_read == is_read)
+    return query
+
+
+def pending_broadcast_query(db: Session, user: User):
+    """
+    用户可见且尚未生成个人记录的广播（均为未读）
+
+    可见条件：广播发出时用户已注册；课程广播还要求发出时已报名该课程。
+    """
+    return db.query(BroadcastNotification).filter(
+        BroadcastNotification.created_at >= user.created_at,
+        or_(
+            BroadcastNotification.target_course_id.is_(None),
+            exists().where(
+                CourseEnrollment.course_id == BroadcastNotification.target_course_id,
+                CourseEnrollment.user_id == user.id,
+                CourseEnrollment.enrollment_date <= BroadcastNotification.created_at
+            )
+        ),
+        ~exists().where(
+            Notification.broadcast_id == BroadcastNotification.id,
+            Notification.user_id == user.id
+        )
+    )
+
+
+def broadcast_to_dict(broadcast: BroadcastNotification, user_id: Optional[int]) -> dict:
+    """
+    将尚未生成个人记录的广播表示为通知
+
+    Args:
+        broadcast: 广播通知
+        user_id: 用户ID
+
+    Returns:
+        dict: 通知数据（id 为负的广播ID）
+    """
+    return {
+        "id": -broadcast.id,
+        "user_id": user_id,
+        "type": broadcast.type,
+        "title": broadcast.title,
+        "content": broadcast.content,
+        "link_url": broadcast.link_url,
+        "is_read": False,
+        "broadcast_id": broadcast.id,
+        "created_at": broadcast.created_at,
+        "read_at": None
+    }
+
+
+def _keyset(query, model, created_at: Optional[datetime], key: Optional[int], sign: int):
+    """按 (created_at desc, sign*id desc) 过滤出游标之后的记录"""
+    if created_at is not None:
+        id_after = model.id < key if sign > 0 else model.id > -key
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, id_after)
+        ))
+    id_order = model.id.desc() if sign > 0 else model.id.asc()
+    return query.order_by(model.created_at.desc(), id_order)
+
+
+def list_notifications(
+    db: Session,
+    user: User,
+    is_read: Optional[bool],
+    page: int,
+    page_size: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    合并个人通知和待读广播，按 (created_at desc, id desc) 排序分页
+
+    广播的排序键为负数ID，同一时间的个人通知排在广播前面。
+
+    Args:
+        db: 数据库会话
+        user: 当前用户
+        is_read: 已读筛选
+        page: 页码（cursor为None时使用）
+        page_size: 每页数量
+        cursor: 游标，传入时使用游标分页
+
+    Returns:
+        Tuple[List[dict], Optional[str]]: (当前页通知, 下一页游标)
+    """
+    created_at, key = decode_cursor(cursor) if cursor else (None, None)
+    # 每个来源最多只需要取到当前页末尾
+    limit = page_size + 1 if cursor is not None else page * page_size
+
+    personal = _keyset(personal_query(db, user, is_read), Notification, created_at, key, 1).limit(limit).all()
+    items = [
+        {
+            "id": n.id, "user_id": n.user_id, "type": n.type, "title": n.title,
+            "content": n.content, "link_url": n.link_url, "is_read": n.is_read,
+            "broadcast_id": n.broadcast_id, "created_at": n.created_at, "read_at": n.read_at
+        }
+        for n in personal
+    ]
+    if not is_read:
+        broadcasts = _keyset(pending_broadcast_query(db, user), BroadcastNotification, created_at, key, -1).limit(limit).all()
+        merged = heapq.merge(
+            items,
+            [broadcast_to_dict(b, user.id) for b in broadcasts],
+            key=lambda item: (item["created_at"], item["id"]),
+            reverse=True
+        )
+        items = list(merged)[:limit]
+
+    if cursor is None:
+        return items[(page - 1) * page_size:], None
+
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(items[-1]["created_at"], items[-1]["id"])
+    return items, next_cursor
+
+
+def _unread_key(user_id: int) -> str:
+    return f"notification:unread:{user_id}"
+
+
+def _broadcast_unread_key(user_id: int, latest_broadcast_id: int) -> str:
+    return f"notification:unread:broadcast:{user_id}:{latest_broadcast_id}"
+
+
+def _latest_broadcast_id(db: Session) -> int:
+    return db.query(func.max(BroadcastNotification.id)).scalar() or 0
+
+
+def _recount(rebuild) -> int:
+    """在新会话中重新统计（请求会话的事务快照看不到之后提交的通知）"""
+    db = SessionLocal()
+    try:
+        return rebuild(db)
+    finally:
+        db.close()
+
+
+def _cached_count(db: Session, key: str, rebuild) -> int:
+    try:
+        value = redis_service.get(key)
+    except Exception:
+        return rebuild(db)
+    if value is not None:
+        return max(int(value), 0)
+    value = rebuild(db)
+    try:
+        # 期间若已有其他请求写入，保留已有的值；先用较短的过期时间写入
+        if redis_service.set_nx(key, value, settings.NOTIFICATION_UNREAD_REBUILD_TTL):
+            # 统计之后、写入之前提交的通知对不存在的键增减会丢失，复核一致才按正常时间缓存，
+            # 否则让缓存很快过期并重建
+            if _recount(rebuild) == value:
+                redis_service.expire(key, settings.NOTIFICATION_UNREAD_TTL)
+    except Exception as e:
+        print(f"Redis 缓存未读数失败: {e}")
+    return value
+
+
+def count_unread(db: Session, user: User) -> int:
+    """
+    统计未读通知数（个人未读 + 待读广播），优先读取缓存
+
+    Args:
+        db: 数据库会话
+        user: 当前用户
+
+    Returns:
+        int: 未读数
+    """
+    personal = _cached_count(
+        db,
+        _unread_key(user.id),
+        lambda session: personal_query(session, user, False).count()
+    )
+    latest = _latest_broadcast_id(db)
+    if not latest:
+        return personal
+    broadcast = _cached_count(
+        db,
+        _broadcast_unread_key(user.id, latest),
+        lambda session: pending_broadcast_query(session, user).count()
+    )
+    return personal + broadcast
+
+
+def incr_unread(user_ids: Iterable[int], amount: int = 1) -> None:
+    """
+    新增/已读/删除个人通知后调整未读数缓存（在事务提交后调用）
+
+    Args:
+        user_ids: 用户ID列表
+        amount: 调整量，已读或删除时为负数
+    """
+    for user_id in user_ids:
+        try:
+            redis_service.incr_if_exists(_unread_key(user_id), amount)
+        except Exception as e:
+            print(f"Redis 更新未读数失败: {e}")
+            return
+
+
+def decr_broadcast_unread(db: Session, user_id: int) -> None:
+    """
+    待读广播被阅读或删除后调整未读数缓存（在事务提交后调用）
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+    """
+    try:
+        redis_service.incr_if_exists(_broadcast_unread_key(user_id, _latest_broadcast_id(db)), -1)
+    except Exception as e:
+        print(f"Redis 更新未读数失败: {e}")
+
+
+def clear_unread(db: Session, user_id: int) -> None:
+    """
+    全部标记已读后把未读数缓存置零（在事务提交后调用）
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+    """
+    for key in (_unread_key(user_id), _broadcast_unread_key(user_id, _latest_broadcast_id(db))):
+        redis_service.set(key, 0, expire=settings.NOTIFICATION_UNREAD_TTL)
+
+
+def _from_broadcast(
+    broadcast: BroadcastNotification,
+    user_id: int,
+    is_read: bool = False,
+    is_deleted: bool = False
+) -> Notification:
+    """由广播生成个人通知（创建时间与广播相同，保持列表顺序不变）"""
+    return Notification(
+        user_id=user_id,
+        type=broadcast.type,
+        title=broadcast.title,
+        content=broadcast.content,
+        link_url=broadcast.link_url,
+        sender_id=broadcast.sender_id,
+        course_id=broadcast.course_id,
+        live_id=broadcast.live_id,
+        broadcast_id=broadcast.id,
+        created_at=broadcast.created_at,
+        is_read=is_read,
+        read_at=datetime.now() if is_read else None,
+        is_deleted=is_deleted
+    )
+
+
+def materialize_broadcast(
+    db: Session,
+    user: User,
+    broadcast_id: int,
+    is_read: bool = False,
+    is_deleted: bool = False
+) -> Tuple[Optional[Notification], bool]:
+    """
+    为用户生成广播对应的个人通知记录（已存在时返回已有记录），不提交事务
+
+    Args:
+        db: 数据库会话
+        user: 当前用户
+        broadcast_id: 广播ID
+        is_read: 是否标记已读
+        is_deleted: 是否标记删除
+
+    Returns:
+        Tuple[Optional[Notification], bool]: (个人通知, 是否本次新生成)；
+            广播对该用户不可见或已删除时通知为None
+    """
+    existing = db.query(Notification).filter(
+        Notification.user_id == user.id,
+        Notification.broadcast_id == broadcast_id
+    ).first()
+    if existing:
+        return (None if existing.is_deleted else existing), False
+
+    broadcast = pending_broadcast_query(db, user).filter(BroadcastNotification.id == broadcast_id).first()
+    if not broadcast:
+        return None, False
+
+    notification = _from_broadcast(broadcast, user.id, is_read=is_read, is_deleted=is_deleted)
+    try:
+        with db.begin_nested():
+            db.add(notification)
+    except IntegrityError:
+        # 并发请求已生成
+        return materialize_broadcast(db, user, broadcast_id, is_read, is_deleted)[0], False
+    return notification, True
+
+
+def mark_broadcasts_read(db: Session, user: User) -> int:
+    """
+    把用户所有待读广播生成为已读的个人通知，不提交事务
+
+    用一条 INSERT ... SELECT 写入，不在内存中加载广播或创建通知对象。
+
+    Args:
+        db: 数据库会话
+        user: 当前用户
+
+    Returns:
+        int: 处理的广播数
+    """
+    columns = Notification.__table__.c
+    pending = pending_broadcast_query(db, user).with_entities(
+        literal(user.id, columns.user_id.type),
+        BroadcastNotification.type,
+        BroadcastNotification.title,
+        BroadcastNotification.content,
+        BroadcastNotification.link_url,
+        BroadcastNotification.sender_id,
+        BroadcastNotification.course_id,
+        BroadcastNotification.live_id,
+        BroadcastNotification.id,
+        BroadcastNotification.created_at,
+        literal(True, columns.is_read.type),
+        literal(datetime.now(), columns.read_at.type),
+        literal(False, columns.is_deleted.type)
+    )
+    result = db.execute(insert(Notification).from_select(
+        ["user_id", "type", "title", "content", "link_url", "sender_id", "course_id", "live_id",
+         "broadcast_id", "created_at", "is_read", "read_at", "is_deleted"],
+        pending.statement
+    ))
+    return result.rowcount
+
+
+def _cached_unread(user_id: int, latest_broadcast_id: int) -> Optional[int]:
+    """只读缓存的未读数，任一部分未缓存时返回None"""
+    keys = [_unread_key(user_id)]
+    if latest_broadcast_id:
+        keys.append(_broadcast_unread_key(user_id, latest_broadcast_id))
+    try:
+        values = [redis_service.get(key) for key in keys]
+    except Exception:
+        return None
+    if any(value is None for value in values):
+        return None
+    return sum(max(int(value), 0) for value in values)
+
+
+def publish_notifications(db: Session, notifications: List[Notification]) -> None:
+    """
+    推送新的个人通知（在事务提交及未读数更新之后调用）
+
+    Args:
+        db: 数据库会话
+        notifications: 新通知
+    """
+    if not notifications:
+        return
+    latest = _latest_broadcast_id(db)
+    for notification in notifications:
+        push_service.push_to_user(notification.user_id, "notification", {
+            "notification": NotificationResponse.model_validate(notification).model_dump(mode="json"),
+            "unread_count": _cached_unread(notification.user_id, latest)
+        })
+
+
+def publish_broadcast(db: Session, broadcast: BroadcastNotification) -> None:
+    """
+    推送广播通知：全员广播推送到已登录用户房间，课程广播推送给报名学员
+
+    Args:
+        db: 数据库会话
+        broadcast: 广播通知
+    """
+    item = broadcast_to_dict(broadcast, None)
+    if broadcast.target_course_id is None:
+        item.pop("user_id")
+        push_service.push_to_all_users("notification", jsonable_encoder({"notification": item, "unread_count": None}))
+        return
+
+    user_ids = [row[0] for row in db.query(CourseEnrollment.user_id).filter(
+        CourseEnrollment.course_id == broadcast.target_course_id
+    ).all()]
+    for user_id in user_ids:
+        item["user_id"] = user_id
+        push_service.push_to_user(user_id, "notification", jsonable_encoder({"notification": item, "unread_count": None}))
+
+
+def publish_unread_count(db: Session, user: User) -> None:
+    """
+    推送用户最新的未读数（已读、删除后调用，用于多端同步）
+
+    Args:
+        db: 数据库会话
+        user: 用户
+    """
+    push_service.push_to_user(user.id, "unread_count", {"count": count_unread(db, user)})
@@ -0,0 +1,118 @@
+"""
+学习进度写缓冲
+
+视频播放器每隔几秒上报一次进度。上报先写入按 (user_id, section_id) 合并的
+进程内缓冲区并立即返回，周期任务把每个键最后一次的状态批量写入 learning_records。
+进度达到100%时立即写入；应用关闭时会清空缓冲区。
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.core.database import SessionLocal
+from app.services.learning_service import (
+    get_section_courses, upsert_learning_records, refresh_user_course_progress
+)
+
+
+_buffer: Dict[Tuple[int, int], dict] = {}
+_lock = threading.Lock()
+
+
+def submit(user_id: int, course_id: int, section_id: int, progress: int, last_position: int) -> bool:
+    """
+    提交一次进度上报
+
+    Args:
+        user_id: 用户ID
+        course_id: 课程ID
+        section_id: 小节ID
+        progress: 进度百分比
+        last_position: 最后观看位置(秒)
+
+    Returns:
+        bool: 是否已立即写入数据库（完成时立即写入）
+    """
+    key = (user_id, section_id)
+    row = {
+        "user_id": user_id,
+        "course_id": course_id,
+        "section_id": section_id,
+        "progress": progress,
+        "last_position": last_position,
+        "is_completed": progress >= 100,
+        "received_at": time.time(),
+    }
+    with _lock:
+        previous = _buffer.get(key)
+        # 缓冲期间出现过的完成状态不能被之后的上报覆盖
+        if previous and previous["is_completed"]:
+            row["is_completed"] = True
+        _buffer[key] = row
+
+    if row["is_completed"] and (previous is None or not previous["is_completed"]):
+        flush_progress_buffer(keys=[key])
+        return True
+    return False
+
+
+def pending_count() -> int:
+    """缓冲区中待写入的记录数"""
+    return len(_buffer)
+
+
+def _take(keys: Optional[Iterable[Tuple[int, int]]] = None) -> List[dict]:
+    with _lock:
+        if keys is None:
+            rows = list(_buffer.values())
+            _buffer.clear()
+        else:
+            rows = [_buffer.pop(key) for key in keys if key in _buffer]
+    return rows
+
+
+def _restore(rows: List[dict]) -> None:
+    """写入失败时放回缓冲区（不覆盖之后收到的新上报）"""
+    with _lock:
+        for row in rows:
+            key = (row["user_id"], row["section_id"])
+            current = _buffer.get(key)
+            if current is None or current["received_at"] < row["received_at"]:
+                _buffer[key] = row
+
+
+def flush_progress_buffer(keys: Optional[Iterable[Tuple[int, int]]] = None) -> int:
+    """
+    将缓冲区批量写入数据库
+
+    Args:
+        keys: 只写入指定的键，默认写入全部
+
+    Returns:
+        int: 写入的记录数
+    """
+    rows = _take(keys)
+    if not rows:
+        return 0
+
+    db = SessionLocal()
+    try:
+        # 一次查询校验小节是否存在且属于上报的课程
+        section_courses = get_section_courses(db, (row["section_id"] for row in rows))
+        valid = [
+            {k: v for k, v in row.items() if k != "received_at"}
+            for row in rows
+            if section_courses.get(row["section_id"]) == row["course_id"]
+        ]
+        if len(valid) != len(rows):
+            print(f"学习进度缓冲：丢弃 {len(rows) - len(valid)} 条无效的上报")
+
+        upsert_learning_records(db, valid)
+        refresh_user_course_progress(db, [(row["user_id"], row["course_id"]) for row in valid])
+        db.commit()
+        return len(valid)
+    except Exception:
+        db.rollback()
+        _restore(rows)
+        raise
+    finally:
+        db.close()
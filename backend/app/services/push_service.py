@@ -0,0 +1,70 @@
+"""
+Socket.IO 实时推送
+
+接口大多是同步函数，运行在线程池中。推送协程通过启动时保存的事件循环
+提交（run_coroutine_threadsafe），不等待发送完成，不阻塞请求。
+"""
+import asyncio
+from typing import Any, Optional
+from app.websocket import sio, user_room, USERS_ROOM
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def bind_event_loop(loop: asyncio.AbstractEventLoop) -> None:
+    """
+    保存服务器事件循环（应用启动时调用）
+
+    Args:
+        loop: 事件循环
+    """
+    global _loop
+    _loop = loop
+
+
+def emit(event: str, data: Any, room: str) -> None:
+    """
+    向房间推送事件（可在同步代码或事件循环中调用）
+
+    Args:
+        event: 事件名
+        data: 可JSON序列化的数据
+        room: 房间名
+    """
+    coro = sio.emit(event, data, room=room)
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+
+    if running is not None:
+        running.create_task(coro)
+    elif _loop is not None and not _loop.is_closed():
+        asyncio.run_coroutine_threadsafe(coro, _loop)
+    else:
+        # 未启动服务器（如脚本中调用）时不推送
+        coro.close()
+
+
+def push_to_user(user_id: int, event: str, data: Any) -> None:
+    """
+    推送给指定用户的所有连接
+
+    Args:
+        user_id: 用户ID
+        event: 事件名
+        data: 数据
+    """
+    emit(event, data, user_room(user_id))
+
+
+def push_to_all_users(event: str, data: Any) -> None:
+    """
+    推送给所有已登录的连接
+
+    Args:
+        event: 事件名
+        data: 数据
+    """
+    emit(event, data, USERS_ROOM)
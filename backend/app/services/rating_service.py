@@ -0,0 +1,153 @@
+"""
+课程评分统计
+
+课程维护 rating_sum / rating_count，评论评分变化时用一条原子 UPDATE 增量更新，
+不再每次重新加载课程的全部评论。周期任务按评论表重新核对，修复可能的偏差。
+"""
+from typing import Dict, Optional, Tuple
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models.course import Course
+from app.models.comment import Comment
+from app.services import course_cache
+
+
+def rating_delta(old_rating, new_rating) -> Tuple[int, int]:
+    """
+    计算评分变化对 (评分总和, 评分人数) 的增量
+
+    Args:
+        old_rating: 原评分（None表示未评分或不计入）
+        new_rating: 新评分（None表示未评分或不计入）
+
+    Returns:
+        Tuple[int, int]: (总和增量, 人数增量)
+    """
+    return (
+        (new_rating or 0) - (old_rating or 0),
+        (new_rating is not None) - (old_rating is not None)
+    )
+
+
+def apply_rating_delta(db: Session, course_id: int, sum_delta: int, count_delta: int) -> None:
+    """
+    原子更新课程评分统计，不提交事务
+
+    Args:
+        db: 数据库会话
+        course_id: 课程ID
+        sum_delta: 评分总和增量
+        count_delta: 评分人数增量
+    """
+    if not sum_delta and not count_delta:
+        return
+    new_sum = Course.rating_sum + sum_delta
+    new_count = Course.rating_count + count_delta
+    db.execute(
+        update(Course)
+        .where(Course.id == course_id)
+        # rating 必须最先赋值：MySQL 的 SET 按顺序执行，后面的表达式会读到已更新的列
+        .ordered_values(
+            (Course.rating, func.coalesce(func.round(new_sum * 1.0 / func.nullif(new_count, 0), 2), 0)),
+            (Course.rating_sum, new_sum),
+            (Course.rating_count, new_count),
+            (Course.updated_at, Course.updated_at)
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _comment_ratings(db: Session, course_id: Optional[int] = None) -> Dict[int, Tuple[int, int]]:
+    query = db.query(
+        Comment.course_id, func.sum(Comment.rating), func.count(Comment.rating)
+    ).filter(
+        Comment.rating.isnot(None),
+        Comment.is_deleted == False
+    )
+    if course_id is not None:
+        query = query.filter(Comment.course_id == course_id)
+    return {
+        course_id: (int(rating_sum), rating_count)
+        for course_id, rating_sum, rating_count in query.group_by(Comment.course_id).all()
+    }
+
+
+def _reconcile_course(db: Session, course_id: int) -> Optional[Tuple[int, int]]:
+    """
+    锁定课程行后重新统计并修复一门课程（单独的事务）
+
+    评论写入与 apply_rating_delta 在同一事务中，持有课程行锁后统计到的评论
+    与课程列是一致的；之后提交的评论会在本次修复之上继续增量更新。
+
+    Returns:
+        Optional[Tuple[int, int]]: 修复后的 (评分总和, 评分人数)，无需修复时返回None
+    """
+    observed = db.query(Course.rating_sum, Course.rating_count).filter(
+        Course.id == course_id
+    ).with_for_update().first()
+    if observed is None:
+        return None
+    seen_sum, seen_count = (observed.rating_sum or 0), (observed.rating_count or 0)
+    rating_sum, rating_count = _comment_ratings(db, course_id).get(course_id, (0, 0))
+    if (seen_sum, seen_count) == (rating_sum, rating_count):
+        return None
+
+    # 只在统计期间课程列未被其他事务修改时写入（不支持行锁的数据库上同样安全）
+    updated = db.execute(
+        update(Course)
+        .where(
+            Course.id == course_id,
+            func.coalesce(Course.rating_sum, 0) == seen_sum,
+            func.coalesce(Course.rating_count, 0) == seen_count
+        )
+        .values(
+            rating=round(rating_sum / rating_count, 2) if rating_count else 0,
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            updated_at=Course.updated_at
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return (rating_sum, rating_count) if updated else None
+
+
+def reconcile_course_ratings() -> Dict[int, Tuple[int, int]]:
+    """
+    按评论表核对所有课程的评分统计并修复偏差
+
+    先整体比对找出可能有偏差的课程，再逐门课程锁定后复核并修复，
+    不会覆盖比对期间新提交的评分。
+
+    Returns:
+        Dict[int, Tuple[int, int]]: 被修复的 课程ID -> (评分总和, 评分人数)
+    """
+    db = SessionLocal()
+    drifted = {}
+    try:
+        actual = _comment_ratings(db)
+        candidates = [
+            course_id
+            for course_id, rating_sum, rating_count in db.query(
+                Course.id, Course.rating_sum, Course.rating_count
+            ).all()
+            if ((rating_sum or 0), (rating_count or 0)) != actual.get(course_id, (0, 0))
+        ]
+        db.commit()
+
+        for course_id in candidates:
+            fixed = _reconcile_course(db, course_id)
+            db.commit()
+            if fixed is not None:
+                drifted[course_id] = fixed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    for course_id in drifted:
+        course_cache.invalidate_course(course_id)
+    if drifted:
+        print(f"课程评分核对：修复 {len(drifted)} 门课程")
+    return drifted
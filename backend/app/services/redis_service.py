@@ -116,6 +116,176 @@ class RedisService:
         """
         return self.redis_client.decrby(key, amount)
 
+    def set_nx(self, key: str, value: Any, expire: int) -> bool:
+        """
+        键不存在时才设置（用于分布式锁）
+
+        Args:
+            key: 键
+            value: 值
+            expire: 过期时间（秒）
+
+        Returns:
+            bool: 是否设置成功
+        """
+        return bool(self.redis_client.set(key, value, nx=True, ex=expire))
+
+    def getset(self, key: str, value: Any) -> Optional[str]:
+        """
+        设置新值并返回旧值（原子操作）
+
+        Args:
+            key: 键
+            value: 新值
+
+        Returns:
+            Optional[str]: 旧值
+        """
+        return self.redis_client.getset(key, value)
+
+    def sadd(self, key: str, *values: Any) -> int:
+        """
+        向集合添加成员
+
+        Args:
+            key: 键
+            values: 成员
+
+        Returns:
+            int: 新增的成员数
+        """
+        return self.redis_client.sadd(key, *values)
+
+    def spop(self, key: str, count: int = 1) -> list:
+        """
+        随机弹出集合成员
+
+        Args:
+            key: 键
+            count: 弹出数量
+
+        Returns:
+            list: 弹出的成员
+        """
+        return self.redis_client.spop(key, count) or []
+
+    def incr_if_exists(self, key: str, amount: int = 1) -> Optional[int]:
+        """
+        键存在时才递增（用于维护可从数据库重建的计数缓存）
+
+        Args:
+            key: 键
+            amount: 递增量（可为负数）
+
+        Returns:
+            Optional[int]: 递增后的值，键不存在时返回None
+        """
+        def _incr(pipe):
+            if pipe.exists(key):
+                pipe.multi()
+                pipe.incrby(key, amount)
+
+        result = self.redis_client.transaction(_incr, key)
+        return result[0] if result else None
+
+    def srem(self, key: str, *values: Any) -> int:
+        """
+        从集合移除成员
+
+        Args:
+            key: 键
+            values: 成员
+
+        Returns:
+            int: 移除的成员数
+        """
+        return self.redis_client.srem(key, *values)
+
+    def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        """
+        哈希字段递增
+
+        Args:
+            key: 键
+            field: 字段
+            amount: 递增量
+
+        Returns:
+            int: 递增后的值
+        """
+        return self.redis_client.hincrby(key, field, amount)
+
+    def hget(self, key: str, field: str) -> Optional[str]:
+        """
+        获取哈希字段
+
+        Args:
+            key: 键
+            field: 字段
+
+        Returns:
+            Optional[str]: 值
+        """
+        return self.redis_client.hget(key, field)
+
+    def hset(self, key: str, field: str, value: Any, only_if_missing: bool = False) -> bool:
+        """
+        设置哈希字段
+
+        Args:
+            key: 键
+            field: 字段
+            value: 值
+            only_if_missing: 为True时仅在字段不存在时设置
+
+        Returns:
+            bool: 是否新增了字段
+        """
+        if only_if_missing:
+            return bool(self.redis_client.hsetnx(key, field, value))
+        return bool(self.redis_client.hset(key, field, value))
+
+    def hgetall(self, key: str) -> dict:
+        """
+        获取哈希全部字段
+
+        Args:
+            key: 键
+
+        Returns:
+            dict: 字段 -> 值
+        """
+        return self.redis_client.hgetall(key) or {}
+
+    def expire(self, key: str, seconds: int) -> bool:
+        """
+        设置过期时间
+
+        Args:
+            key: 键
+            seconds: 过期时间（秒）
+
+        Returns:
+            bool: 是否成功（键不存在时返回False）
+        """
+        return bool(self.redis_client.expire(key, seconds))
+
+    def rename(self, key: str, new_key: str) -> bool:
+        """
+        重命名键（原子操作，用于取出待处理数据）
+
+        Args:
+            key: 键
+            new_key: 新键
+
+        Returns:
+            bool: 是否成功（键不存在时返回False）
+        """
+        try:
+            return bool(self.redis_client.rename(key, new_key))
+        except redis.ResponseError:
+            return False
+
 
 # 创建全局Redis服务实例
 redis_service = RedisService()
@@ -0,0 +1,159 @@
+"""
+课程全文搜索服务
+
+在数据库中维护课程标题、描述、标签的倒排索引（course_search_terms），
+中文按二元组（bigram）切分，英文和数字按单词切分。
+"""
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.course import Course
+from app.models.course_search import CourseSearchTerm
+
+
+# 各字段的权重
+FIELD_WEIGHTS = {
+    "title": 5,
+    "tags": 3,
+    "description": 1,
+}
+
+# 中日韩统一表意文字
+_CJK_RUN = r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+"
+_TOKEN_PATTERN = re.compile(rf"({_CJK_RUN})|([a-z0-9]+)")
+_CJK_CHAR = re.compile(_CJK_RUN)
+
+MAX_TERM_LENGTH = 64
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    分词
+
+    Args:
+        text: 文本
+
+    Returns:
+        List[str]: 词项列表（可能重复）
+    """
+    if not text:
+        return []
+
+    tokens = []
+    for cjk, word in _TOKEN_PATTERN.findall(text.lower()):
+        if cjk:
+            if len(cjk) == 1:
+                tokens.append(cjk)
+            else:
+                tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            tokens.append(word[:MAX_TERM_LENGTH])
+    return tokens
+
+
+def build_terms(course: Course) -> Dict[str, int]:
+    """
+    计算课程的词项权重
+
+    Args:
+        course: 课程
+
+    Returns:
+        Dict[str, int]: 词项 -> 权重
+    """
+    weights = Counter()
+    for field, field_weight in FIELD_WEIGHTS.items():
+        for term, freq in Counter(tokenize(getattr(course, field))).items():
+            weights[term] += freq * field_weight
+    return dict(weights)
+
+
+def index_course(db: Session, course: Course) -> None:
+    """
+    （重新）索引单个课程，不提交事务
+
+    Args:
+        db: 数据库会话
+        course: 课程（需已有ID）
+    """
+    remove_course(db, course.id)
+    terms = build_terms(course)
+    if terms:
+        db.bulk_insert_mappings(CourseSearchTerm, [
+            {"term": term, "course_id": course.id, "weight": weight}
+            for term, weight in terms.items()
+        ])
+
+
+def remove_course(db: Session, course_id: int) -> None:
+    """
+    从索引中移除课程，不提交事务
+
+    Args:
+        db: 数据库会话
+        course_id: 课程ID
+    """
+    db.query(CourseSearchTerm).filter(
+        CourseSearchTerm.course_id == course_id
+    ).delete(synchronize_session=False)
+
+
+def match_subquery(db: Session, keyword: str):
+    """
+    构建关键词匹配子查询
+
+    返回 (course_id, score) 子查询，只包含命中全部词项的课程，
+    score 为命中词项的权重之和。单个汉字无法用二元组索引匹配，会被忽略。
+
+    Args:
+        db: 数据库会话
+        keyword: 搜索关键词
+
+    Returns:
+        子查询；关键词中没有可用于索引的词项时返回None
+    """
+    terms = {
+        term for term in tokenize(keyword)
+        if not (len(term) == 1 and _CJK_CHAR.match(term))
+    }
+    if not terms:
+        return None
+
+    return db.query(
+        CourseSearchTerm.course_id.label("course_id"),
+        func.sum(CourseSearchTerm.weight).label("score")
+    ).filter(
+        CourseSearchTerm.term.in_(terms)
+    ).group_by(
+        CourseSearchTerm.course_id
+    ).having(
+        func.count(CourseSearchTerm.term) == len(terms)
+    ).subquery()
+
+
+def rebuild_index(db: Session, batch_size: int = 500) -> int:
+    """
+    重建全部课程的索引
+
+    Args:
+        db: 数据库会话
+        batch_size: 每批处理的课程数
+
+    Returns:
+        int: 索引的课程数
+    """
+    db.query(CourseSearchTerm).delete(synchronize_session=False)
+    count = 0
+    last_id = 0
+    while True:
+        courses = db.query(Course).filter(Course.id > last_id).order_by(Course.id).limit(batch_size).all()
+        if not courses:
+            break
+        for course in courses:
+            index_course(db, course)
+        db.commit()
+        count += len(courses)
+        last_id = courses[-1].id
+    return count
@@ -0,0 +1,291 @@
+"""
+上传文件存储（内容寻址 + 引用计数）
+
+上传内容边写边计算 SHA-256，文件按哈希命名并分目录存放（images/ab/cd/abcd....png），
+相同内容只保存一份。客户端可先提交哈希，内容已存在时直接得到访问地址，无需再传输文件。
+
+stored_files.ref_count 记录文件被多少个实体字段使用（REFERENCE_COLUMNS），与上传次数无关：
+实体创建或字段改为某个地址时 acquire_file，字段改掉或实体删除时 release_file，
+归零时在事务提交后删除文件。字段可以填写任意地址，但只能释放自己引用过的那一次，
+不会影响其他实体对同一文件的引用。
+"""
+import os
+from typing import Iterable, List, Optional, Tuple
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.banner import Banner
+from app.models.course import Course
+from app.models.live import Live
+from app.models.live_room import LiveRoom
+from app.models.section import Section
+from app.models.stored_file import StoredFile
+from app.models.user import User
+from app.utils.file_utils import (
+    SavedFile, check_upload_content, delete_file, get_file_extension, get_temp_upload_path, hash_file,
+    is_allowed_file, move_to_content_path, stream_to_file, to_local_path, to_static_url
+)
+
+
+# 保存上传文件访问地址的字段（计入引用计数）
+REFERENCE_COLUMNS = [
+    Course.cover_image,
+    Section.video_url,
+    Banner.image_url,
+    User.avatar,
+    LiveRoom.cover_image,
+    Live.cover_image,
+]
+
+
+def _to_saved(stored: StoredFile, filename: str, deduplicated: bool) -> SavedFile:
+    return SavedFile(
+        url=stored.url,
+        path=to_local_path(stored.url),
+        filename=filename,
+        size=stored.size,
+        sha256=stored.sha256,
+        deduplicated=deduplicated
+    )
+
+
+def get_stored_file(db: Session, sha256: str, file_type: str) -> Optional[StoredFile]:
+    """
+    按内容哈希查找已存储且文件仍存在的记录
+
+    Args:
+        db: 数据库会话
+        sha256: 内容哈希
+        file_type: 文件类型 ('image' 或 'video')
+
+    Returns:
+        Optional[StoredFile]: 存储记录
+    """
+    stored = db.query(StoredFile).filter(StoredFile.sha256 == sha256).first()
+    if stored and stored.file_type == file_type and os.path.exists(to_local_path(stored.url)):
+        return stored
+    return None
+
+
+def store_file(db: Session, temp_path: str, filename: str, file_type: str, sha256: str = None) -> SavedFile:
+    """
+    将已写入临时文件的上传内容入库（阻塞调用，应在线程池中执行）并提交
+
+    内容已存在时删除临时文件，否则移动到内容寻址路径并新增记录（引用计数为0，实体使用时再增加）。
+
+    Args:
+        db: 数据库会话
+        temp_path: 临时文件路径
+        filename: 原始文件名
+        file_type: 文件类型 ('image' 或 'video')
+        sha256: 内容哈希，为空时读取文件计算
+
+    Returns:
+        SavedFile: 保存结果
+    """
+    sha256 = sha256 or hash_file(temp_path)
+    stored = get_stored_file(db, sha256, file_type)
+    if stored:
+        os.remove(temp_path)
+        return _to_saved(stored, filename, True)
+
+    size = os.path.getsize(temp_path)
+    url = to_static_url(move_to_content_path(temp_path, sha256, file_type, get_file_extension(filename)))
+    stored, created = _register(db, sha256, file_type, url, size)
+    db.commit()
+    return _to_saved(stored, filename, not created)
+
+
+def _register(db: Session, sha256: str, file_type: str, url: str, size: int) -> Tuple[StoredFile, bool]:
+    stored = db.query(StoredFile).filter(StoredFile.sha256 == sha256).first()
+    if stored:
+        # 记录存在但文件已丢失（或被并发上传抢先），以刚写入的文件为准
+        stored.url = url
+        stored.file_type = file_type
+        return stored, False
+
+    try:
+        with db.begin_nested():
+            stored = StoredFile(sha256=sha256, file_type=file_type, url=url, size=size, ref_count=0)
+            db.add(stored)
+        return stored, True
+    except IntegrityError:
+        stored = db.query(StoredFile).filter(StoredFile.sha256 == sha256).one()
+        return stored, False
+
+
+async def store_upload(
+    db: Session,
+    upload_file: UploadFile,
+    file_type: str = 'image',
+    max_size: Optional[int] = None
+) -> Optional[SavedFile]:
+    """
+    保存上传文件（流式写入并计算哈希，相同内容只保存一份）
+
+    Args:
+        db: 数据库会话
+        upload_file: 上传的文件
+        file_type: 文件类型 ('image' 或 'video')
+        max_size: 大小限制（字节），默认 MAX_UPLOAD_SIZE
+
+    Returns:
+        Optional[SavedFile]: 保存结果，扩展名不允许时返回None
+
+    Raises:
+        UploadTooLargeError: 超过大小限制
+        UnsupportedFileTypeError: 文件内容（文件头）不是允许的类型
+    """
+    if not is_allowed_file(upload_file.filename, file_type):
+        return None
+    await check_upload_content(upload_file, file_type)
+
+    temp_path = get_temp_upload_path(upload_file.filename)
+    _, sha256 = await stream_to_file(upload_file, temp_path, max_size)
+    try:
+        return await run_in_threadpool(store_file, db, temp_path, upload_file.filename, file_type, sha256)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def claim_by_hash(db: Session, sha256: str, file_type: str, filename: str = '') -> Optional[SavedFile]:
+    """
+    按哈希秒传：内容已存储时直接返回访问地址
+
+    Args:
+        db: 数据库会话
+        sha256: 内容哈希
+        file_type: 文件类型 ('image' 或 'video')
+        filename: 原始文件名
+
+    Returns:
+        Optional[SavedFile]: 保存结果，内容未存储时返回None
+    """
+    stored = get_stored_file(db, sha256, file_type)
+    if not stored:
+        return None
+    return _to_saved(stored, filename, True)
+
+
+def acquire_file(db: Session, url: Optional[str]) -> None:
+    """
+    实体字段使用该地址时增加一次引用（不提交事务），不是本站存储的地址时忽略
+
+    Args:
+        db: 数据库会话
+        url: 访问路径
+    """
+    if not url:
+        return
+    db.execute(
+        update(StoredFile)
+        .where(StoredFile.url == url)
+        .values(ref_count=StoredFile.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def release_file(db: Session, url: Optional[str]) -> bool:
+    """
+    释放一次引用（不提交事务），引用计数归零时删除记录，并在事务提交后由调用方删除文件
+
+    只能释放由 acquire_file 增加过的引用（实体删除或字段改掉时调用）
+
+    Args:
+        db: 数据库会话
+        url: 访问路径
+
+    Returns:
+        bool: 引用计数是否归零（文件可删除）
+    """
+    if not url:
+        return False
+    stored = db.query(StoredFile).filter(StoredFile.url == url).first()
+    if not stored:
+        return False
+
+    db.execute(
+        update(StoredFile)
+        .where(StoredFile.id == stored.id, StoredFile.ref_count > 0)
+        .values(ref_count=StoredFile.ref_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = db.execute(
+        delete(StoredFile)
+        .where(StoredFile.id == stored.id, StoredFile.ref_count <= 0)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return bool(deleted)
+
+
+def release_files(db: Session, urls: Iterable[Optional[str]]) -> List[str]:
+    """
+    释放多个引用（不提交事务）
+
+    Args:
+        db: 数据库会话
+        urls: 访问路径
+
+    Returns:
+        List[str]: 引用计数归零、可在事务提交后删除的访问路径
+    """
+    return [url for url in urls if release_file(db, url)]
+
+
+def replace_file(db: Session, old_url: Optional[str], new_url: Optional[str]) -> List[str]:
+    """
+    实体字段从 old_url 改为 new_url 时调用（不提交事务）：引用新文件并释放旧文件
+
+    Args:
+        db: 数据库会话
+        old_url: 原访问路径
+        new_url: 新访问路径
+
+    Returns:
+        List[str]: 引用计数归零、可在事务提交后删除的访问路径
+    """
+    if old_url == new_url:
+        return []
+    acquire_file(db, new_url)
+    return release_files(db, [old_url])
+
+
+def delete_files(urls: Iterable[str]) -> None:
+    """
+    删除引用计数已归零的文件及其衍生图（在事务提交后调用）
+
+    Args:
+        urls: 访问路径
+    """
+    for url in urls:
+        delete_file(url)
+
+
+def recount_references(db: Session) -> int:
+    """
+    按 REFERENCE_COLUMNS 重新统计全部引用计数并提交（迁移或修复数据时使用）
+
+    Args:
+        db: 数据库会话
+
+    Returns:
+        int: 计数有变化的记录数
+    """
+    counts = {}
+    for column in REFERENCE_COLUMNS:
+        rows = db.query(column, func.count()).filter(column.isnot(None)).group_by(column).all()
+        for url, count in rows:
+            counts[url] = counts.get(url, 0) + count
+
+    changed = 0
+    for stored in db.query(StoredFile).all():
+        ref_count = counts.get(stored.url, 0)
+        if stored.ref_count != ref_count:
+            stored.ref_count = ref_count
+            changed += 1
+    db.commit()
+    return changed
@@ -0,0 +1,262 @@
+"""
+分片上传会话（可断点续传、可并行上传的大文件上传）
+
+会话数据保存在 UPLOAD_DIR/tmp/{session_id}/ 目录中：
+- meta.json: 会话信息（用户、文件名、大小、分片大小）
+- {index}.chunk: 已完整接收的分片（写入临时文件后重命名，存在即表示完整）
+
+多个工作进程共享上传目录即可协同处理同一个会话，不依赖Redis。
+"""
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.services import storage_service
+from app.utils.file_utils import (
+    MIME_HEADER_SIZE, SavedFile, UploadSizeMismatchError, UploadTooLargeError, concat_files, get_temp_upload_path, is_allowed_content,
+    is_allowed_file, write_stream
+)
+
+
+META_FILE = "meta.json"
+LOCK_DIR = ".assembling"
+
+
+class UploadSessionError(Exception):
+    """上传会话错误"""
+
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(detail)
+
+
+def _sessions_dir() -> str:
+    return os.path.join(settings.UPLOAD_DIR, "tmp")
+
+
+def _session_dir(session_id: str) -> str:
+    return os.path.join(_sessions_dir(), session_id)
+
+
+def _chunk_path(session_id: str, index: int) -> str:
+    return os.path.join(_session_dir(session_id), f"{index:06d}.chunk")
+
+
+def _chunk_size_of(meta: dict, index: int) -> int:
+    """分片的应有大小（最后一个分片可能更小）"""
+    return min(meta["chunk_size"], meta["size"] - index * meta["chunk_size"])
+
+
+def _to_info(session_id: str, meta: dict) -> dict:
+    total_chunks = meta["total_chunks"]
+    received = [index for index in range(total_chunks) if os.path.exists(_chunk_path(session_id, index))]
+    received_set = set(received)
+    return {
+        "session_id": session_id,
+        "filename": meta["filename"],
+        "size": meta["size"],
+        "chunk_size": meta["chunk_size"],
+        "total_chunks": total_chunks,
+        "received_chunks": received,
+        "missing_chunks": [index for index in range(total_chunks) if index not in received_set],
+        "uploaded_bytes": sum(_chunk_size_of(meta, index) for index in received),
+        "created_at": meta["created_at"]
+    }
+
+
+def create_session(user_id: int, filename: str, size: int, chunk_size: Optional[int] = None) -> dict:
+    """
+    创建视频分片上传会话
+
+    Args:
+        user_id: 用户ID
+        filename: 原始文件名
+        size: 文件总大小（字节）
+        chunk_size: 分片大小（字节），默认 UPLOAD_SESSION_CHUNK_SIZE
+
+    Returns:
+        dict: 会话信息（含 session_id、total_chunks、missing_chunks 等）
+
+    Raises:
+        UploadSessionError: 文件类型或大小不符合要求
+    """
+    if not is_allowed_file(filename, 'video'):
+        raise UploadSessionError(400, f"不支持的视频格式，仅支持：{settings.ALLOWED_VIDEO_TYPES}")
+    if size > settings.MAX_UPLOAD_SIZE:
+        raise UploadSessionError(400, str(UploadTooLargeError(settings.MAX_UPLOAD_SIZE)))
+
+    chunk_size = chunk_size or settings.UPLOAD_SESSION_CHUNK_SIZE
+    session_id = uuid.uuid4().hex
+    meta = {
+        "user_id": user_id,
+        "filename": filename,
+        "size": size,
+        "chunk_size": chunk_size,
+        "total_chunks": max((size + chunk_size - 1) // chunk_size, 1),
+        "created_at": int(time.time())
+    }
+    os.makedirs(_session_dir(session_id))
+    with open(os.path.join(_session_dir(session_id), META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return _to_info(session_id, meta)
+
+
+def _load(session_id: str, user_id: int) -> dict:
+    try:
+        with open(os.path.join(_session_dir(session_id), META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        raise UploadSessionError(404, "上传会话不存在或已过期")
+    if meta["user_id"] != user_id:
+        raise UploadSessionError(404, "上传会话不存在或已过期")
+    return meta
+
+
+def get_session(session_id: str, user_id: int) -> dict:
+    """
+    查询会话进度（已接收和缺失的分片）
+
+    Args:
+        session_id: 会话ID
+        user_id: 用户ID
+
+    Returns:
+        dict: 会话信息
+
+    Raises:
+        UploadSessionError: 会话不存在
+    """
+    return _to_info(session_id, _load(session_id, user_id))
+
+
+async def write_chunk(session_id: str, user_id: int, index: int, chunks: AsyncIterator[bytes]) -> Dict[str, object]:
+    """
+    写入一个分片（重复上传同一分片会覆盖，不同分片可并行上传）
+
+    Args:
+        session_id: 会话ID
+        user_id: 用户ID
+        index: 分片序号（从0开始）
+        chunks: 分片内容字节流
+
+    Returns:
+        Dict[str, object]: 分片序号、大小和sha256
+
+    Raises:
+        UploadSessionError: 会话不存在、序号越界或分片大小不符
+    """
+    meta = _load(session_id, user_id)
+    if not 0 <= index < meta["total_chunks"]:
+        raise UploadSessionError(400, f"分片序号超出范围（0-{meta['total_chunks'] - 1}）")
+    if os.path.isdir(os.path.join(_session_dir(session_id), LOCK_DIR)):
+        raise UploadSessionError(409, "上传会话正在合并")
+
+    expected = _chunk_size_of(meta, index)
+    chunk_path = _chunk_path(session_id, index)
+    try:
+        size, sha256 = await write_stream(chunks, chunk_path, expected, expected_size=expected)
+    except UploadTooLargeError:
+        raise UploadSessionError(400, f"分片大小应为 {expected} 字节")
+    except UploadSizeMismatchError as e:
+        raise UploadSessionError(400, f"分片{e}")
+    except FileNotFoundError:
+        # 写入期间会话被取消或已合并完成
+        raise UploadSessionError(404, "上传会话不存在或已过期")
+    return {"index": index, "size": size, "sha256": sha256}
+
+
+def complete_session(db: Session, session_id: str, user_id: int) -> SavedFile:
+    """
+    合并全部分片为最终文件（阻塞调用，应在线程池中执行），成功后删除会话
+
+    最终文件与普通上传一样按内容哈希存储，相同内容只保存一份。
+
+    Args:
+        db: 数据库会话
+        session_id: 会话ID
+        user_id: 用户ID
+
+    Returns:
+        SavedFile: 保存结果
+
+    Raises:
+        UploadSessionError: 会话不存在、分片缺失、文件内容不是视频或正在合并
+    """
+    meta = _load(session_id, user_id)
+    info = _to_info(session_id, meta)
+    if info["missing_chunks"]:
+        raise UploadSessionError(400, f"还有 {len(info['missing_chunks'])} 个分片未上传")
+    with open(_chunk_path(session_id, 0), "rb") as f:
+        if not is_allowed_content(f.read(MIME_HEADER_SIZE), 'video'):
+            raise UploadSessionError(400, "文件内容不是有效的视频")
+
+    lock_dir = os.path.join(_session_dir(session_id), LOCK_DIR)
+    try:
+        os.mkdir(lock_dir)
+    except FileExistsError:
+        raise UploadSessionError(409, "上传会话正在合并")
+
+    temp_path = get_temp_upload_path(meta["filename"])
+    try:
+        concat_files([_chunk_path(session_id, index) for index in range(meta["total_chunks"])], temp_path)
+        saved = storage_service.store_file(db, temp_path, meta["filename"], 'video')
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        os.rmdir(lock_dir)
+        raise
+
+    shutil.rmtree(_session_dir(session_id), ignore_errors=True)
+    return saved
+
+
+def abort_session(session_id: str, user_id: int) -> None:
+    """
+    取消上传会话并删除已上传的分片
+
+    Args:
+        session_id: 会话ID
+        user_id: 用户ID
+
+    Raises:
+        UploadSessionError: 会话不存在
+    """
+    _load(session_id, user_id)
+    shutil.rmtree(_session_dir(session_id), ignore_errors=True)
+
+
+def cleanup_stale_upload_sessions() -> List[str]:
+    """
+    删除超过 UPLOAD_SESSION_TTL 未活动的上传会话（及中断上传遗留的临时文件）
+
+    Returns:
+        List[str]: 被删除的会话ID
+    """
+    sessions_dir = _sessions_dir()
+    if not os.path.isdir(sessions_dir):
+        return []
+
+    deadline = time.time() - settings.UPLOAD_SESSION_TTL
+    removed = []
+    for entry in os.scandir(sessions_dir):
+        if not entry.is_dir():
+            try:
+                if entry.stat().st_mtime < deadline:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+            continue
+        # 最近活动时间：目录及其中文件的最晚修改时间
+        try:
+            last_active = max([entry.stat().st_mtime] + [child.stat().st_mtime for child in os.scandir(entry.path)])
+        except FileNotFoundError:
+            continue
+        if last_active < deadline:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed.append(entry.name)
+    return removed
@@ -0,0 +1,125 @@
+"""
+课程浏览次数缓冲计数
+
+浏览次数先累加在Redis中（Redis不可用时累加在进程内），
+由周期任务批量写回 courses.view_count，避免每次访问详情都写数据库。
+"""
+import threading
+from collections import Counter
+from typing import Dict
+from sqlalchemy import case, update
+from app.core.database import SessionLocal
+from app.models.course import Course
+from app.services.redis_service import redis_service
+from app.services import course_cache
+
+
+VIEW_KEY_PREFIX = "course:views:"
+DIRTY_SET_KEY = "course:views:dirty"
+
+# Redis不可用时的进程内计数
+_local_views: Counter = Counter()
+_lock = threading.Lock()
+
+
+def record_view(course_id: int) -> None:
+    """
+    记录一次课程浏览
+
+    Args:
+        course_id: 课程ID
+    """
+    try:
+        redis_service.incr(f"{VIEW_KEY_PREFIX}{course_id}")
+        redis_service.sadd(DIRTY_SET_KEY, course_id)
+    except Exception:
+        with _lock:
+            _local_views[course_id] += 1
+
+
+def get_pending_views(course_id: int) -> int:
+    """
+    获取尚未写回数据库的浏览次数
+
+    Args:
+        course_id: 课程ID
+
+    Returns:
+        int: 待写回的增量
+    """
+    pending = _local_views.get(course_id, 0)
+    try:
+        pending += int(redis_service.get(f"{VIEW_KEY_PREFIX}{course_id}") or 0)
+    except Exception:
+        pass
+    return pending
+
+
+def _take_pending() -> Dict[int, int]:
+    """取出全部待写回的增量（取出后计数清零）"""
+    with _lock:
+        deltas = dict(_local_views)
+        _local_views.clear()
+
+    try:
+        while True:
+            course_ids = redis_service.spop(DIRTY_SET_KEY, 500)
+            if not course_ids:
+                break
+            for course_id in course_ids:
+                delta = int(redis_service.getset(f"{VIEW_KEY_PREFIX}{course_id}", 0) or 0)
+                if delta:
+                    deltas[int(course_id)] = deltas.get(int(course_id), 0) + delta
+    except Exception as e:
+        print(f"Redis 读取浏览次数失败: {e}")
+
+    return deltas
+
+
+def _restore_pending(deltas: Dict[int, int]) -> None:
+    """写回失败时把增量放回缓冲区"""
+    for course_id, delta in deltas.items():
+        try:
+            redis_service.incr(f"{VIEW_KEY_PREFIX}{course_id}", delta)
+            redis_service.sadd(DIRTY_SET_KEY, course_id)
+        except Exception:
+            with _lock:
+                _local_views[course_id] += delta
+
+
+def flush_view_counts() -> Dict[int, int]:
+    """
+    将缓冲的浏览次数用一条 UPDATE 批量写回数据库
+
+    Returns:
+        Dict[int, int]: 本次写回的 课程ID -> 增量
+    """
+    deltas = _take_pending()
+    if not deltas:
+        return deltas
+
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Course)
+            .where(Course.id.in_(deltas.keys()))
+            .values(
+                view_count=Course.view_count + case(deltas, value=Course.id, else_=0),
+                # 浏览次数不算作课程内容更新
+                updated_at=Course.updated_at
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        _restore_pending(deltas)
+        raise
+    finally:
+        db.close()
+
+    # 缓存中的详情带有旧的浏览次数，写回后使其失效
+    for course_id in deltas:
+        course_cache.invalidate_course(course_id)
+
+    return deltas
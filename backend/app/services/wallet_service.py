@@ -0,0 +1,264 @@
+"""
+钱包记账
+
+余额变动统一通过条件原子 UPDATE 完成（balance = balance + x，扣款附加 balance >= x），
+不在Python中读-改-写余额，并发扣款不会超扣，也不会丢失更新。
+金额使用 Decimal（精确到分），交易记录可携带幂等键，重试的请求只记账一次；
+幂等键在同一钱包内唯一，已用于其他交易（类型、金额或课程不同）时拒绝而不是返回原交易。
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional, Tuple, Union
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.wallet import Wallet, Transaction, TransactionType
+
+
+CENT = Decimal("0.01")
+
+
+class InsufficientBalanceError(Exception):
+    """余额不足"""
+
+    def __init__(self, balance: Decimal, amount: Decimal):
+        self.balance = balance
+        self.amount = amount
+        super().__init__(f"余额不足，需要 ¥{amount}，当前余额 ¥{balance}")
+
+
+class IdempotencyKeyReusedError(Exception):
+    """幂等键已用于其他交易"""
+
+    def __init__(self):
+        super().__init__("Idempotency-Key 已用于其他请求")
+
+
+def to_amount(value: Union[Decimal, float, int, str, None]) -> Decimal:
+    """
+    转换为精确到分的金额
+
+    Args:
+        value: 金额（float 按十进制字符串转换，避免二进制误差）
+
+    Returns:
+        Decimal: 金额
+    """
+    if value is None:
+        return Decimal("0.00")
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def get_or_create_wallet(db: Session, user_id: int) -> Wallet:
+    """
+    获取用户钱包，不存在时创建（并发创建时以先提交的为准）
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+
+    Returns:
+        Wallet: 钱包
+    """
+    wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
+    if wallet:
+        return wallet
+
+    try:
+        with db.begin_nested():
+            wallet = Wallet(user_id=user_id, balance=Decimal("0.00"))
+            db.add(wallet)
+    except IntegrityError:
+        wallet = db.query(Wallet).filter(Wallet.user_id == user_id).with_for_update().one()
+    return wallet
+
+
+def get_transaction_by_key(db: Session, user_id: int, idempotency_key: str, lock: bool = False) -> Optional[Transaction]:
+    """
+    按幂等键查找已记账的交易
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+        idempotency_key: 幂等键
+        lock: 是否使用加锁读（读取其他事务刚提交的记录）
+
+    Returns:
+        Optional[Transaction]: 交易记录
+    """
+    query = db.query(Transaction).join(Wallet, Wallet.id == Transaction.wallet_id).filter(
+        Wallet.user_id == user_id,
+        Transaction.idempotency_key == idempotency_key
+    )
+    if lock:
+        query = query.with_for_update()
+    return query.first()
+
+
+def check_replay(
+    transaction: Transaction,
+    type: TransactionType,
+    course_id: Optional[int] = None,
+    amount: Optional[Decimal] = None
+) -> Transaction:
+    """
+    校验按幂等键找到的交易与本次请求一致
+
+    Args:
+        transaction: 按幂等键找到的交易
+        type: 本次交易类型
+        course_id: 本次关联课程ID
+        amount: 本次变动金额，为空时不校验
+
+    Returns:
+        Transaction: 原交易
+
+    Raises:
+        IdempotencyKeyReusedError: 幂等键已用于其他交易
+    """
+    if (
+        transaction.type != type
+        or transaction.course_id != course_id
+        or (amount is not None and to_amount(transaction.amount) != amount)
+    ):
+        raise IdempotencyKeyReusedError()
+    return transaction
+
+
+def apply_transaction(
+    db: Session,
+    user_id: int,
+    amount: Union[Decimal, float, int, str],
+    type: TransactionType,
+    description: str,
+    course_id: Optional[int] = None,
+    idempotency_key: Optional[str] = None
+) -> Tuple[Transaction, bool]:
+    """
+    记一笔账（正数入账，负数扣款），不提交事务
+
+    余额变更和交易记录在同一个保存点中写入；幂等键冲突时回滚本次变更并返回已有交易。
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+        amount: 变动金额
+        type: 交易类型
+        description: 交易描述
+        course_id: 关联课程ID
+        idempotency_key: 幂等键
+
+    Returns:
+        Tuple[Transaction, bool]: (交易记录, 是否本次新记账)；幂等键已使用过时返回原交易和False
+
+    Raises:
+        InsufficientBalanceError: 扣款时余额不足
+        IdempotencyKeyReusedError: 幂等键已用于其他交易
+    """
+    amount = to_amount(amount)
+    if idempotency_key:
+        existing = get_transaction_by_key(db, user_id, idempotency_key)
+        if existing:
+            return check_replay(existing, type, course_id, amount), False
+
+    wallet = get_or_create_wallet(db, user_id)
+    try:
+        with db.begin_nested():
+            stmt = (
+                update(Wallet)
+                .where(Wallet.id == wallet.id)
+                .values(balance=Wallet.balance + amount)
+                .execution_options(synchronize_session=False)
+            )
+            if amount < 0:
+                stmt = stmt.where(Wallet.balance >= -amount)
+            if db.execute(stmt).rowcount == 0:
+                db.refresh(wallet, ["balance"])
+                raise InsufficientBalanceError(to_amount(wallet.balance), -amount)
+
+            # UPDATE 已持有行锁，读到的就是本次变更后的余额
+            db.refresh(wallet, ["balance"])
+            balance_after = to_amount(wallet.balance)
+            transaction = Transaction(
+                wallet_id=wallet.id,
+                user_id=user_id,
+                type=type,
+                amount=amount,
+                balance_before=balance_after - amount,
+                balance_after=balance_after,
+                description=description,
+                course_id=course_id,
+                idempotency_key=idempotency_key
+            )
+            db.add(transaction)
+    except IntegrityError:
+        if not idempotency_key:
+            raise
+        # 相同幂等键的并发请求已先记账
+        existing = get_transaction_by_key(db, user_id, idempotency_key, lock=True)
+        return check_replay(existing, type, course_id, amount), False
+
+    return transaction, True
+
+
+def credit(
+    db: Session,
+    user_id: int,
+    amount: Union[Decimal, float, int, str],
+    type: TransactionType,
+    description: str,
+    idempotency_key: Optional[str] = None
+) -> Tuple[Transaction, bool]:
+    """
+    入账（充值、管理员添加、退款），不提交事务
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+        amount: 入账金额（正数）
+        type: 交易类型
+        description: 交易描述
+        idempotency_key: 幂等键
+
+    Returns:
+        Tuple[Transaction, bool]: (交易记录, 是否本次新记账)
+
+    Raises:
+        IdempotencyKeyReusedError: 幂等键已用于其他交易
+    """
+    return apply_transaction(db, user_id, to_amount(amount), type, description, idempotency_key=idempotency_key)
+
+
+def debit(
+    db: Session,
+    user_id: int,
+    amount: Union[Decimal, float, int, str],
+    type: TransactionType,
+    description: str,
+    course_id: Optional[int] = None,
+    idempotency_key: Optional[str] = None
+) -> Tuple[Transaction, bool]:
+    """
+    扣款，不提交事务
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+        amount: 扣款金额（正数）
+        type: 交易类型
+        description: 交易描述
+        course_id: 关联课程ID
+        idempotency_key: 幂等键
+
+    Returns:
+        Tuple[Transaction, bool]: (交易记录, 是否本次新记账)
+
+    Raises:
+        InsufficientBalanceError: 余额不足
+        IdempotencyKeyReusedError: 幂等键已用于其他交易
+    """
+    return apply_transaction(
+        db, user_id, -to_amount(amount), type, description,
+        course_id=course_id, idempotency_key=idempotency_key
+    )
@@ -1,16 +1,33 @@
 """
 文件处理工具
 """
+import glob
+import hashlib
 import os
 import uuid
-from typing import Optional
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Optional, Tuple
+import aiofiles
 from fastapi import UploadFile
 from app.core.config import settings
 
+try:
+    import magic
+except ImportError:  # 未安装 python-magic 或系统缺少 libmagic 时使用内置文件头签名
+    magic = None
+
 
 ALLOWED_IMAGE_EXTENSIONS = settings.ALLOWED_IMAGE_TYPES.split(',')
 ALLOWED_VIDEO_EXTENSIONS = settings.ALLOWED_VIDEO_TYPES.split(',')
 
+# 按文件内容（魔数）识别的允许类型
+ALLOWED_MIME_TYPES = {
+    'image': {'image/jpeg', 'image/png', 'image/gif', 'image/webp'},
+    'video': {'video/mp4', 'video/x-msvideo', 'video/avi', 'video/quicktime', 'video/x-flv'},
+}
+# 识别类型需要读取的文件头长度
+MIME_HEADER_SIZE = 2048
+
 
 def get_file_extension(filename: str) -> str:
     """
@@ -46,6 +63,111 @@ def is_allowed_file(filename: str, file_type: str = 'image') -> bool:
     return False
 
 
+def _sniff_mime_type(head: bytes) -> Optional[str]:
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return 'video/x-msvideo'
+    if head[4:8] == b'ftyp':
+        return 'video/quicktime' if head[8:12] == b'qt  ' else 'video/mp4'
+    if head.startswith(b'FLV'):
+        return 'video/x-flv'
+    return None
+
+
+def detect_mime_type(head: bytes) -> Optional[str]:
+    """
+    根据文件头（魔数）识别文件类型，不依赖文件名
+
+    Args:
+        head: 文件开头的字节（建议 MIME_HEADER_SIZE 字节）
+
+    Returns:
+        Optional[str]: MIME类型，无法识别时返回None
+    """
+    if magic is not None:
+        try:
+            mime_type = magic.from_buffer(head, mime=True)
+        except Exception:
+            mime_type = None
+        if mime_type and mime_type != 'application/octet-stream':
+            return mime_type
+    return _sniff_mime_type(head)
+
+
+def is_allowed_content(head: bytes, file_type: str = 'image') -> bool:
+    """
+    检查文件内容是否为允许的类型
+
+    Args:
+        head: 文件开头的字节
+        file_type: 文件类型 ('image' 或 'video')
+
+    Returns:
+        bool: 是否允许
+    """
+    return detect_mime_type(head) in ALLOWED_MIME_TYPES.get(file_type, ())
+
+
+class UnsupportedFileTypeError(Exception):
+    """文件内容与允许的类型不符（如改了扩展名的其他文件）"""
+
+    def __init__(self, file_type: str = 'image'):
+        self.file_type = file_type
+        super().__init__("文件内容不是有效的图片" if file_type == 'image' else "文件内容不是有效的视频")
+
+
+async def check_upload_content(upload_file: UploadFile, file_type: str = 'image') -> None:
+    """
+    读取上传文件的文件头校验内容类型（读取后回到开头）
+
+    Args:
+        upload_file: 上传的文件
+        file_type: 文件类型 ('image' 或 'video')
+
+    Raises:
+        UnsupportedFileTypeError: 内容类型不允许
+    """
+    head = await upload_file.read(MIME_HEADER_SIZE)
+    await upload_file.seek(0)
+    if not is_allowed_content(head, file_type):
+        raise UnsupportedFileTypeError(file_type)
+
+
+class UploadTooLargeError(Exception):
+    """上传文件超过大小限制"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"文件大小超过限制（{max_size / 1024 / 1024:g}MB）")
+
+
+class UploadSizeMismatchError(Exception):
+    """上传内容大小与声明的大小不一致"""
+
+    def __init__(self, expected: int, actual: int):
+        self.expected = expected
+        self.actual = actual
+        super().__init__(f"大小应为 {expected} 字节，实际收到 {actual} 字节")
+
+
+@dataclass
+class SavedFile:
+    """已保存的上传文件"""
+    url: str  # 访问路径（/static/uploads/...，用于数据库存储）
+    path: str  # 磁盘路径
+    filename: str  # 原始文件名
+    size: int  # 字节数
+    sha256: str  # 内容哈希（十六进制）
+    deduplicated: bool = False  # 是否与已存储的文件内容相同（未重复存储）
+
+
 def generate_unique_filename(original_filename: str) -> str:
     """
     生成唯一的文件名
@@ -61,57 +183,324 @@ def generate_unique_filename(original_filename: str) -> str:
     return f"{unique_id}.{extension}"
 
 
-async def save_upload_file(
+async def stream_to_file(
     upload_file: UploadFile,
-    file_type: str = 'image',
-    subfolder: str = ''
-) -> Optional[str]:
+    file_path: str,
+    max_size: Optional[int] = None
+) -> Tuple[int, str]:
     """
-    保存上传的文件
-    
+    分块将上传内容写入磁盘，边写边计算大小和哈希，内存占用与文件大小无关
+
+    先写入临时文件，完成后再重命名，失败时不会留下不完整的文件。
+
     Args:
         upload_file: 上传的文件
+        file_path: 目标文件路径
+        max_size: 大小限制（字节），默认 MAX_UPLOAD_SIZE
+
+    Returns:
+        Tuple[int, str]: (文件大小, sha256十六进制)
+
+    Raises:
+        UploadTooLargeError: 超过大小限制
+    """
+    max_size = max_size or settings.MAX_UPLOAD_SIZE
+    # 客户端声明了大小时提前拒绝
+    if upload_file.size is not None and upload_file.size > max_size:
+        raise UploadTooLargeError(max_size)
+
+    return await write_stream(_iter_upload_file(upload_file), file_path, max_size)
+
+
+async def _iter_upload_file(upload_file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await upload_file.read(settings.UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def write_stream(
+    chunks: AsyncIterator[bytes],
+    file_path: str,
+    max_size: int,
+    expected_size: Optional[int] = None
+) -> Tuple[int, str]:
+    """
+    将字节流写入磁盘（先写临时文件，完成后重命名），边写边计算大小和哈希
+
+    每次写入使用不同的临时文件，同一目标的并发写入（如客户端重传分片）互不干扰，
+    目标文件总是某一次完整写入的内容。
+
+    Args:
+        chunks: 字节流（如上传文件分块、request.stream()）
+        file_path: 目标文件路径
+        max_size: 大小限制（字节）
+        expected_size: 应有的大小，不一致时不写入目标文件
+
+    Returns:
+        Tuple[int, str]: (文件大小, sha256十六进制)
+
+    Raises:
+        UploadTooLargeError: 超过大小限制
+        UploadSizeMismatchError: 大小与 expected_size 不一致
+    """
+    temp_path = f"{file_path}.{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, 'wb') as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(max_size)
+                digest.update(chunk)
+                await f.write(chunk)
+        if expected_size is not None and size != expected_size:
+            raise UploadSizeMismatchError(expected_size, size)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return size, digest.hexdigest()
+
+
+def concat_files(sources: Iterable[str], dest_path: str) -> int:
+    """
+    按顺序拼接文件（阻塞调用，应在线程池中执行）
+
+    优先使用内核零拷贝 os.copy_file_range，不支持时退回 os.sendfile，最后退回普通读写。
+
+    Args:
+        sources: 源文件路径（按顺序）
+        dest_path: 目标文件路径
+
+    Returns:
+        int: 目标文件大小
+    """
+    with open(dest_path, 'wb') as dest:
+        offset = 0
+        for source in sources:
+            with open(source, 'rb') as src:
+                size = os.fstat(src.fileno()).st_size
+                _copy_range(src, dest, size, offset)
+                offset += size
+                dest.seek(offset)
+    return offset
+
+
+def _copy_range(src, dest, size: int, dest_offset: int) -> None:
+    copied = 0
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < size:
+                sent = os.copy_file_range(src.fileno(), dest.fileno(), size - copied, copied, dest_offset + copied)
+                if sent == 0:
+                    break
+                copied += sent
+        except OSError:
+            pass  # 跨文件系统或内核不支持，退回下面的方式
+    if copied < size and hasattr(os, 'sendfile'):
+        try:
+            os.lseek(dest.fileno(), dest_offset + copied, os.SEEK_SET)
+            while copied < size:
+                sent = os.sendfile(dest.fileno(), src.fileno(), copied, size - copied)
+                if sent == 0:
+                    break
+                copied += sent
+        except OSError:
+            pass
+    if copied < size:
+        src.seek(copied)
+        dest.seek(dest_offset + copied)
+        while copied < size:
+            data = src.read(min(settings.UPLOAD_CHUNK_SIZE, size - copied))
+            if not data:
+                break
+            dest.write(data)
+            copied += len(data)
+    dest.flush()
+
+
+def hash_file(file_path: str) -> str:
+    """
+    分块计算文件的sha256（阻塞调用，应在线程池中执行）
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        str: sha256十六进制
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_upload_dir(file_type: str = 'image', subfolder: str = '') -> str:
+    """
+    获取上传文件的保存目录（不存在时创建）
+
+    Args:
         file_type: 文件类型 ('image' 或 'video')
         subfolder: 子文件夹名称
-    
+
     Returns:
-        Optional[str]: 文件相对路径，失败返回None
+        str: 目录路径
     """
-    # 检查文件类型
-    if not is_allowed_file(upload_file.filename, file_type):
-        return None
-    
-    # 生成唯一文件名
-    filename = generate_unique_filename(upload_file.filename)
-    
-    # 确定保存路径
     if file_type == 'image':
         base_dir = os.path.join(settings.UPLOAD_DIR, 'images')
     elif file_type == 'video':
         base_dir = os.path.join(settings.UPLOAD_DIR, 'videos')
     else:
         base_dir = settings.UPLOAD_DIR
-    
+
     # 添加子文件夹
     if subfolder:
         base_dir = os.path.join(base_dir, subfolder)
-    
+
     # 确保目录存在
     os.makedirs(base_dir, exist_ok=True)
+    return base_dir
+
+
+def get_temp_upload_path(original_filename: str) -> str:
+    """
+    获取上传中转用的临时文件路径（UPLOAD_DIR/tmp，与最终目录在同一文件系统，可直接重命名）
+
+    Args:
+        original_filename: 原始文件名
+
+    Returns:
+        str: 临时文件路径
+    """
+    return os.path.join(get_upload_dir('', 'tmp'), generate_unique_filename(original_filename))
+
+
+def get_content_path(sha256: str, file_type: str, extension: str, subfolder: str = '') -> str:
+    """
+    获取按内容寻址的文件路径：{类型目录}/{sha256前2位}/{3-4位}/{sha256}.{扩展名}
+
+    Args:
+        sha256: 内容哈希
+        file_type: 文件类型 ('image' 或 'video')
+        extension: 扩展名（不含点）
+        subfolder: 子文件夹名称
+
+    Returns:
+        str: 文件路径（目录不存在时创建）
+    """
+    base_dir = get_upload_dir(file_type, os.path.join(subfolder, sha256[:2], sha256[2:4]))
+    return os.path.join(base_dir, f"{sha256}.{extension}")
+
+
+def move_to_content_path(temp_path: str, sha256: str, file_type: str, extension: str, subfolder: str = '') -> str:
+    """
+    将临时文件移动到内容寻址路径，相同内容已存在时直接删除临时文件
+
+    Args:
+        temp_path: 临时文件路径
+        sha256: 内容哈希
+        file_type: 文件类型
+        extension: 扩展名
+        subfolder: 子文件夹名称
+
+    Returns:
+        str: 最终文件路径
+    """
+    file_path = get_content_path(sha256, file_type, extension, subfolder)
+    if os.path.exists(file_path):
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, file_path)
+    return file_path
+
+
+def to_local_path(url: str) -> str:
+    """
+    访问路径转换为磁盘路径
+
+    Args:
+        url: 访问路径（/static/uploads/...）
+
+    Returns:
+        str: 磁盘路径
+    """
+    if url.startswith('/static/uploads'):
+        return url.replace('/static/uploads', settings.UPLOAD_DIR, 1)
+    return url
+
+
+def to_static_url(file_path: str) -> str:
+    """
+    磁盘路径转换为访问路径
+
+    Args:
+        file_path: 磁盘路径
+
+    Returns:
+        str: 访问路径（/static/uploads/...）
+    """
+    return file_path.replace(settings.UPLOAD_DIR, '/static/uploads').replace('\\', '/')
+
+
+async def save_upload_file(
+    upload_file: UploadFile,
+    file_type: str = 'image',
+    subfolder: str = '',
+    max_size: Optional[int] = None
+) -> Optional[SavedFile]:
+    """
+    保存上传的文件（分块流式写入，按内容哈希命名，相同内容只存一份）
+
+    不记录引用计数，接口中应使用 storage_service.store_upload。
+    
+    Args:
+        upload_file: 上传的文件
+        file_type: 文件类型 ('image' 或 'video')
+        subfolder: 子文件夹名称
+        max_size: 大小限制（字节），默认 MAX_UPLOAD_SIZE
+    
+    Returns:
+        Optional[SavedFile]: 保存结果，失败返回None
+
+    Raises:
+        UploadTooLargeError: 超过大小限制
+        UnsupportedFileTypeError: 文件内容类型不允许
+    """
+    # 检查文件类型（扩展名和文件头）
+    if not is_allowed_file(upload_file.filename, file_type):
+        return None
+    await check_upload_content(upload_file, file_type)
     
-    # 完整文件路径
-    file_path = os.path.join(base_dir, filename)
+    # 先写入临时文件，边写边计算哈希
+    temp_path = get_temp_upload_path(upload_file.filename)
     
     # 保存文件
     try:
-        with open(file_path, 'wb') as f:
-            content = await upload_file.read()
-            f.write(content)
+        size, sha256 = await stream_to_file(upload_file, temp_path, max_size)
+        file_path = move_to_content_path(
+            temp_path, sha256, file_type, get_file_extension(upload_file.filename), subfolder
+        )
         
         # 返回相对路径（用于数据库存储）
-        relative_path = file_path.replace(settings.UPLOAD_DIR, '/static/uploads').replace('\\', '/')
-        return relative_path
+        return SavedFile(
+            url=to_static_url(file_path),
+            path=file_path,
+            filename=upload_file.filename,
+            size=size,
+            sha256=sha256
+        )
     
+    except UploadTooLargeError:
+        raise
     except Exception as e:
         print(f"文件保存失败: {e}")
         return None
@@ -119,7 +508,7 @@ async def save_upload_file(
 
 def delete_file(file_path: str) -> bool:
     """
-    删除文件
+    删除文件（同时删除该图片的衍生图 {文件名}_{尺寸}.{格式}）
     
     Args:
         file_path: 文件路径（相对路径）
@@ -134,6 +523,9 @@ def delete_file(file_path: str) -> bool:
         
         if os.path.exists(file_path):
             os.remove(file_path)
+            stem, _ = os.path.splitext(file_path)
+            for variant_path in glob.glob(f"{glob.escape(stem)}_*.*"):
+                os.remove(variant_path)
             return True
         return False
     
@@ -0,0 +1,273 @@
+"""
+视频文件响应（HTTP Range / 条件请求）
+
+Starlette 的 StaticFiles 不支持 Range，播放器拖动进度条时只能从头重新下载整个文件。
+MediaFileResponse 支持：
+- 单个和多个字节范围（206；多个范围时返回 multipart/byteranges），范围不可满足时返回416
+- ETag / Last-Modified，If-None-Match / If-Modified-Since 命中时返回304，If-Range 校验
+- 长期缓存（上传文件按内容哈希命名，内容不会变化）
+- 服务器支持 ASGI zerocopysend 扩展时交给内核 sendfile，否则在线程池中分块读取
+"""
+import mimetypes
+import os
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from typing import List, Optional, Tuple
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from app.core.config import settings
+
+
+mimetypes.add_type('video/mp4', '.mp4')
+mimetypes.add_type('video/x-flv', '.flv')
+mimetypes.add_type('video/quicktime', '.mov')
+mimetypes.add_type('video/x-msvideo', '.avi')
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+
+class RangeNotSatisfiableError(Exception):
+    """Range 请求的范围全部超出文件大小"""
+
+
+def parse_range_header(value: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    解析 Range 请求头
+
+    Args:
+        value: Range 请求头（如 bytes=0-1023,-500）
+        size: 文件大小
+
+    Returns:
+        Optional[List[Tuple[int, int]]]: 按起点排序并合并重叠部分后的范围（起止均包含），
+            格式错误或范围过多时返回None（按 RFC 9110 忽略 Range，返回完整文件）
+
+    Raises:
+        RangeNotSatisfiableError: 没有可满足的范围
+    """
+    unit, _, specs = value.partition('=')
+    if unit.strip().lower() != 'bytes' or not specs.strip():
+        return None
+
+    ranges = []
+    for spec in specs.split(','):
+        spec = spec.strip()
+        if not spec:
+            continue
+        first, sep, last = spec.partition('-')
+        first, last = first.strip(), last.strip()
+        if not sep or not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+        if first:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            end = int(last) if last else size - 1
+        else:
+            # 后缀范围：最后 N 个字节
+            suffix = int(last)
+            if suffix == 0:
+                continue
+            start, end = max(size - suffix, 0), size - 1
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiableError()
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+
+    if len(merged) > settings.MEDIA_MAX_RANGES:
+        return None
+    return merged
+
+
+def _etag_matches(header: str, etag: str, weak: bool) -> bool:
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if weak:
+            candidate = candidate[2:] if candidate.startswith('W/') else candidate
+        if candidate == etag:
+            return True
+    return False
+
+
+def _parse_http_date(value: str) -> Optional[int]:
+    try:
+        return int(parsedate_to_datetime(value).timestamp())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _read_at(path: str, offset: int, size: int) -> bytes:
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+class MediaFileResponse(Response):
+    """支持 Range 和条件请求的文件响应"""
+
+    def __init__(
+        self,
+        path: str,
+        stat_result: os.stat_result,
+        request_headers: Headers,
+        method: str = "GET",
+        media_type: Optional[str] = None
+    ) -> None:
+        self.path = path
+        self.background = None
+        self.send_header_only = method.upper() == "HEAD"
+        self.size = stat_result.st_size
+        self.mtime = int(stat_result.st_mtime)
+        self.ranges: List[Tuple[int, int]] = []
+        self.part_headers: List[bytes] = []
+        self.boundary = b''
+        self.content_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+        self.etag = f'"{stat_result.st_mtime_ns:x}-{self.size:x}"'
+        self.last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": self.etag,
+            "last-modified": self.last_modified,
+            "cache-control": f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable"
+        }
+
+        if self._not_modified(request_headers):
+            self.status_code = 304
+            self.media_type = None
+            self.send_header_only = True
+            self.init_headers(headers)
+            return
+
+        ranges = None
+        range_header = request_headers.get("range")
+        if range_header and self._if_range_matches(request_headers.get("if-range")):
+            try:
+                ranges = parse_range_header(range_header, self.size)
+            except RangeNotSatisfiableError:
+                self.status_code = 416
+                self.media_type = None
+                self.send_header_only = True
+                headers["content-range"] = f"bytes */{self.size}"
+                headers["content-length"] = "0"
+                self.init_headers(headers)
+                return
+
+        if ranges is None:
+            self.status_code = 200
+            self.media_type = self.content_type
+            self.ranges = [(0, self.size - 1)] if self.size else []
+            headers["content-length"] = str(self.size)
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.status_code = 206
+            self.media_type = self.content_type
+            self.ranges = ranges
+            headers["content-range"] = f"bytes {start}-{end}/{self.size}"
+            headers["content-length"] = str(end - start + 1)
+        else:
+            self.status_code = 206
+            self.ranges = ranges
+            self.boundary = uuid.uuid4().hex.encode("latin-1")
+            self.media_type = f"multipart/byteranges; boundary={self.boundary.decode('latin-1')}"
+            for index, (start, end) in enumerate(ranges):
+                self.part_headers.append(
+                    (b"\r\n" if index else b"") + b"--" + self.boundary + b"\r\n"
+                    + f"Content-Type: {self.content_type}\r\n"
+                      f"Content-Range: bytes {start}-{end}/{self.size}\r\n\r\n".encode("latin-1")
+                )
+            content_length = sum(len(part) for part in self.part_headers) + len(self._closing_boundary())
+            content_length += sum(end - start + 1 for start, end in ranges)
+            headers["content-length"] = str(content_length)
+
+        self.init_headers(headers)
+
+    def _closing_boundary(self) -> bytes:
+        return b"\r\n--" + self.boundary + b"--\r\n"
+
+    def _not_modified(self, request_headers: Headers) -> bool:
+        # 有 If-None-Match 时忽略 If-Modified-Since（RFC 9110 13.2.2）
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            return _etag_matches(if_none_match, self.etag, weak=True)
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            since = _parse_http_date(if_modified_since)
+            return since is not None and self.mtime <= since
+        return False
+
+    def _if_range_matches(self, if_range: Optional[str]) -> bool:
+        if not if_range:
+            return True
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            # If-Range 要求强校验，弱ETag永不匹配
+            return if_range == self.etag
+        return _parse_http_date(if_range) == self.mtime
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only or not self.ranges:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        # 客户端断开（如拖动进度条后取消旧请求）时立即停止发送
+        async with anyio.create_task_group() as task_group:
+            async def wrap(func) -> None:
+                await func()
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(wrap, partial(self._send_ranges, scope, send))
+            await wrap(partial(self._listen_for_disconnect, receive))
+
+    async def _listen_for_disconnect(self, receive: Receive) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+
+    async def _send_ranges(self, scope: Scope, send: Send) -> None:
+        zerocopy = ZEROCOPY_EXTENSION in scope.get("extensions", {})
+        if zerocopy:
+            with open(self.path, 'rb') as f:
+                await self._send_parts(send, partial(self._send_zerocopy, send, f.fileno()))
+        else:
+            await self._send_parts(send, partial(self._send_chunks, send))
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_parts(self, send: Send, send_range) -> None:
+        for index, (start, end) in enumerate(self.ranges):
+            if self.part_headers:
+                await send({"type": "http.response.body", "body": self.part_headers[index], "more_body": True})
+            await send_range(start, end - start + 1)
+        if self.part_headers:
+            await send({"type": "http.response.body", "body": self._closing_boundary(), "more_body": True})
+
+    async def _send_zerocopy(self, send: Send, fd: int, offset: int, count: int) -> None:
+        # 由服务器调用 os.sendfile 直接从页缓存写入套接字
+        await send({"type": ZEROCOPY_EXTENSION, "file": fd, "offset": offset, "count": count, "more_body": True})
+
+    async def _send_chunks(self, send: Send, offset: int, count: int) -> None:
+        end = offset + count
+        while offset < end:
+            chunk = await anyio.to_thread.run_sync(
+                _read_at, self.path, offset, min(settings.MEDIA_CHUNK_SIZE, end - offset)
+            )
+            if not chunk:
+                raise RuntimeError(f"文件 {self.path} 在发送过程中被截断")
+            offset += len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
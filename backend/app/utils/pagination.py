@@ -0,0 +1,91 @@
+"""
+分页工具：游标（keyset）分页
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import or_, and_
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """
+    将 (created_at, id) 编码为游标字符串
+
+    Args:
+        created_at: 创建时间
+        id: 记录ID
+
+    Returns:
+        str: URL安全的游标
+    """
+    raw = json.dumps([created_at.isoformat(), id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    解码游标字符串
+
+    Args:
+        cursor: 游标
+
+    Returns:
+        Tuple[datetime, int]: (created_at, id)
+
+    Raises:
+        HTTPException: 游标无效
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError, UnicodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标"
+        )
+
+
+def paginate_by_cursor(
+    query,
+    model,
+    cursor: str,
+    page_size: int,
+    key: Optional[Callable[[Any], Any]] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    按 (created_at desc, id desc) 进行游标分页
+
+    游标为空字符串时返回第一页。每页只扫描 page_size + 1 行，
+    与翻页深度无关。
+
+    Args:
+        query: 已添加筛选条件的查询
+        model: 模型类（需包含 created_at 和 id 字段）
+        cursor: 上一页返回的 next_cursor
+        page_size: 每页数量
+        key: 从结果行中取出模型实例的函数（查询包含附加列时使用）
+
+    Returns:
+        Tuple[List[Any], Optional[str]]: (当前页数据, 下一页游标，没有更多数据时为None)
+    """
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < last_id)
+            )
+        )
+
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(page_size + 1).all()
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = key(rows[-1]) if key else rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return rows, next_cursor
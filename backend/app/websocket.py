@@ -1,26 +1,86 @@
 """
 WebSocket处理器 - 直播弹幕功能
 """
+import asyncio
 import socketio
-from typing import Dict, Set
+from typing import Dict, Optional, Set
+from urllib.parse import parse_qs
 from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.security import decode_access_token
+from app.models.user import User
+
+# 多进程部署时通过消息队列（如Redis）在进程间转发推送
+client_manager = (
+    socketio.AsyncRedisManager(settings.SOCKETIO_MESSAGE_QUEUE)
+    if settings.SOCKETIO_MESSAGE_QUEUE else None
+)
 
 # 创建Socket.IO服务器
 sio = socketio.AsyncServer(
     async_mode='asgi',
     cors_allowed_origins='*',  # 生产环境应该配置具体的域名
+    client_manager=client_manager,
     logger=True,
     engineio_logger=True
 )
 
-# 存储房间内的用户
+# 存储房间内的用户（键为客户端传入的直播间ID）
 room_users: Dict[str, Set[str]] = {}
 
+# 所有已登录连接所在的房间（全员广播通知）
+USERS_ROOM = 'users'
+
+
+def user_room(user_id: int) -> str:
+    """用户个人房间名"""
+    return f'user:{user_id}'
+
+
+def live_room(room_id: str) -> str:
+    """
+    直播间房间名
+
+    客户端传入的直播间ID统一加前缀，客户端无法借此进入 user:{id}、users 等通知房间。
+    """
+    return f'live:{room_id}'
+
+
+def _is_active_user(user_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        user = db.query(User.is_active).filter(User.id == user_id).first()
+        return bool(user and user.is_active)
+    finally:
+        db.close()
+
+
+def _get_token(environ, auth) -> Optional[str]:
+    """从连接参数 auth.token 或查询参数 token 中读取JWT"""
+    if isinstance(auth, dict) and auth.get('token'):
+        return auth['token']
+    tokens = parse_qs(environ.get('QUERY_STRING', '')).get('token')
+    return tokens[0] if tokens else None
+
 
 @sio.event
-async def connect(sid, environ):
-    """客户端连接"""
-    print(f"Client connected: {sid}")
+async def connect(sid, environ, auth=None):
+    """
+    客户端连接
+
+    携带有效JWT且账号未被禁用的连接加入个人房间 user:{id}，用于接收通知推送；
+    未登录的连接仍可使用直播弹幕功能。
+    """
+    token = _get_token(environ, auth)
+    payload = decode_access_token(token) if token else None
+    user_id = payload.get('user_id') if payload else None
+    if user_id is not None and not await asyncio.to_thread(_is_active_user, user_id):
+        user_id = None
+    if user_id is not None:
+        await sio.save_session(sid, {'user_id': user_id})
+        await sio.enter_room(sid, user_room(user_id))
+        await sio.enter_room(sid, USERS_ROOM)
+    print(f"Client connected: {sid}, user: {user_id}")
 
 
 @sio.event
@@ -37,7 +97,7 @@ async def disconnect(sid):
             await sio.emit('user_left', {
                 'room_id': room_id,
                 'user_count': len(room_users.get(room_id, set()))
-            }, room=room_id)
+            }, room=live_room(room_id))
 
 
 @sio.event
@@ -47,7 +107,7 @@ async def join_room(sid, data):
     user_info = data.get('user_info', {})
 
     # 加入房间
-    await sio.enter_room(sid, room_id)
+    await sio.enter_room(sid, live_room(room_id))
 
     # 记录用户
     if room_id not in room_users:
@@ -59,7 +119,7 @@ async def join_room(sid, data):
         'room_id': room_id,
         'user_info': user_info,
         'user_count': len(room_users[room_id])
-    }, room=room_id)
+    }, room=live_room(room_id))
 
     print(f"User {sid} joined room {room_id}, total users: {len(room_users[room_id])}")
 
@@ -70,7 +130,7 @@ async def leave_room(sid, data):
     room_id = str(data.get('room_id'))
 
     # 离开房间
-    await sio.leave_room(sid, room_id)
+    await sio.leave_room(sid, live_room(room_id))
 
     # 移除用户记录
     if room_id in room_users and sid in room_users[room_id]:
@@ -82,7 +142,7 @@ async def leave_room(sid, data):
     await sio.emit('user_left', {
         'room_id': room_id,
         'user_count': len(room_users.get(room_id, set()))
-    }, room=room_id)
+    }, room=live_room(room_id))
 
     print(f"User {sid} left room {room_id}")
 
@@ -100,7 +160,7 @@ async def send_message(sid, data):
         'message': message,
         'user_info': user_info,
         'timestamp': data.get('timestamp')
-    }, room=room_id)
+    }, room=live_room(room_id))
 
     print(f"Message in room {room_id}: {message}")
 
@@ -118,6 +178,6 @@ async def send_gift(sid, data):
         'gift_type': gift_type,
         'user_info': user_info,
         'timestamp': data.get('timestamp')
-    }, room=room_id)
+    }, room=live_room(room_id))
 
     print(f"Gift in room {room_id}: {gift_type}")
@@ -0,0 +1,162 @@
+"""
+视频文件访问压测脚本：新的 Range 路由 vs 原 StaticFiles 挂载
+
+分别启动两个 uvicorn 进程（同一个测试视频），模拟大量观众同时观看并拖动进度条：
+每个观众循环请求随机位置的一段数据（Range: bytes=offset-offset+segment）。
+- 新路由返回206，只传输请求的片段
+- StaticFiles 不支持 Range，返回200和整个文件，观众需从头读到目标位置（与不支持 Range 时播放器的行为一致）
+
+输出每种方式的请求数、吞吐、有效数据量、实际传输量和延迟分位数。
+1000 个并发连接需要足够的文件描述符（ulimit -n 4096）；客户端与服务端在同一台机器时，
+客户端也会占用CPU，结果用于两种方式对比。
+
+用法: python benchmark_video_serving.py --viewers 1000 --duration 30 --size 64
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+import httpx
+from app.core.config import settings
+
+
+VIDEO_DIR = os.path.join(settings.UPLOAD_DIR, 'videos', 'benchmark')
+VIDEO_NAME = "benchmark.mp4"
+VIDEO_URL = f"/static/uploads/videos/benchmark/{VIDEO_NAME}"
+
+
+def _create_app(kind: str):
+    """old: 原 StaticFiles 挂载；new: 视频文件路由"""
+    from fastapi import FastAPI
+    from fastapi.staticfiles import StaticFiles
+    from app.api.v1 import media
+
+    app = FastAPI()
+    if kind == "new":
+        app.include_router(media.router, prefix="/static/uploads/videos")
+    app.mount("/static/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+    return app
+
+
+def _serve(kind: str, port: int) -> None:
+    import uvicorn
+    uvicorn.run(_create_app(kind), host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+def _start_server(kind: str, port: int) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, __file__, "--serve", kind, "--port", str(port)])
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.head(f"http://127.0.0.1:{port}{VIDEO_URL}", timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{kind} 服务启动失败")
+
+
+def _percentile(values, percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * percent / 100), len(values) - 1)]
+
+
+async def _viewer(client: httpx.AsyncClient, size: int, segment: int, deadline: float, stats: dict) -> None:
+    while time.perf_counter() < deadline:
+        offset = random.randrange(0, max(size - segment, 1))
+        end = min(offset + segment, size) - 1
+        started = time.perf_counter()
+        try:
+            async with client.stream("GET", VIDEO_URL, headers={"Range": f"bytes={offset}-{end}"}) as response:
+                # 不支持 Range 时从头读到目标片段为止，然后断开
+                needed = end - offset + 1 if response.status_code == 206 else end + 1
+                received = 0
+                async for chunk in response.aiter_raw():
+                    received += len(chunk)
+                    if received >= needed:
+                        break
+        except httpx.HTTPError:
+            stats["errors"] += 1
+            continue
+        stats["latencies"].append(time.perf_counter() - started)
+        stats["useful_bytes"] += end - offset + 1
+        stats["transferred_bytes"] += received
+
+
+async def _run_load(port: int, viewers: int, duration: float, size: int, segment: int) -> dict:
+    stats = {"latencies": [], "useful_bytes": 0, "transferred_bytes": 0, "errors": 0}
+    limits = httpx.Limits(max_connections=viewers, max_keepalive_connections=viewers)
+    timeout = httpx.Timeout(120.0)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*[_viewer(client, size, segment, deadline, stats) for _ in range(viewers)])
+        stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+
+def _report(kind: str, stats: dict) -> None:
+    latencies = stats["latencies"]
+    elapsed = stats["elapsed"]
+    mb = 1024 * 1024
+    print(f"[{kind}] 请求 {len(latencies)} 次（失败 {stats['errors']}），耗时 {elapsed:.1f}s，{len(latencies) / elapsed:.1f} 次/秒")
+    print(f"    有效数据 {stats['useful_bytes'] / mb / elapsed:.1f} MB/s，"
+          f"实际传输 {stats['transferred_bytes'] / mb:.0f} MB")
+    print(f"    延迟 p50 {_percentile(latencies, 50) * 1000:.0f}ms  "
+          f"p95 {_percentile(latencies, 95) * 1000:.0f}ms  p99 {_percentile(latencies, 99) * 1000:.0f}ms")
+
+
+def _check_new_route(port: int, data: bytes) -> None:
+    """压测前校验新路由的 Range 响应内容"""
+    base = f"http://127.0.0.1:{port}{VIDEO_URL}"
+    response = httpx.get(base, headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206 and response.content == data[100:200], "单个范围响应错误"
+    response = httpx.get(base, headers={"Range": "bytes=0-9,-10"})
+    assert response.status_code == 206 and response.headers["content-type"].startswith("multipart/byteranges")
+    response = httpx.get(base, headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304, "条件请求未返回304"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="视频文件访问压测")
+    parser.add_argument("--viewers", type=int, default=1000, help="并发观众数")
+    parser.add_argument("--duration", type=float, default=30, help="每种方式的压测时长（秒）")
+    parser.add_argument("--size", type=int, default=64, help="测试视频大小（MB）")
+    parser.add_argument("--segment", type=int, default=1024 * 1024, help="每次请求的片段大小（字节）")
+    parser.add_argument("--port", type=int, default=8701)
+    parser.add_argument("--serve", choices=["old", "new"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args.serve, args.port)
+        return
+
+    os.makedirs(VIDEO_DIR, exist_ok=True)
+    data = os.urandom(args.size * 1024 * 1024)
+    with open(os.path.join(VIDEO_DIR, VIDEO_NAME), "wb") as f:
+        f.write(data)
+
+    print(f"测试视频 {args.size}MB，{args.viewers} 个并发观众，每次请求 {args.segment // 1024}KB，每种方式 {args.duration:g}s")
+    try:
+        for kind, port in (("new", args.port), ("old", args.port + 1)):
+            process = _start_server(kind, port)
+            try:
+                if kind == "new":
+                    _check_new_route(port, data)
+                stats = asyncio.run(_run_load(port, args.viewers, args.duration, len(data), args.segment))
+                _report("Range 路由" if kind == "new" else "StaticFiles", stats)
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        shutil.rmtree(VIDEO_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+钱包并发记账压测脚本
+
+使用独立的测试用户，多线程并发扣款/入账/幂等重试，校验：
+- 扣款成功次数恰好等于余额允许的次数，余额不为负（不超扣）
+- 并发入账后余额等于逐笔累加结果（不丢失更新，无浮点误差）
+- 相同幂等键的并发请求只记账一次
+- 钱包余额 = 全部交易金额之和
+
+用法: python benchmark_wallet_concurrency.py --workers 16 --requests 400
+"""
+import argparse
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from sqlalchemy import func
+from app.core.database import SessionLocal
+from app.core.security import get_password_hash
+from app.models.user import User
+from app.models.wallet import Wallet, Transaction, TransactionType
+from app.services import wallet_service
+from app.services.wallet_service import InsufficientBalanceError
+
+
+def _run(func_, count: int, workers: int):
+    """并发执行 count 次 func_(i)，返回 (结果列表, 耗时)"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(func_, range(count)))
+    return results, time.perf_counter() - start
+
+
+def _debit(user_id: int, amount: Decimal, idempotency_key: str = None) -> bool:
+    db = SessionLocal()
+    try:
+        _, created = wallet_service.debit(
+            db, user_id, amount, TransactionType.PURCHASE, "并发压测扣款", idempotency_key=idempotency_key
+        )
+        db.commit()
+        return created
+    except InsufficientBalanceError:
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+def _credit(user_id: int, amount: Decimal) -> bool:
+    db = SessionLocal()
+    try:
+        wallet_service.credit(db, user_id, amount, TransactionType.RECHARGE, "并发压测入账")
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+
+def _balances(user_id: int):
+    db = SessionLocal()
+    try:
+        balance = db.query(Wallet.balance).filter(Wallet.user_id == user_id).scalar()
+        ledger = db.query(func.coalesce(func.sum(Transaction.amount), 0)).filter(Transaction.user_id == user_id).scalar()
+        count = db.query(func.count(Transaction.id)).filter(Transaction.user_id == user_id).scalar()
+        return wallet_service.to_amount(balance), wallet_service.to_amount(ledger), count
+    finally:
+        db.close()
+
+
+def _check(name: str, ok: bool, detail: str) -> bool:
+    print(f"  [{'通过' if ok else '失败'}] {name}: {detail}")
+    return ok
+
+
+def benchmark_wallet_concurrency(workers: int, requests: int, price: Decimal) -> bool:
+    """执行压测，全部校验通过时返回True"""
+    db = SessionLocal()
+    name = f"bench_wallet_{uuid.uuid4().hex[:8]}"
+    user = User(username=name, email=f"{name}@example.com", password_hash=get_password_hash(uuid.uuid4().hex))
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+
+    allowed = requests // 2
+    passed = True
+    try:
+        print(f"测试用户 {name}，并发 {workers}，请求数 {requests}，单价 ¥{price}")
+
+        # 1. 并发扣款：余额只够一半的请求
+        _credit(user_id, price * allowed)
+        results, elapsed = _run(lambda i: _debit(user_id, price), requests, workers)
+        balance, _, _ = _balances(user_id)
+        print(f"并发扣款 {requests} 次，耗时 {elapsed:.2f}s（{requests / elapsed:.0f} 次/秒）")
+        passed &= _check("扣款成功次数", sum(results) == allowed, f"{sum(results)} / 预期 {allowed}")
+        passed &= _check("余额不为负", balance == 0, f"¥{balance}")
+
+        # 2. 并发入账：逐笔 0.01 元
+        cent = Decimal("0.01")
+        _, elapsed = _run(lambda i: _credit(user_id, cent), requests, workers)
+        balance, _, _ = _balances(user_id)
+        print(f"并发入账 {requests} 次，耗时 {elapsed:.2f}s（{requests / elapsed:.0f} 次/秒）")
+        passed &= _check("入账无丢失", balance == cent * requests, f"¥{balance} / 预期 ¥{cent * requests}")
+
+        # 3. 相同幂等键的并发重试
+        key = uuid.uuid4().hex
+        results, _ = _run(lambda i: _debit(user_id, cent, key), workers, workers)
+        balance_after, _, _ = _balances(user_id)
+        passed &= _check("幂等键只记账一次", sum(results) == 1 and balance_after == balance - cent,
+                         f"新记账 {sum(results)} 次，余额 ¥{balance_after}")
+
+        # 4. 对账
+        balance, ledger, count = _balances(user_id)
+        passed &= _check("余额与流水一致", balance == ledger, f"余额 ¥{balance}，流水合计 ¥{ledger}（{count} 笔）")
+    finally:
+        db = SessionLocal()
+        db.query(Transaction).filter(Transaction.user_id == user_id).delete(synchronize_session=False)
+        db.query(Wallet).filter(Wallet.user_id == user_id).delete(synchronize_session=False)
+        db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+    print("全部校验通过！" if passed else "存在校验失败！")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="钱包并发记账压测")
+    parser.add_argument("--workers", type=int, default=16, help="并发线程数")
+    parser.add_argument("--requests", type=int, default=400, help="每轮请求数")
+    parser.add_argument("--price", type=Decimal, default=Decimal("19.90"), help="单次扣款金额")
+    args = parser.parse_args()
+    raise SystemExit(0 if benchmark_wallet_concurrency(args.workers, args.requests, args.price) else 1)
@@ -0,0 +1,95 @@
+"""
+课程列表查询次数校验脚本
+
+使用独立的测试分类、讲师和课程，统计 GET /api/v1/courses 每次请求执行的SQL语句数，校验：
+- 语句数不随 page_size 增长（讲师、分类、章节数不逐条加载）
+- 游标分页与页码分页的语句数相同
+
+用法: python check_course_list_queries.py --courses 120
+"""
+import argparse
+import uuid
+from sqlalchemy import event
+from app.core.database import SessionLocal, engine
+from app.models.user import User, UserRole
+from app.models.category import Category
+from app.models.course import Course, CourseStatus
+from app.models.chapter import Chapter
+from app.api.v1.courses import get_courses
+from app.services.count_cache import CountMode
+
+
+def _count_statements(func_) -> int:
+    """执行 func_() 并返回期间执行的SQL语句数"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        func_()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return len(statements)
+
+
+def _list_courses(category_id: int, page_size: int, cursor=None) -> int:
+    db = SessionLocal()
+    try:
+        # 预先建立连接，连接初始化的语句不计入
+        db.connection()
+        return _count_statements(lambda: get_courses(
+            page=1, page_size=page_size, category_id=category_id, status=None, keyword=None,
+            show_all=True, cursor=cursor, count=CountMode.NONE, db=db
+        ))
+    finally:
+        db.close()
+
+
+def check_course_list_queries(courses: int, chapters: int) -> bool:
+    """执行校验，全部通过时返回True"""
+    db = SessionLocal()
+    name = f"check_list_{uuid.uuid4().hex[:8]}"
+    teacher = User(username=name, email=f"{name}@example.com", password_hash=uuid.uuid4().hex, role=UserRole.TEACHER)
+    category = Category(name=name)
+    db.add_all([teacher, category])
+    db.flush()
+    for i in range(courses):
+        course = Course(
+            title=f"{name}-{i}", category_id=category.id, teacher_id=teacher.id, status=CourseStatus.PUBLISHED
+        )
+        db.add(course)
+        db.flush()
+        db.add_all([Chapter(course_id=course.id, title=f"第{j + 1}章", sort_order=j) for j in range(chapters)])
+    db.commit()
+    teacher_id, category_id = teacher.id, category.id
+    db.close()
+
+    try:
+        counts = {page_size: _list_courses(category_id, page_size) for page_size in (1, 10, 50, 100)}
+        cursor_count = _list_courses(category_id, 100, cursor="")
+        for page_size, count in counts.items():
+            print(f"  page_size={page_size}: {count} 条SQL")
+        print(f"  cursor, page_size=100: {cursor_count} 条SQL")
+        passed = len(set(counts.values())) == 1 and cursor_count == counts[100]
+    finally:
+        db = SessionLocal()
+        course_ids = [course_id for course_id, in db.query(Course.id).filter(Course.category_id == category_id)]
+        db.query(Chapter).filter(Chapter.course_id.in_(course_ids)).delete(synchronize_session=False)
+        db.query(Course).filter(Course.id.in_(course_ids)).delete(synchronize_session=False)
+        db.query(Category).filter(Category.id == category_id).delete(synchronize_session=False)
+        db.query(User).filter(User.id == teacher_id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+    print("SQL语句数不随 page_size 增长，校验通过！" if passed else "SQL语句数随 page_size 增长，校验失败！")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="课程列表查询次数校验")
+    parser.add_argument("--courses", type=int, default=120, help="测试课程数")
+    parser.add_argument("--chapters", type=int, default=3, help="每门课程的章节数")
+    args = parser.parse_args()
+    raise SystemExit(0 if check_course_list_queries(args.courses, args.chapters) else 1)
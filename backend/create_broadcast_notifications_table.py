@@ -0,0 +1,32 @@
+"""
+创建广播通知表并为通知表添加广播字段的数据库迁移脚本
+"""
+from sqlalchemy import inspect, text
+from app.core.database import engine, Base
+from app.models.broadcast_notification import BroadcastNotification
+
+def create_broadcast_notifications_table():
+    """创建 broadcast_notifications 表，为 notifications 添加 broadcast_id、is_deleted 字段"""
+    print("正在创建广播通知表...")
+    Base.metadata.create_all(bind=engine, tables=[BroadcastNotification.__table__])
+
+    columns = [column["name"] for column in inspect(engine).get_columns("notifications")]
+    with engine.begin() as conn:
+        if "broadcast_id" not in columns:
+            print("正在添加 notifications.broadcast_id 字段...")
+            conn.execute(text(
+                "ALTER TABLE notifications "
+                "ADD COLUMN broadcast_id INT NULL COMMENT '来源广播ID', "
+                "ADD CONSTRAINT fk_notifications_broadcast FOREIGN KEY (broadcast_id) "
+                "REFERENCES broadcast_notifications(id) ON DELETE CASCADE, "
+                "ADD UNIQUE KEY unique_user_broadcast (user_id, broadcast_id)"
+            ))
+        if "is_deleted" not in columns:
+            print("正在添加 notifications.is_deleted 字段...")
+            conn.execute(text(
+                "ALTER TABLE notifications ADD COLUMN is_deleted TINYINT(1) DEFAULT 0 COMMENT '是否删除'"
+            ))
+    print("广播通知迁移完成！")
+
+if __name__ == "__main__":
+    create_broadcast_notifications_table()
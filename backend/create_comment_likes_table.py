@@ -0,0 +1,14 @@
+"""
+创建评论点赞表的数据库迁移脚本
+"""
+from app.core.database import engine, Base
+from app.models.comment_like import CommentLike
+
+def create_comment_likes_table():
+    """创建 comment_likes 表"""
+    print("正在创建评论点赞表...")
+    Base.metadata.create_all(bind=engine, tables=[CommentLike.__table__])
+    print("评论点赞表创建成功！")
+
+if __name__ == "__main__":
+    create_comment_likes_table()
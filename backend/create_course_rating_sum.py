@@ -0,0 +1,23 @@
+"""
+为课程表添加评分总和字段并回填数据的数据库迁移脚本
+"""
+from sqlalchemy import inspect, text
+from app.core.database import engine
+from app.services.rating_service import reconcile_course_ratings
+
+def create_course_rating_sum():
+    """添加 courses.rating_sum 字段，并按评论表重新统计评分"""
+    columns = [column["name"] for column in inspect(engine).get_columns("courses")]
+    if "rating_sum" not in columns:
+        print("正在添加 courses.rating_sum 字段...")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "ALTER TABLE courses ADD COLUMN rating_sum INT DEFAULT 0 COMMENT '评分总和' AFTER rating_count"
+            ))
+
+    print("正在回填课程评分统计...")
+    fixed = reconcile_course_ratings()
+    print(f"课程评分统计完成，更新 {len(fixed)} 门课程！")
+
+if __name__ == "__main__":
+    create_course_rating_sum()
@@ -0,0 +1,28 @@
+"""
+创建游标分页所需索引的数据库迁移脚本
+"""
+from app.core.database import engine
+from app.models.notification import Notification
+from app.models.wallet import Transaction
+from app.models.course import Course
+from app.models.comment import Comment
+
+KEYSET_INDEXES = {
+    'idx_notifications_user_created',
+    'idx_transactions_user_created',
+    'idx_courses_status_created',
+    'idx_courses_created',
+    'idx_comments_course_created',
+}
+
+def create_keyset_indexes():
+    """为已存在的表补建以 (created_at, id) 结尾的复合索引"""
+    for table in (Notification.__table__, Transaction.__table__, Course.__table__, Comment.__table__):
+        for index in table.indexes:
+            if index.name in KEYSET_INDEXES:
+                print(f"正在创建索引 {index.name} ...")
+                index.create(bind=engine, checkfirst=True)
+    print("游标分页索引创建成功！")
+
+if __name__ == "__main__":
+    create_keyset_indexes()
@@ -0,0 +1,35 @@
+"""
+创建上传文件存储表的数据库迁移脚本
+"""
+from sqlalchemy import inspect
+from app.core.database import engine, Base, SessionLocal
+from app.models.stored_file import StoredFile
+from app.services import storage_service
+
+def create_stored_files_table():
+    """创建 stored_files 表（已有的上传文件保持原路径，不需要迁移）"""
+    print("正在创建上传文件存储表...")
+    Base.metadata.create_all(bind=engine, tables=[StoredFile.__table__])
+    print("上传文件存储表创建成功！")
+
+def create_url_index():
+    """为已存在的表补建 url 索引（释放引用时按访问路径查找）"""
+    indexes = {index["name"] for index in inspect(engine).get_indexes(StoredFile.__tablename__)}
+    for index in StoredFile.__table__.indexes:
+        if index.name not in indexes:
+            print(f"正在创建索引 {index.name}...")
+            index.create(bind=engine)
+
+def recount_references():
+    """按课程封面、小节视频等字段重新统计引用计数（引用计数改为统计实体引用，而非上传次数）"""
+    db = SessionLocal()
+    try:
+        changed = storage_service.recount_references(db)
+        print(f"引用计数已重新统计，{changed} 条记录有变化")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    create_stored_files_table()
+    create_url_index()
+    recount_references()
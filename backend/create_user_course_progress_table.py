@@ -0,0 +1,22 @@
+"""
+创建用户课程进度汇总表并回填数据的数据库迁移脚本
+"""
+from app.core.database import engine, Base, SessionLocal
+from app.models.user_course_progress import UserCourseProgress
+from app.services.learning_service import rebuild_course_progress
+
+def create_user_course_progress_table():
+    """创建进度汇总表并根据已有学习记录回填"""
+    print("正在创建用户课程进度汇总表...")
+    Base.metadata.create_all(bind=engine, tables=[UserCourseProgress.__table__])
+
+    print("正在回填课程进度...")
+    db = SessionLocal()
+    try:
+        count = rebuild_course_progress(db)
+    finally:
+        db.close()
+    print(f"用户课程进度汇总完成，共 {count} 门课程！")
+
+if __name__ == "__main__":
+    create_user_course_progress_table()
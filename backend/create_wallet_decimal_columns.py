@@ -0,0 +1,41 @@
+"""
+钱包金额改为DECIMAL并为交易记录添加幂等键的数据库迁移脚本
+"""
+from sqlalchemy import inspect, text
+from app.core.database import engine
+
+def create_wallet_decimal_columns():
+    """将 wallets/transactions 的金额字段改为 DECIMAL(12,2)，添加 transactions.idempotency_key 及唯一索引"""
+    print("正在将钱包金额字段改为 DECIMAL(12,2)...")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE wallets MODIFY balance DECIMAL(12,2) NOT NULL DEFAULT 0.00 COMMENT '余额'"
+        ))
+        conn.execute(text(
+            "ALTER TABLE transactions "
+            "MODIFY amount DECIMAL(12,2) NOT NULL COMMENT '交易金额', "
+            "MODIFY balance_before DECIMAL(12,2) NOT NULL COMMENT '交易前余额', "
+            "MODIFY balance_after DECIMAL(12,2) NOT NULL COMMENT '交易后余额'"
+        ))
+
+    inspector = inspect(engine)
+    columns = [column["name"] for column in inspector.get_columns("transactions")]
+    if "idempotency_key" not in columns:
+        print("正在添加 transactions.idempotency_key 字段...")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "ALTER TABLE transactions ADD COLUMN idempotency_key VARCHAR(64) NULL "
+                "COMMENT '幂等键（同一钱包内唯一）' AFTER course_id"
+            ))
+
+    unique_names = [constraint["name"] for constraint in inspector.get_unique_constraints("transactions")]
+    if "uq_transactions_wallet_key" not in unique_names:
+        print("正在创建唯一索引 uq_transactions_wallet_key ...")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "ALTER TABLE transactions ADD UNIQUE KEY uq_transactions_wallet_key (wallet_id, idempotency_key)"
+            ))
+    print("钱包字段迁移完成！")
+
+if __name__ == "__main__":
+    create_wallet_decimal_columns()
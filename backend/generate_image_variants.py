@@ -0,0 +1,37 @@
+"""
+为已上传的图片补生成衍生图（缩略图 + WebP/AVIF）的脚本
+"""
+import os
+from app.core.config import settings
+from app.services import image_variants
+from app.utils.file_utils import to_static_url, ALLOWED_IMAGE_EXTENSIONS
+
+def generate_image_variants():
+    """扫描 UPLOAD_DIR/images 下的原图，用进程池生成缺少的衍生图"""
+    formats = image_variants.get_formats()
+    if not formats:
+        print("当前环境不支持生成衍生图，请先安装 Pillow！")
+        return
+
+    suffixes = tuple(f"_{size}" for size, _ in image_variants.get_sizes())
+    futures = []
+    for root, _, files in os.walk(os.path.join(settings.UPLOAD_DIR, "images")):
+        for name in files:
+            stem, ext = os.path.splitext(name)
+            # 跳过衍生图本身和非图片文件
+            if stem.endswith(suffixes) or ext[1:].lower() not in ALLOWED_IMAGE_EXTENSIONS:
+                continue
+            futures.append(image_variants.submit(to_static_url(os.path.join(root, name))))
+
+    print(f"正在为 {len(futures)} 张图片生成衍生图（{', '.join(formats)}）...")
+    created = failed = 0
+    for future in futures:
+        try:
+            created += len(future.result())
+        except Exception:
+            failed += 1
+    image_variants.shutdown()
+    print(f"衍生图生成完成，新生成 {created} 个，失败 {failed} 张！")
+
+if __name__ == "__main__":
+    generate_image_variants()
@@ -0,0 +1,22 @@
+"""
+创建课程搜索索引表并重建索引的数据库迁移脚本
+"""
+from app.core.database import engine, Base, SessionLocal
+from app.models.course_search import CourseSearchTerm
+from app.services.search_service import rebuild_index
+
+def rebuild_course_search_index():
+    """创建索引表并为所有课程建立索引"""
+    print("正在创建课程搜索索引表...")
+    Base.metadata.create_all(bind=engine, tables=[CourseSearchTerm.__table__])
+
+    print("正在重建课程搜索索引...")
+    db = SessionLocal()
+    try:
+        count = rebuild_index(db)
+    finally:
+        db.close()
+    print(f"课程搜索索引重建完成，共 {count} 门课程！")
+
+if __name__ == "__main__":
+    rebuild_course_search_index()